@@ -0,0 +1,113 @@
+'''
+Cached block relationships.
+
+Every list endpoint hides the users a requester has blocked and the users who blocked them. The
+bidirectional set of those ids is loaded with one query and cached twice: in a small per-process LRU
+(which saves the Redis round trip on hot users) and in Redis (which is shared by every worker).
+Block.save, Block.delete and UnblockUserView invalidate both sides of the relationship.
+
+Settings:
+    BLOCK_CACHE_TTL (int): Seconds a set lives in Redis.
+    BLOCK_CACHE_LOCAL_TTL (int): Seconds a set lives in the process LRU. Other workers pick up an
+        invalidation after at most this long, so keep it short.
+    BLOCK_CACHE_LOCAL_SIZE (int): Number of users kept in the process LRU.
+'''
+
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+
+from trend.redis_store import get_redis
+
+
+class _LocalLRU:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + settings.BLOCK_CACHE_LOCAL_TTL, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > settings.BLOCK_CACHE_LOCAL_SIZE:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_local = _LocalLRU()
+
+
+def _cache_key(user_id):
+    return f'blocks:{user_id}'
+
+
+def get_blocked_user_ids(user):
+    '''
+    Returns the ids of the users `user` blocked or was blocked by, as a frozenset.
+    Anonymous users get an empty set.
+    '''
+    user_id = getattr(user, 'pk', user)
+    if not user_id:
+        return frozenset()
+
+    key = _cache_key(user_id)
+    blocked_ids = _local.get(key)
+    if blocked_ids is not None:
+        return blocked_ids
+
+    r = get_redis()
+    cached = r.get(key)
+    if cached is not None:
+        blocked_ids = frozenset(json.loads(cached))
+    else:
+        blocked_ids = _load(user_id)
+        r.set(key, json.dumps(sorted(blocked_ids)), ex=settings.BLOCK_CACHE_TTL)
+    _local.set(key, blocked_ids)
+    return blocked_ids
+
+
+def invalidate_blocked_user_ids(*user_ids):
+    '''
+    Drops the cached sets of the given users now and again once the current transaction commits,
+    so a request running in between cannot cache the pre-commit state for long.
+    '''
+    _invalidate(user_ids)
+    transaction.on_commit(lambda: _invalidate(user_ids))
+
+
+def _invalidate(user_ids):
+    keys = [_cache_key(user_id) for user_id in user_ids]
+    for key in keys:
+        _local.delete(key)
+    get_redis().delete(*keys)
+
+
+def _load(user_id):
+    from .models import Block
+
+    pairs = Block.objects.filter(Q(blocker_id=user_id) | Q(blocked_id=user_id)).values_list('blocker_id', 'blocked_id')
+    return frozenset(blocked if blocker == user_id else blocker for blocker, blocked in pairs)
@@ -0,0 +1,82 @@
+"""
+Sparse fieldsets: `?fields=id,username` keeps only the listed fields of each row of a response
+and `?omit=user_posts` drops the listed ones.
+
+Dropped fields are removed from the serializer before it runs, so the queries behind method fields
+are skipped. Views using SparseFieldsetsViewMixin also drop the queryset annotations and prefetches
+that only the dropped fields read, as declared in the serializer's `Meta.sparse_requirements`.
+"""
+from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
+
+
+def _names(value):
+    return frozenset(name.strip() for name in value.split(',') if name.strip())
+
+
+def requested_fields(request):
+    """
+    Returns (only, omit): the fields to keep, or None to keep all of them, and the fields to drop.
+    Writes are always answered with every field.
+    """
+    if request is None or request.method not in SAFE_METHODS:
+        return None, frozenset()
+    only = _names(request.query_params.get('fields', ''))
+    return only or None, _names(request.query_params.get('omit', ''))
+
+
+def is_dropped(name, only, omit):
+    return (only is not None and name not in only) or name in omit
+
+
+class SparseFieldsetsMixin:
+    """
+    Serializer mixin applying ?fields= and ?omit= to the top-level rows of a response; serializers
+    nested in those rows keep their fields.
+    """
+
+    def get_fields(self):
+        fields = super().get_fields()
+        if not self.is_top_level():
+            return fields
+        only, omit = requested_fields(self.context.get('request'))
+        for name in [name for name in fields if is_dropped(name, only, omit)]:
+            del fields[name]
+        return fields
+
+    def is_top_level(self):
+        parent = self.parent
+        return parent is None or (isinstance(parent, serializers.ListSerializer) and parent.parent is None)
+
+    @classmethod
+    def sparse_queryset(cls, queryset, request):
+        """
+        Drops from `queryset` the annotations and prefetch lookups listed in Meta.sparse_requirements
+        ({field: (annotation or prefetch lookup, ...)}) whose fields are all dropped.
+        """
+        only, omit = requested_fields(request)
+        needed, unneeded = set(), set()
+        for name, lookups in getattr(cls.Meta, 'sparse_requirements', {}).items():
+            (unneeded if is_dropped(name, only, omit) else needed).update(lookups)
+        unneeded -= needed
+        if not unneeded:
+            return queryset
+
+        queryset = queryset.all()
+        # Masked annotations are left out of the SELECT, but still usable by filters and ordering.
+        queryset.query.set_annotation_mask(set(queryset.query.annotation_select) - unneeded)
+        lookups = [
+            lookup for lookup in queryset._prefetch_related_lookups
+            if getattr(lookup, 'prefetch_to', lookup) not in unneeded
+        ]
+        return queryset.prefetch_related(None).prefetch_related(*lookups)
+
+
+class SparseFieldsetsViewMixin:
+    """
+    View mixin pruning the queryset for the fields requested with ?fields= / ?omit=.
+    """
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        return self.get_serializer_class().sparse_queryset(queryset, self.request)
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.16 on 2026-10-18 11:48
+
+from django.db import migrations
+import uploads.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authentication', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='customuser',
+            name='avatar',
+            field=uploads.fields.ContentAddressedImageField(blank=True, default='images/avatar.jpeg', null=True, upload_to='images/'),
+        ),
+    ]
@@ -7,6 +7,8 @@ from django.db import models
 from django.contrib.auth.hashers import make_password
 from django.contrib.auth.models import AbstractBaseUser, PermissionsMixin
 from .managers import CustomUserManager
+from .blocks import invalidate_blocked_user_ids
+from uploads.fields import ContentAddressedImageField
 from django.core.mail import send_mail
 
 
@@ -19,7 +21,7 @@ class CustomUser(AbstractBaseUser, PermissionsMixin):
     date_joined = models.DateTimeField(auto_now_add=True)
 
     #Configure the avatar field to store user uploads in a cloud storage service like S3 or Cloudinary for efficient and scalable media management in production environments.
-    avatar = models.ImageField(upload_to='images/', default='images/avatar.jpeg', blank=True, null=True)
+    avatar = ContentAddressedImageField(upload_to='images/', default='images/avatar.jpeg', blank=True, null=True)
     
     # Currently, the OTP is only being used for password reset purposes.
     # It is generated and sent to the user's email when they request a password reset.
@@ -93,3 +95,9 @@ class Block(models.Model):
         Follow.objects.filter(follower=self.blocker, following=self.blocked).delete()
         Follow.objects.filter(follower=self.blocked, following=self.blocker).delete()
         super().save(*args, **kwargs)
+        invalidate_blocked_user_ids(self.blocker_id, self.blocked_id)
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        invalidate_blocked_user_ids(self.blocker_id, self.blocked_id)
+        return result
@@ -1,5 +1,5 @@
 '''
-This module defines a custom pagination class for API responses.
+This module defines the pagination classes for API responses.
 
 Imports:
     rest_framework.pagination: Provides utilities for pagination in Django REST Framework.
@@ -14,15 +14,255 @@ Classes:
             max_page_size (int): The maximum number of items allowed on a single page. Default is 2.
             page_query_param (str): The query parameter name for specifying the page number. Default is 'p'.
 
+    KeysetCursorPagination(BasePagination):
+        Opaque-cursor (keyset) pagination. Pages are addressed by the ordering values of the last row
+        that was returned, so page N costs the same as page 1 and rows do not shift when new ones arrive.
+
+        Attributes:
+            ordering (tuple): The fields the pages are keyed on. The last field must be unique. Default is
+                ('-created_at', '-id'). A view can override it with a `cursor_ordering` attribute.
+            cursor_query_param (str): The query parameter name for the cursor. Default is 'cursor'.
+
+    CursorOrPageNumberPagination(BasePagination):
+        Keeps the page number behaviour by default and switches to KeysetCursorPagination when the
+        request carries a `cursor` query parameter (an empty `?cursor=` requests the first page).
+
 Usage:
     To use this custom pagination class in your Django REST Framework views, include it in the view configuration
 '''
 
-from rest_framework.pagination import PageNumberPagination
+import base64
+import binascii
+import datetime
+import json
+from collections import OrderedDict
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from django.utils.encoding import force_str
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 
 
 class CustomPageNumberPagination(PageNumberPagination):
     page_size = 10
     page_size_query_param = 'limit'
     max_page_size = 10
-    page_query_param = 'p'
\ No newline at end of file
+    page_query_param = 'p'
+
+
+class KeysetCursorPagination(BasePagination):
+    page_size = 10
+    page_size_query_param = 'limit'
+    max_page_size = 10
+    cursor_query_param = 'cursor'
+    ordering = ('-created_at', '-id')
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.ordering = tuple(getattr(view, 'cursor_ordering', self.ordering))
+        self.page_size = self.get_page_size(request)
+        position, reverse = self.decode_cursor(request, queryset)
+
+        queryset = queryset.order_by(*self._order_by(reverse))
+        if position is not None:
+            queryset = queryset.filter(self._keyset_filter(position, reverse))
+
+        # Fetch one extra row to know whether there is a following page without running a COUNT(*).
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+        if reverse:
+            results.reverse()
+
+        self.page = results
+        if reverse:
+            self.has_next = position is not None
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = position is not None
+        return results
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+            if page_size > 0:
+                return min(page_size, self.max_page_size)
+        except (KeyError, ValueError):
+            pass
+        return self.page_size
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def encode_cursor(self, instance, reverse):
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.cursor_token(instance, reverse))
+
+    def cursor_token(self, instance, reverse=False):
+        values = [_to_cursor_value(self._value(instance, field)) for field in self._fields()]
+        payload = json.dumps({'v': values, 'r': int(reverse)}, separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii')
+
+    def decode_cursor(self, request, queryset):
+        '''
+        Returns the position and direction of the request's cursor, the position converted to the
+        types of the ordering fields of `queryset`. Tampered cursors are answered with 404.
+        '''
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None, False
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(token.encode('ascii')).decode('utf-8'))
+            values = payload['v']
+            reverse = bool(payload.get('r'))
+        except (TypeError, ValueError, KeyError, UnicodeError, binascii.Error):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return [self._to_python(queryset, field, value) for field, value in zip(self._fields(), values)], reverse
+
+    def _to_python(self, queryset, name, value):
+        # Every field the pages are keyed on is non-null, and cursors only hold scalars.
+        if value is None or isinstance(value, (bool, list, dict)):
+            raise NotFound(self.invalid_cursor_message)
+        annotation = queryset.query.annotations.get(name)
+        try:
+            field = annotation.output_field if annotation is not None else queryset.model._meta.get_field(name)
+            return field.to_python(value)
+        except (ValidationError, TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def _fields(self):
+        return [field.lstrip('-') for field in self.ordering]
+
+    def _value(self, instance, field):
+        if isinstance(instance, dict):
+            return instance[field]
+        return getattr(instance, field)
+
+    def _order_by(self, reverse):
+        if not reverse:
+            return self.ordering
+        return tuple(field[1:] if field.startswith('-') else '-' + field for field in self.ordering)
+
+    def _keyset_filter(self, position, reverse):
+        '''
+        Builds the row-value comparison `(a, b, c) < (x, y, z)` as
+        `a <= x AND (a < x OR (a = x AND b < y) OR (a = x AND b = y AND c < z))`, honouring each
+        field's direction. The leading inclusive bound lets the database seek the index instead of
+        scanning it to evaluate the OR.
+        '''
+        condition = Q()
+        equal = Q()
+        bound = None
+        for field, value in zip(self.ordering, position):
+            descending = field.startswith('-')
+            name = field.lstrip('-')
+            lookup = 'lt' if descending != reverse else 'gt'
+            if bound is None:
+                bound = Q(**{f'{name}__{lookup}e': value})
+            condition |= equal & Q(**{f'{name}__{lookup}': value})
+            equal &= Q(**{name: value})
+        return bound & condition
+
+
+class CursorOrPageNumberPagination(BasePagination):
+    '''
+    Lets an endpoint offer keyset pagination without breaking clients that still send `?p=`.
+    '''
+    page_number_class = CustomPageNumberPagination
+    cursor_class = KeysetCursorPagination
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.cursor_class.cursor_query_param in request.query_params:
+            self.paginator = self.cursor_class()
+        else:
+            self.paginator = self.page_number_class()
+        return self.paginator.paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        return self.paginator.get_paginated_response(data)
+
+    def get_paginated_response_schema(self, schema):
+        return self.page_number_class().get_paginated_response_schema(schema)
+
+    def get_schema_operation_parameters(self, view):
+        return (
+            self.page_number_class().get_schema_operation_parameters(view)
+            + [{
+                'name': self.cursor_class.cursor_query_param,
+                'required': False,
+                'in': 'query',
+                'description': force_str('Opaque cursor; send it empty to start keyset pagination.'),
+                'schema': {'type': 'string'},
+            }]
+        )
+
+
+def _to_cursor_value(value):
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+class CountsCursorPagination(KeysetCursorPagination):
+    '''
+    Keyset pagination whose responses start with per-category totals provided by the view's
+    `get_counts()` (e.g. the reaction histogram of a post), so clients get the aggregate and the
+    first page of rows in one request.
+    '''
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.counts = view.get_counts() if view is not None else {}
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        response = super().get_paginated_response(data)
+        response.data = OrderedDict([
+            ('counts', self.counts),
+            ('total', sum(self.counts.values())),
+            *response.data.items(),
+        ])
+        return response
+
+    def get_paginated_response_schema(self, schema):
+        response_schema = super().get_paginated_response_schema(schema)
+        response_schema['properties'] = {
+            'counts': {'type': 'object', 'additionalProperties': {'type': 'integer'}},
+            'total': {'type': 'integer'},
+            **response_schema['properties'],
+        }
+        return response_schema
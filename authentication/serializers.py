@@ -29,8 +29,7 @@ Usage:
 
 from django.utils import timezone
 from rest_framework import serializers
-from profile_app.models import Profile
-from profile_app.serializers import ProfileSerializer
+from profile_app.serializers import ProfileSummarySerializer
 from .models import CustomUser, Block
 from django.contrib.auth.password_validation import validate_password
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
@@ -214,12 +213,8 @@ class BlockSerializer(serializers.ModelSerializer):
 
 
 class BlockListSerializer(serializers.ModelSerializer):
-    blocked_profile = serializers.SerializerMethodField()
+    blocked_profile = ProfileSummarySerializer(source='blocked.profile', read_only=True)
 
     class Meta:
         model = Block
-        fields = ['blocked_profile']
-
-    def get_blocked_profile(self, obj):
-        profile = Profile.objects.get(user=obj.blocked)
-        return ProfileSerializer(profile, context=self.context).data
\ No newline at end of file
+        fields = ['blocked_profile']
\ No newline at end of file
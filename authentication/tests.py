@@ -1,3 +1,49 @@
-from django.test import TestCase
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
 
-# Create your tests here.
+from .blocks import _local, get_blocked_user_ids
+from .models import Block, CustomUser
+from trend.redis_store import local_redis
+
+
+@override_settings(REDIS_URL='local://')
+class BlockedUserIdsCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.alice = CustomUser.objects.create_user(username='alice', email='alice@example.com')
+        cls.bob = CustomUser.objects.create_user(username='bob', email='bob@example.com')
+        cls.carol = CustomUser.objects.create_user(username='carol', email='carol@example.com')
+
+    def setUp(self):
+        local_redis.flushall()
+        _local.clear()
+
+    def test_set_is_bidirectional_and_cached(self):
+        Block.objects.create(blocker=self.alice, blocked=self.bob)
+        Block.objects.create(blocker=self.carol, blocked=self.alice)
+        with self.assertNumQueries(1):
+            self.assertEqual(get_blocked_user_ids(self.alice), {self.bob.id, self.carol.id})
+        with self.assertNumQueries(0):
+            self.assertEqual(get_blocked_user_ids(self.alice), {self.bob.id, self.carol.id})
+        # A cold process LRU is refilled from Redis, not from the database.
+        _local.clear()
+        with self.assertNumQueries(0):
+            self.assertEqual(get_blocked_user_ids(self.alice), {self.bob.id, self.carol.id})
+
+    def test_block_and_delete_invalidate_both_users(self):
+        self.assertEqual(get_blocked_user_ids(self.bob), frozenset())
+        block = Block.objects.create(blocker=self.alice, blocked=self.bob)
+        self.assertEqual(get_blocked_user_ids(self.bob), {self.alice.id})
+        block.delete()
+        self.assertEqual(get_blocked_user_ids(self.bob), frozenset())
+
+    def test_unblock_view_invalidates(self):
+        Block.objects.create(blocker=self.alice, blocked=self.bob)
+        self.assertEqual(get_blocked_user_ids(self.alice), {self.bob.id})
+        client = APIClient()
+        client.force_authenticate(self.alice)
+        response = client.delete(reverse('unblockuser', args=[self.bob.id]))
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(get_blocked_user_ids(self.alice), frozenset())
+        self.assertEqual(client.delete(reverse('unblockuser', args=[self.bob.id])).status_code, 404)
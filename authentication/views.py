@@ -1,5 +1,6 @@
 from .models import CustomUser, Block
-from django.shortcuts import get_object_or_404
+from .blocks import invalidate_blocked_user_ids
+from django.http import Http404
 from drf_yasg.utils import swagger_auto_schema
 from .permissions import IsBlockerSelf
 from rest_framework import status, generics
@@ -176,7 +177,7 @@ class BlockListView(generics.ListAPIView):
         Returns blocks for the authenticated user.
         """
         user = self.request.user
-        return Block.objects.filter(blocker=user)
+        return Block.objects.filter(blocker=user).select_related('blocked__profile')
 
     def list(self, request, *args, **kwargs):
         queryset = self.get_queryset()
@@ -197,11 +198,13 @@ class UnblockUserView(generics.DestroyAPIView):
         blocker = request.user
         blocked_id = kwargs.get('blocked_id')
 
-        # Fetch the block relationship to delete
-        block = get_object_or_404(Block, blocker=blocker, blocked_id=blocked_id)
+        # Delete the block relationship in a single statement
+        deleted, _ = Block.objects.filter(blocker=blocker, blocked_id=blocked_id).delete()
+        if not deleted:
+            raise Http404
 
-        # Delete the block relationship
-        block.delete()
+        # A queryset delete bypasses Block.delete, so drop the cached block sets here
+        invalidate_blocked_user_ids(blocker.pk, blocked_id)
 
         return Response(status=status.HTTP_204_NO_CONTENT)
 
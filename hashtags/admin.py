@@ -0,0 +1,8 @@
+from django.contrib import admin
+from .models import Hashtag
+
+class HashtagAdmin(admin.ModelAdmin):
+    list_display = ('name', 'created_at')
+    search_fields = ('name',)
+
+admin.site.register(Hashtag, HashtagAdmin)
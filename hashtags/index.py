@@ -0,0 +1,41 @@
+"""
+Keeps the hashtag inverted index (PostHashtag, VideoHashtag) in step with the text it is parsed from.
+"""
+from django.db import transaction
+
+from . import parsing, trending
+from .models import Hashtag
+
+
+def get_tags(names):
+    """
+    Returns {name: Hashtag} for `names`, creating the missing ones.
+    """
+    if not names:
+        return {}
+    Hashtag.objects.bulk_create([Hashtag(name=name) for name in names], ignore_conflicts=True)
+    return {tag.name: tag for tag in Hashtag.objects.filter(name__in=names)}
+
+
+def sync(link_model, owner_field, owner, text):
+    """
+    Makes the links of `owner` match the tags of `text`, adding and removing only the difference.
+    Newly used tags are counted towards the trending tags once the transaction commits. Returns
+    the names of the added tags.
+    """
+    names = parsing.extract(text)
+    links = link_model.objects.filter(**{owner_field: owner})
+    current = dict(links.values_list('tag__name', 'pk'))
+    added = [name for name in names if name not in current]
+    removed = [pk for name, pk in current.items() if name not in names]
+
+    with transaction.atomic():
+        if removed:
+            link_model.objects.filter(pk__in=removed).delete()
+        if added:
+            tags = get_tags(added)
+            link_model.objects.bulk_create([
+                link_model(tag=tags[name], created_at=owner.created_at, **{owner_field: owner}) for name in added
+            ], ignore_conflicts=True)
+            transaction.on_commit(lambda: trending.record(added))
+    return added
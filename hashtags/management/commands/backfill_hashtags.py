@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+
+from hashtags import index, parsing
+from hashtags.models import PostHashtag, VideoHashtag
+from post.models import Post
+from vlog.models import Video
+
+
+class Command(BaseCommand):
+    help = 'Index the hashtags of existing posts and videos'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows read per query.')
+
+    def handle(self, *args, **options):
+        """
+        Only rows whose text contains a '#' are parsed. Tags added here are not counted towards the
+        trending tags, which only reflect new activity.
+        """
+        linked = 0
+        sources = [
+            (Post.objects.filter(content__contains='#').only('id', 'content', 'created_at'), PostHashtag, 'post', 'content'),
+            (Video.objects.filter(description__contains='#').only('id', 'description', 'created_at'), VideoHashtag, 'video', 'description'),
+        ]
+        for queryset, link_model, owner_field, text_field in sources:
+            for instance in queryset.order_by('pk').iterator(chunk_size=options['batch_size']):
+                names = parsing.extract(getattr(instance, text_field))
+                existing = set(link_model.objects.filter(**{owner_field: instance}).values_list('tag__name', flat=True))
+                added = [name for name in names if name not in existing]
+                if added:
+                    tags = index.get_tags(added)
+                    link_model.objects.bulk_create([
+                        link_model(tag=tags[name], created_at=instance.created_at, **{owner_field: instance}) for name in added
+                    ], ignore_conflicts=True)
+                    linked += len(added)
+        self.stdout.write(self.style.SUCCESS(f'Added {linked} hashtag links.'))
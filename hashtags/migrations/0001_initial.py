@@ -0,0 +1,58 @@
+# Generated by Django 4.2.16 on 2026-10-18 11:56
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('vlog', '0007_content_addressed_video'),
+        ('post', '0012_content_addressed_image'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Hashtag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='PostHashtag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField()),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='hashtag_links', to='post.post')),
+                ('tag', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='post_links', to='hashtags.hashtag')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='VideoHashtag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField()),
+                ('tag', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='video_links', to='hashtags.hashtag')),
+                ('video', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='hashtag_links', to='vlog.video')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['tag', '-created_at', '-video'], name='videohashtag_tag_created_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='videohashtag',
+            constraint=models.UniqueConstraint(fields=('tag', 'video'), name='unique_hashtag_per_video'),
+        ),
+        migrations.AddIndex(
+            model_name='posthashtag',
+            index=models.Index(fields=['tag', '-created_at', '-post'], name='posthashtag_tag_created_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='posthashtag',
+            constraint=models.UniqueConstraint(fields=('tag', 'post'), name='unique_hashtag_per_post'),
+        ),
+    ]
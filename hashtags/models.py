@@ -0,0 +1,69 @@
+from django.db import models
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from post.models import Post
+from vlog.models import Video
+
+
+class Hashtag(models.Model):
+    # Normalized by hashtags.parsing.normalize().
+    name = models.CharField(max_length=100, unique=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"#{self.name}"
+
+
+class PostHashtag(models.Model):
+    """
+    Inverted index entry: `post` uses `tag`. `created_at` is the post's creation time, so a tag's
+    feed is a range scan of the (tag, created_at, post) index.
+    """
+    tag = models.ForeignKey(Hashtag, on_delete=models.CASCADE, related_name='post_links')
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='hashtag_links')
+    created_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['tag', 'post'], name='unique_hashtag_per_post'),
+        ]
+        indexes = [
+            models.Index(fields=['tag', '-created_at', '-post'], name='posthashtag_tag_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"#{self.tag.name} on post {self.post_id}"
+
+
+class VideoHashtag(models.Model):
+    tag = models.ForeignKey(Hashtag, on_delete=models.CASCADE, related_name='video_links')
+    video = models.ForeignKey(Video, on_delete=models.CASCADE, related_name='hashtag_links')
+    created_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['tag', 'video'], name='unique_hashtag_per_video'),
+        ]
+        indexes = [
+            models.Index(fields=['tag', '-created_at', '-video'], name='videohashtag_tag_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"#{self.tag.name} on video {self.video_id}"
+
+
+@receiver(post_save, sender=Post)
+def index_post_hashtags(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or (update_fields is not None and 'content' not in update_fields):
+        return
+    from hashtags import index
+    index.sync(PostHashtag, 'post', instance, instance.content)
+
+
+@receiver(post_save, sender=Video)
+def index_video_hashtags(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or (update_fields is not None and 'description' not in update_fields):
+        return
+    from hashtags import index
+    index.sync(VideoHashtag, 'video', instance, instance.description)
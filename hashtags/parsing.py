@@ -0,0 +1,31 @@
+"""
+Extraction of #hashtags from post content and video descriptions.
+
+Tags are normalized (NFKC, case-folded) so #Café, #CAFÉ and #café are the same tag. A tag must
+contain at least one non-digit, so "#1" in "we're #1" is not a tag, and a # preceded by a word
+character or "&" (a URL fragment, an HTML entity) does not start one.
+"""
+import re
+import unicodedata
+
+MAX_TAG_LENGTH = 100
+MAX_TAGS = 30
+HASHTAG = re.compile(r'(?<![\w&/])#(\w+)')
+
+
+def normalize(name):
+    return unicodedata.normalize('NFKC', name).casefold()
+
+
+def extract(text):
+    """
+    Returns the distinct normalized tags of `text` in order of first appearance.
+    """
+    tags = []
+    for match in HASHTAG.finditer(unicodedata.normalize('NFKC', text or '')):
+        tag = normalize(match.group(1))
+        if len(tag) <= MAX_TAG_LENGTH and not tag.isdigit() and tag not in tags:
+            tags.append(tag)
+            if len(tags) == MAX_TAGS:
+                break
+    return tags
@@ -0,0 +1,105 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from authentication.blocks import _local
+from authentication.models import Block
+from hashtags import parsing, trending
+from hashtags.models import Hashtag, PostHashtag, VideoHashtag
+from post.models import HiddenPost, Post
+from trend.redis_store import local_redis
+from vlog.models import Video
+
+User = get_user_model()
+
+
+class ParsingTests(TestCase):
+    def test_tags_are_normalized_and_deduplicated(self):
+        self.assertEqual(
+            parsing.extract('#Café time with #CAFÉ lovers, #sunset_2024! #1 http://x.io/#frag &#39; mail#tag'),
+            ['café', 'sunset_2024'],
+        )
+        self.assertEqual(parsing.extract('#ｆｕｌｌｗｉｄｔｈ'), ['fullwidth'])
+        self.assertEqual(parsing.extract(None), [])
+
+
+@override_settings(REDIS_URL='local://', HASHTAG_TRENDING_WINDOW=60)
+class HashtagTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='user', email='user@example.com')
+        cls.author = User.objects.create_user(username='author', email='author@example.com')
+
+    def setUp(self):
+        local_redis.flushall()
+        _local.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def create_post(self, content, user=None):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Post.objects.create(user=user or self.author, image='images/test.jpg', content=content)
+
+    def test_links_follow_edits(self):
+        post = self.create_post('Morning run #Running #health')
+        self.assertEqual(set(post.hashtag_links.values_list('tag__name', flat=True)), {'running', 'health'})
+        post.content = 'Evening run #running #sunset'
+        post.save()
+        self.assertEqual(set(post.hashtag_links.values_list('tag__name', flat=True)), {'running', 'sunset'})
+        self.assertEqual(Hashtag.objects.count(), 3)
+
+        video = Video(author=self.author, title='clip', description='#sunset from the roof', video='vlogs/test.mp4')
+        video.save()
+        self.assertEqual(list(VideoHashtag.objects.filter(video=video).values_list('tag__name', flat=True)), ['sunset'])
+
+    def test_tag_feed_pages_newest_first_with_filters(self):
+        posts = [self.create_post(f'day {i} #travel') for i in range(13)]
+        self.create_post('#food only')
+        blocked = User.objects.create_user(username='blocked', email='blocked@example.com')
+        Block.objects.create(blocker=self.user, blocked=blocked)
+        self.create_post('#travel too', user=blocked)
+        HiddenPost.objects.create(user=self.user, post=posts[0])
+
+        response = self.client.get(reverse('hashtag-posts', args=['Travel']))
+        self.assertEqual(response.status_code, 200)
+        first = [post['id'] for post in response.data['results']]
+        second = [post['id'] for post in self.client.get(response.data['next']).data['results']]
+        self.assertEqual(first + second, [post.id for post in reversed(posts[1:])])
+
+        self.assertEqual(self.client.get(reverse('hashtag-posts', args=['unknown'])).status_code, 404)
+
+    def test_video_feed_lists_ready_videos(self):
+        ready = Video.objects.create(author=self.author, title='ready', description='#skate', video='vlogs/test.mp4', status=Video.READY)
+        Video.objects.create(author=self.author, title='processing', description='#skate', video='vlogs/test.mp4')
+        Video.objects.create(author=self.author, title='rejected', description='#skate', video='', status=Video.REJECTED)
+        response = self.client.get(reverse('hashtag-videos', args=['skate']))
+        self.assertEqual([video['id'] for video in response.data['results']], [ready.id])
+
+    def test_tag_feed_uses_a_fixed_number_of_queries(self):
+        for i in range(5):
+            self.create_post(f'#quiet post {i}')
+        # Tag, post page with engagement, reaction histograms and renditions.
+        with self.assertNumQueries(5):
+            self.client.get(reverse('hashtag-posts', args=['quiet']))
+
+    def test_trending_counts_uses_in_the_window(self):
+        self.create_post('#a #b')
+        self.create_post('#a')
+        trending.record(['c', 'c', 'c'], minute=trending.current_minute() - 61)
+
+        response = self.client.get(reverse('trending-hashtags'), {'limit': 5})
+        self.assertEqual(response.data['results'], [{'name': 'a', 'count': 2}, {'name': 'b', 'count': 1}])
+
+        # Re-saving a post does not count its tags again.
+        Post.objects.get(content='#a').save()
+        local_redis.delete('hashtags:top:60')
+        self.assertEqual(trending.top(5), [('a', 2), ('b', 1)])
+
+    def test_backfill_indexes_rows_written_in_bulk(self):
+        Post.objects.bulk_create([Post(user=self.author, image='images/test.jpg', content='old #archive')])
+        call_command('backfill_hashtags', stdout=StringIO())
+        self.assertEqual(PostHashtag.objects.filter(tag__name='archive').count(), 1)
@@ -0,0 +1,49 @@
+"""
+Rolling "top tags" counter in Redis.
+
+Every use of a tag increments its score in the sorted set of the current minute. The top tags of
+the last HASHTAG_TRENDING_WINDOW minutes are the ZUNIONSTORE of those buckets, which Redis
+computes; the union is kept for TOP_CACHE_SECONDS so that readers share it. Buckets expire on
+their own once they leave the window, so nothing needs cleaning up.
+"""
+import time
+
+from django.conf import settings
+
+from trend.redis_store import get_redis
+
+TOP_CACHE_SECONDS = 15
+
+
+def bucket_key(minute):
+    return f'hashtags:minute:{minute}'
+
+
+def current_minute():
+    return int(time.time() // 60)
+
+
+def record(names, minute=None):
+    if not names:
+        return
+    minute = current_minute() if minute is None else minute
+    key = bucket_key(minute)
+    with get_redis().pipeline() as pipe:
+        for name in names:
+            pipe.zincrby(key, 1, name)
+        pipe.expire(key, (settings.HASHTAG_TRENDING_WINDOW + 1) * 60)
+        pipe.execute()
+
+
+def top(limit=10, minute=None):
+    """
+    Returns [(name, uses)] for the most used tags of the window, most used first.
+    """
+    minute = current_minute() if minute is None else minute
+    window = settings.HASHTAG_TRENDING_WINDOW
+    r = get_redis()
+    key = f'hashtags:top:{window}'
+    if not r.exists(key):
+        r.zunionstore(key, [bucket_key(minute - offset) for offset in range(window)])
+        r.expire(key, TOP_CACHE_SECONDS)
+    return [(name, int(score)) for name, score in r.zrevrange(key, 0, limit - 1, withscores=True)]
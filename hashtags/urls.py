@@ -0,0 +1,13 @@
+from django.urls import path
+from .views import (
+    TrendingHashtags,
+    HashtagPostList,
+    HashtagVideoList,
+)
+
+urlpatterns = [
+    # hashtag endpoints
+    path('hashtags/trending/', TrendingHashtags.as_view(), name='trending-hashtags'),
+    path('hashtags/<str:name>/posts/', HashtagPostList.as_view(), name='hashtag-posts'),
+    path('hashtags/<str:name>/videos/', HashtagVideoList.as_view(), name='hashtag-videos'),
+]
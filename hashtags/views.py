@@ -0,0 +1,79 @@
+from django.conf import settings
+from django.db.models import Exists, F, OuterRef
+from django.shortcuts import get_object_or_404
+from rest_framework import generics
+from rest_framework.permissions import IsAuthenticatedOrReadOnly
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from authentication.blocks import get_blocked_user_ids
+from authentication.fieldsets import SparseFieldsetsViewMixin
+from authentication.pagination import KeysetCursorPagination
+from post.models import HiddenPost, Post
+from post.serializers import PostSerializer
+from vlog.models import Video
+from vlog.serializers import VideoSerializer
+
+from . import parsing, trending
+from .models import Hashtag
+
+
+class HashtagFeedPagination(KeysetCursorPagination):
+    ordering = ('-tagged_at', '-id')
+
+
+class HashtagPostList(SparseFieldsetsViewMixin, generics.ListAPIView):
+    '''
+    Newest posts using a hashtag, read from the tag's index range.
+    '''
+    serializer_class = PostSerializer
+    permission_classes = [IsAuthenticatedOrReadOnly]
+    pagination_class = HashtagFeedPagination
+
+    def get_queryset(self):
+        tag = get_object_or_404(Hashtag, name=parsing.normalize(self.kwargs['name']))
+        user = self.request.user
+        queryset = Post.objects.filter(hashtag_links__tag=tag).annotate(tagged_at=F('hashtag_links__created_at'))
+        if user.is_authenticated:
+            queryset = queryset.exclude(user__in=get_blocked_user_ids(user)).exclude(
+                Exists(HiddenPost.objects.filter(user=user, post=OuterRef('pk')))
+            )
+        return queryset.with_engagement(user).with_media()
+
+
+class HashtagVideoList(generics.ListAPIView):
+    '''
+    Newest videos using a hashtag.
+    '''
+    serializer_class = VideoSerializer
+    permission_classes = [IsAuthenticatedOrReadOnly]
+    pagination_class = HashtagFeedPagination
+
+    def get_queryset(self):
+        tag = get_object_or_404(Hashtag, name=parsing.normalize(self.kwargs['name']))
+        user = self.request.user
+        queryset = (
+            Video.objects.visible_to(user).filter(hashtag_links__tag=tag)
+            .annotate(tagged_at=F('hashtag_links__created_at'))
+        )
+        if user.is_authenticated:
+            queryset = queryset.exclude(author__in=get_blocked_user_ids(user))
+        return queryset.select_related('author')
+
+
+class TrendingHashtags(APIView):
+    '''
+    The most used hashtags of the last HASHTAG_TRENDING_WINDOW minutes. `?limit=` caps the list.
+    '''
+    permission_classes = [IsAuthenticatedOrReadOnly]
+    max_limit = 50
+
+    def get(self, request):
+        try:
+            limit = min(max(int(request.query_params.get('limit', 10)), 1), self.max_limit)
+        except ValueError:
+            limit = 10
+        return Response({
+            "window_minutes": settings.HASHTAG_TRENDING_WINDOW,
+            "results": [{"name": name, "count": count} for name, count in trending.top(limit)],
+        })
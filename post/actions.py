@@ -0,0 +1,147 @@
+"""
+Batched like, reaction and hide operations for clients that queue actions while offline.
+
+Every operation sets a state (`like` on/off, `reaction` to a type or none, `hide` on/off), so a
+replayed batch is idempotent. Operations are applied in order in memory against the requester's
+current state, which is loaded with one query per kind; only the net change per post is written,
+with bulk inserts and bulk deletes, all in one transaction.
+
+Likes and reactions are written with INSERT ... ON CONFLICT DO NOTHING, DELETE ... RETURNING and
+(for a changed reaction type) a guarded UPDATE ... RETURNING, like the single toggles, and the
+counters move by the rows those statements report: a concurrent toggle of the same post neither
+raises IntegrityError nor gets counted twice.
+"""
+from collections import defaultdict
+
+from django.db import transaction
+
+from . import counters
+from .models import HiddenPost, LikePost, Post, Reaction, _now, _returning
+
+LIKE = 'like'
+REACTION = 'reaction'
+HIDE = 'hide'
+
+APPLIED = 'applied'
+UNCHANGED = 'unchanged'
+NOT_FOUND = 'not_found'
+
+
+def apply_batch(user, operations):
+    """
+    Applies `operations` ({'type', 'post_id', 'value'} dicts, already validated) for `user` and
+    returns one {'post_id', 'type', 'value', 'status'} result per operation, in order.
+    """
+    post_ids = {operation['post_id'] for operation in operations}
+    with transaction.atomic():
+        existing = set(Post.objects.filter(pk__in=post_ids).values_list('pk', flat=True))
+        before = {
+            LIKE: dict.fromkeys(LikePost.objects.filter(user=user, post_id__in=existing).values_list('post_id', flat=True), True),
+            REACTION: dict(Reaction.objects.filter(user=user, post_id__in=existing).values_list('post_id', 'reaction_type')),
+            HIDE: dict.fromkeys(HiddenPost.objects.filter(user=user, post_id__in=existing).values_list('post_id', flat=True), True),
+        }
+        state = {kind: dict(values) for kind, values in before.items()}
+
+        results = []
+        for operation in operations:
+            kind, post_id, value = operation['type'], operation['post_id'], operation['value']
+            if post_id not in existing:
+                status = NOT_FOUND
+            else:
+                current = state[kind].get(post_id, False if kind != REACTION else None)
+                status = UNCHANGED if current == value else APPLIED
+                state[kind][post_id] = value
+            results.append({'post_id': post_id, 'type': kind, 'value': value, 'status': status})
+
+        _write_likes(user, before[LIKE], state[LIKE])
+        _write_reactions(user, before[REACTION], state[REACTION])
+        _write_hides(user, before[HIDE], state[HIDE])
+    return results
+
+
+def _diff(before, after, off):
+    added = [post_id for post_id, value in after.items() if value != off and before.get(post_id, off) == off]
+    removed = [post_id for post_id, value in after.items() if value == off and before.get(post_id, off) != off]
+    return added, removed
+
+
+def _insert(model, columns, rows):
+    """
+    Inserts `rows` into `model`'s table, skipping those whose (post, user) already exists, and
+    returns the post ids of the rows inserted.
+    """
+    if not rows:
+        return []
+    values = ', '.join(['(' + ', '.join(['%s'] * len(columns)) + ')'] * len(rows))
+    return _returning(model, (
+        'INSERT INTO {table} (' + ', '.join(columns) + ') VALUES ' + values +
+        ' ON CONFLICT (post_id, user_id) DO NOTHING RETURNING post_id'
+    ), [value for row in rows for value in row])
+
+
+def _delete(model, user, post_ids, returning='post_id'):
+    """
+    Deletes the rows of `user` on `post_ids` from `model`'s table and returns the rows deleted.
+    """
+    if not post_ids:
+        return []
+    return _returning(model, (
+        'DELETE FROM {table} WHERE user_id = %s AND post_id IN (' + ', '.join(['%s'] * len(post_ids)) + ')'
+        ' RETURNING ' + returning
+    ), [user.pk, *post_ids])
+
+
+def _write_likes(user, before, after):
+    added, removed = _diff(before, after, False)
+    now = _now()
+    # Raw statements send no post_save/post_delete, so the counters are moved here.
+    for post_id, in _insert(LikePost, ('post_id', 'user_id', 'created_at'), [(post_id, user.pk, now) for post_id in added]):
+        counters.add_like(post_id, 1)
+    for post_id, in _delete(LikePost, user, removed):
+        counters.add_like(post_id, -1)
+
+
+def _write_reactions(user, before, after):
+    added, removed = _diff(before, after, None)
+    changed = [
+        post_id for post_id, reaction_type in after.items()
+        if before.get(post_id) is not None and reaction_type is not None and before[post_id] != reaction_type
+    ]
+
+    # Counters move by the rows the statements report, so a concurrent toggle that got there
+    # first is not counted twice.
+    deltas = defaultdict(int)
+    for post_id, reaction_type in _delete(Reaction, user, removed, returning='post_id, reaction_type'):
+        deltas[post_id, reaction_type] -= 1
+    now = _now()
+    inserted = _insert(
+        Reaction, ('post_id', 'user_id', 'reaction_type', 'created_at'),
+        [(post_id, user.pk, after[post_id], now) for post_id in added],
+    )
+    for post_id, in inserted:
+        deltas[post_id, after[post_id]] += 1
+
+    # A changed reaction keeps its row (and its place among the reactors); the UPDATE is guarded
+    # on the type that was read, which is the one whose counter goes down.
+    transitions = defaultdict(list)
+    for post_id in changed:
+        transitions[before[post_id], after[post_id]].append(post_id)
+    for (previous, reaction_type), post_ids in transitions.items():
+        for post_id, in _returning(Reaction, (
+            'UPDATE {table} SET reaction_type = %s WHERE user_id = %s AND reaction_type = %s '
+            'AND post_id IN (' + ', '.join(['%s'] * len(post_ids)) + ') RETURNING post_id'
+        ), [reaction_type, user.pk, previous, *post_ids]):
+            deltas[post_id, previous] -= 1
+            deltas[post_id, reaction_type] += 1
+
+    for (post_id, reaction_type), delta in deltas.items():
+        if delta:
+            counters.add_reaction(post_id, reaction_type, delta)
+
+
+def _write_hides(user, before, after):
+    added, removed = _diff(before, after, False)
+    if added:
+        HiddenPost.objects.bulk_create([HiddenPost(user=user, post_id=post_id) for post_id in added], ignore_conflicts=True)
+    if removed:
+        HiddenPost.objects.filter(user=user, post_id__in=removed).delete()
@@ -23,7 +23,7 @@ class PostAdmin(admin.ModelAdmin):
 
     def get_queryset(self, request):
         qs = super().get_queryset(request)
-        qs = qs.prefetch_related('post_reactions', 'comments', 'likes')
+        qs = qs.prefetch_related('reaction_counts', 'comments', 'likes')
         return qs
 
     def top_reactions_display(self, obj):
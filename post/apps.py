@@ -1,6 +1,15 @@
 from django.apps import AppConfig
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
 
 
 class PostConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'post'
+
+    def ready(self):
+        from trend.redis_store import LOCAL_URL
+
+        # Buffered deltas must reach the process running the flush task (see post/counters.py).
+        if settings.ENGAGEMENT_WRITE_BEHIND and settings.REDIS_URL == LOCAL_URL:
+            raise ImproperlyConfigured('ENGAGEMENT_WRITE_BEHIND needs REDIS_URL to point to a Redis server.')
@@ -0,0 +1,273 @@
+"""
+Routing of like and reaction counter changes.
+
+By default every like or reaction moves its counter row with an F() update in the same transaction.
+On a viral post that row becomes the hottest lock in the database, so with ENGAGEMENT_WRITE_BEHIND
+enabled the deltas are instead accumulated in Redis hashes (one HINCRBY per event, after the
+transaction commits) and applied in batches by the flush_engagement_counters task every
+ENGAGEMENT_FLUSH_INTERVAL seconds. Reads add the pending deltas so the numbers users see do not lag
+behind the buffer.
+
+Deltas are handed over with RENAME, so events arriving during a flush go to a fresh hash and are
+never lost. If a flush dies after the rename, the next flush applies the leftover hash first. Each
+handed-over hash carries a flush id, recorded as a CounterFlush in the transaction applying it, so
+a flush dying between that commit and clearing the hash does not apply it again.
+
+The buffer only works with a Redis shared by every process; PostConfig.ready() refuses to start
+with ENGAGEMENT_WRITE_BEHIND and the in-process stand-in.
+"""
+import time
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, Count, F, IntegerField, Value, When
+from django.utils import timezone
+
+from trend.redis_store import get_redis
+
+from .models import CounterFlush, LikeCounter, Post, Reaction, ReactionCount
+
+LIKES_KEY = 'counters:likes'
+REACTIONS_KEY = 'counters:reactions'
+# Sorted set of post ids scored by their last buffered event, written before the transaction
+# commits; see settling_posts().
+TOUCHED_KEY = 'counters:touched'
+FLUSH_ID_FIELD = '_flush_id'
+FLUSH_BATCH_SIZE = 500
+# Seconds a post is left alone by the reconciliation after a buffered event. Longer than any gap
+# between a commit and its on_commit HINCRBY.
+SETTLE_SECONDS = 60
+# How long applied flush ids are kept.
+FLUSH_ID_RETENTION = timedelta(days=1)
+
+
+def write_behind_enabled():
+    return settings.ENGAGEMENT_WRITE_BEHIND
+
+
+def add_like(post_id, delta):
+    if write_behind_enabled():
+        _touch(post_id)
+        transaction.on_commit(lambda: get_redis().hincrby(LIKES_KEY, post_id, delta))
+    else:
+        LikeCounter.adjust(post_id, delta)
+
+
+def add_reaction(post_id, reaction_type, delta):
+    if write_behind_enabled():
+        field = _reaction_field(post_id, reaction_type)
+        _touch(post_id)
+        transaction.on_commit(lambda: get_redis().hincrby(REACTIONS_KEY, field, delta))
+    else:
+        ReactionCount.adjust(post_id, reaction_type, delta)
+
+
+def pending_like_deltas(post_ids):
+    """
+    Returns {post_id: delta} for the likes still buffered in Redis, including a flush in progress.
+    """
+    post_ids = list(post_ids)
+    if not write_behind_enabled() or not post_ids:
+        return {}
+    pending = {}
+    pipe = get_redis().pipeline(transaction=False)
+    for key in (LIKES_KEY, _flushing_key(LIKES_KEY)):
+        pipe.hmget(key, post_ids)
+    for values in pipe.execute():
+        for post_id, value in zip(post_ids, values):
+            if value:
+                pending[post_id] = pending.get(post_id, 0) + int(value)
+    return pending
+
+
+def pending_reaction_deltas(post_ids, reaction_types):
+    """
+    Returns {(post_id, reaction_type): delta} for the reactions still buffered in Redis.
+    """
+    fields = [(post_id, reaction_type) for post_id in post_ids for reaction_type in reaction_types]
+    if not write_behind_enabled() or not fields:
+        return {}
+    names = [_reaction_field(post_id, reaction_type) for post_id, reaction_type in fields]
+    pending = {}
+    pipe = get_redis().pipeline(transaction=False)
+    for key in (REACTIONS_KEY, _flushing_key(REACTIONS_KEY)):
+        pipe.hmget(key, names)
+    for values in pipe.execute():
+        for field, value in zip(fields, values):
+            if value:
+                pending[field] = pending.get(field, 0) + int(value)
+    return pending
+
+
+def settling_posts(post_ids):
+    """
+    Returns the ids among `post_ids` whose counters may not reflect their rows yet: posts with a
+    buffered delta, or with an event in the last SETTLE_SECONDS whose delta may still be on its way
+    to Redis. The reconciliation skips them.
+    """
+    post_ids = list(post_ids)
+    if not write_behind_enabled() or not post_ids:
+        return set()
+    reaction_types = [reaction_type for reaction_type, _ in Reaction.REACTION_CHOICES]
+    settling = set(pending_like_deltas(post_ids))
+    settling.update(post_id for post_id, _ in pending_reaction_deltas(post_ids, reaction_types))
+    pipe = get_redis().pipeline(transaction=False)
+    for post_id in post_ids:
+        pipe.zscore(TOUCHED_KEY, post_id)
+    cutoff = time.time() - SETTLE_SECONDS
+    settling.update(post_id for post_id, touched in zip(post_ids, pipe.execute()) if touched and touched > cutoff)
+    return settling
+
+
+def flush():
+    """
+    Applies every buffered delta to the database. Returns the number of counter rows updated.
+    """
+    r = get_redis()
+    like_flush, like_fields = _take(r, LIKES_KEY)
+    reaction_flush, reaction_fields = _take(r, REACTIONS_KEY)
+    likes = {int(post_id): int(delta) for post_id, delta in like_fields.items() if int(delta)}
+    reactions = {}
+    for field, delta in reaction_fields.items():
+        if int(delta):
+            post_id, reaction_type = field.split(':', 1)
+            reactions[int(post_id), reaction_type] = int(delta)
+
+    updated = 0
+    with transaction.atomic():
+        if _claim(like_flush):
+            updated += _apply_like_deltas(likes)
+        if _claim(reaction_flush):
+            updated += _apply_reaction_deltas(reactions)
+        CounterFlush.objects.filter(created_at__lt=timezone.now() - FLUSH_ID_RETENTION).delete()
+    r.delete(_flushing_key(LIKES_KEY), _flushing_key(REACTIONS_KEY))
+    r.zremrangebyscore(TOUCHED_KEY, '-inf', time.time() - SETTLE_SECONDS)
+    return updated
+
+
+def _reaction_field(post_id, reaction_type):
+    return f'{post_id}:{reaction_type}'
+
+
+def _flushing_key(key):
+    return f'{key}:flushing'
+
+
+def _touch(post_id):
+    get_redis().zadd(TOUCHED_KEY, {post_id: time.time()})
+
+
+def _take(r, key):
+    """
+    Moves the live hash aside and returns (flush id, contents), the id None when there is nothing
+    to flush. A hash left behind by a failed flush is returned on its own first, with the id it was
+    given then, so it is never overwritten by the rename.
+    """
+    flushing = _flushing_key(key)
+    if not r.exists(flushing):
+        if not r.exists(key):
+            return None, {}
+        r.rename(key, flushing)
+    # Events only reach the live hash, so the handed-over one keeps its first id.
+    r.hsetnx(flushing, FLUSH_ID_FIELD, uuid.uuid4().hex)
+    fields = r.hgetall(flushing)
+    return fields.pop(FLUSH_ID_FIELD, None), fields
+
+
+def _claim(flush_id):
+    """
+    Records `flush_id` as applied. Returns False when it already was, by a flush that died before
+    clearing its hash or one running concurrently.
+    """
+    if flush_id is None:
+        return False
+    _, created = CounterFlush.objects.get_or_create(flush_id=flush_id)
+    return created
+
+
+def _batches(items):
+    items = list(items)
+    for start in range(0, len(items), FLUSH_BATCH_SIZE):
+        yield items[start:start + FLUSH_BATCH_SIZE]
+
+
+def _apply_like_deltas(deltas):
+    updated = 0
+    for batch in _batches(deltas.items()):
+        existing_posts = set(Post.objects.filter(pk__in=[post_id for post_id, _ in batch]).values_list('pk', flat=True))
+        batch = [(post_id, delta) for post_id, delta in batch if post_id in existing_posts]
+        if not batch:
+            continue
+        _seed_like_counters([post_id for post_id, _ in batch])
+        updated += LikeCounter.objects.filter(post_id__in=[post_id for post_id, _ in batch]).update(
+            count=F('count') + Case(
+                *[When(post_id=post_id, then=Value(delta)) for post_id, delta in batch],
+                default=Value(0), output_field=IntegerField(),
+            )
+        )
+    return updated
+
+
+def _seed_like_counters(post_ids):
+    """
+    Creates the missing LikeCounter rows among `post_ids` from a recount of their likes, less the
+    deltas still buffered (this flush included), which the rows already counted but which are
+    about to be applied on top.
+    """
+    missing = set(post_ids) - set(LikeCounter.objects.filter(post_id__in=post_ids).values_list('post_id', flat=True))
+    if not missing:
+        return
+    recount = dict(
+        LikeCounter.source_model.objects.filter(post_id__in=missing)
+        .values('post_id').annotate(total=Count('id')).order_by().values_list('post_id', 'total')
+    )
+    pending = pending_like_deltas(missing)
+    LikeCounter.objects.bulk_create(
+        [LikeCounter(post_id=post_id, count=recount.get(post_id, 0) - pending.get(post_id, 0)) for post_id in missing],
+        ignore_conflicts=True,
+    )
+
+
+def _seed_reaction_counters(keys):
+    """
+    Creates the missing ReactionCount rows among the (post_id, reaction_type) `keys` the same way.
+    """
+    post_ids = {post_id for post_id, _ in keys}
+    missing = set(keys) - set(
+        ReactionCount.objects.filter(post_id__in=post_ids).values_list('post_id', 'reaction_type')
+    )
+    if not missing:
+        return
+    recount = {
+        (post_id, reaction_type): total
+        for post_id, reaction_type, total in Reaction.objects.filter(post_id__in={post_id for post_id, _ in missing})
+        .values('post_id', 'reaction_type').annotate(total=Count('id')).order_by().values_list('post_id', 'reaction_type', 'total')
+    }
+    pending = pending_reaction_deltas({post_id for post_id, _ in missing}, {reaction_type for _, reaction_type in missing})
+    ReactionCount.objects.bulk_create(
+        [ReactionCount(post_id=key[0], reaction_type=key[1], count=recount.get(key, 0) - pending.get(key, 0)) for key in missing],
+        ignore_conflicts=True,
+    )
+
+
+def _apply_reaction_deltas(deltas):
+    updated = 0
+    for batch in _batches(deltas.items()):
+        existing_posts = set(Post.objects.filter(pk__in={post_id for (post_id, _), _ in batch}).values_list('pk', flat=True))
+        batch = [(key, delta) for key, delta in batch if key[0] in existing_posts]
+        if not batch:
+            continue
+        _seed_reaction_counters([key for key, _ in batch])
+        for reaction_type in {reaction_type for (_, reaction_type), _ in batch}:
+            typed = [(post_id, delta) for (post_id, kind), delta in batch if kind == reaction_type]
+            updated += ReactionCount.objects.filter(
+                reaction_type=reaction_type, post_id__in=[post_id for post_id, _ in typed],
+            ).update(
+                count=F('count') + Case(
+                    *[When(post_id=post_id, then=Value(delta)) for post_id, delta in typed],
+                    default=Value(0), output_field=IntegerField(),
+                )
+            )
+    return updated
@@ -0,0 +1,99 @@
+"""
+Engagement summary of many posts at once, for clients refreshing the counters of the posts on
+screen.
+
+The shared part of a summary (author, like and comment counts, reaction histogram) is loaded with
+two grouped queries and, when ENGAGEMENT_SUMMARY_CACHE_TTL is set, cached per post in Redis for
+that many seconds. The viewer's own like and reaction are always read fresh, with one query each,
+and pending write-behind deltas are added on top (see post.counters).
+"""
+import json
+
+from django.conf import settings
+from django.db.models import OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from authentication.blocks import get_blocked_user_ids
+from trend.redis_store import get_redis
+
+from . import counters
+from .models import CommentCounter, LikeCounter, LikePost, Post, Reaction, ReactionCount
+
+
+def _cache_key(post_id):
+    return f'engagement:summary:{post_id}'
+
+
+def summarize(user, post_ids):
+    """
+    Returns the summaries of the given posts in request order. Posts that do not exist or whose
+    author is in a block relationship with `user` are left out.
+    """
+    post_ids = list(dict.fromkeys(post_ids))
+    shared = _shared_summaries(post_ids)
+    blocked = get_blocked_user_ids(user)
+    visible = [post_id for post_id in post_ids if post_id in shared and shared[post_id]['user_id'] not in blocked]
+    if not visible:
+        return []
+
+    liked = set(LikePost.objects.filter(user=user, post_id__in=visible).values_list('post_id', flat=True))
+    reactions = dict(Reaction.objects.filter(user=user, post_id__in=visible).values_list('post_id', 'reaction_type'))
+    pending_likes = counters.pending_like_deltas(visible)
+    reaction_types = [reaction_type for reaction_type, _ in Reaction.REACTION_CHOICES]
+    pending_reactions = counters.pending_reaction_deltas(visible, reaction_types)
+
+    results = []
+    for post_id in visible:
+        summary = shared[post_id]
+        histogram = dict(summary['reactions'])
+        for reaction_type in reaction_types:
+            delta = pending_reactions.get((post_id, reaction_type), 0)
+            if delta:
+                histogram[reaction_type] = histogram.get(reaction_type, 0) + delta
+        results.append({
+            'post_id': post_id,
+            'like_counter': summary['likes'] + pending_likes.get(post_id, 0),
+            'comment_counter': summary['comments'],
+            'reactions': {reaction_type: count for reaction_type, count in histogram.items() if count > 0},
+            'liked': post_id in liked,
+            'reaction': reactions.get(post_id),
+        })
+    return results
+
+
+def _shared_summaries(post_ids):
+    ttl = settings.ENGAGEMENT_SUMMARY_CACHE_TTL
+    summaries = {}
+    if ttl:
+        r = get_redis()
+        for post_id, cached in zip(post_ids, r.mget([_cache_key(post_id) for post_id in post_ids])):
+            if cached is not None:
+                summaries[post_id] = json.loads(cached)
+
+    missing = [post_id for post_id in post_ids if post_id not in summaries]
+    if missing:
+        loaded = _load(missing)
+        summaries.update(loaded)
+        if ttl and loaded:
+            pipe = r.pipeline(transaction=False)
+            for post_id, summary in loaded.items():
+                pipe.set(_cache_key(post_id), json.dumps(summary), ex=ttl)
+            pipe.execute()
+    return summaries
+
+
+def _load(post_ids):
+    likes = LikeCounter.objects.filter(post=OuterRef('pk')).values('count')[:1]
+    comments = CommentCounter.objects.filter(post=OuterRef('pk')).values('count')[:1]
+    rows = Post.objects.filter(pk__in=post_ids).annotate(
+        likes_total=Coalesce(Subquery(likes), 0),
+        comments_total=Coalesce(Subquery(comments), 0),
+    ).values_list('pk', 'user_id', 'likes_total', 'comments_total')
+    summaries = {
+        post_id: {'user_id': user_id, 'likes': likes_total, 'comments': comments_total, 'reactions': {}}
+        for post_id, user_id, likes_total, comments_total in rows
+    }
+    histogram = ReactionCount.objects.filter(post_id__in=summaries, count__gt=0)
+    for post_id, reaction_type, count in histogram.values_list('post_id', 'reaction_type', 'count'):
+        summaries[post_id]['reactions'][reaction_type] = count
+    return summaries
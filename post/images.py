@@ -0,0 +1,141 @@
+"""
+Responsive renditions of post images.
+
+Each original upload is decoded once, rotated according to its EXIF orientation, and re-encoded
+at every width in POST_IMAGE_WIDTHS that is not larger than the original, as WebP and as
+progressive JPEG. Re-encoding without passing `exif` strips the metadata (GPS position, camera
+serial numbers) from every rendition. The results are stored as PostImageVariant rows, and
+PostSerializer exposes them as a srcset-style map.
+
+The same task stores a BlurHash of the image on Post.image_placeholder for clients to paint
+while the image loads.
+
+Post images are content-addressed (uploads/blobs.py), so a repost of an image shares the stored
+original; its renditions and placeholder are copied from the earlier post instead of rendered.
+Rendition files can therefore be named by several posts' rows: replaced renditions only have
+their files deleted once no PostImageVariant names them any more.
+
+render_variants() and render_placeholder() only work on bytes, so the backfill command can run
+them in a process pool.
+"""
+from collections import namedtuple
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from PIL import Image, ImageOps
+
+from trend import blurhash
+
+from .models import Post, PostImageVariant, _returning
+
+Rendition = namedtuple('Rendition', 'width height format data')
+
+# Format name as stored on PostImageVariant -> (Pillow format, file extension, save options).
+ENCODINGS = {
+    PostImageVariant.WEBP: ('WEBP', 'webp', {'quality': 80, 'method': 4}),
+    PostImageVariant.JPEG: ('JPEG', 'jpg', {'quality': 82, 'progressive': True, 'optimize': True}),
+}
+
+
+def render_variants(data, widths=None):
+    """
+    Returns a Rendition per (width, format) for the encoded image in `data`. Widths larger than
+    the original are skipped; an image narrower than every width gets a single rendition at its
+    own width.
+    """
+    widths = sorted(set(widths or settings.POST_IMAGE_WIDTHS))
+    with Image.open(BytesIO(data)) as original:
+        image = ImageOps.exif_transpose(original)
+        image = image.convert('RGB')
+
+    targets = [width for width in widths if width <= image.width] or [image.width]
+    renditions = []
+    for width in targets:
+        height = max(1, round(image.height * width / image.width))
+        resized = image if width == image.width else image.resize((width, height), Image.LANCZOS)
+        for format_name, (pillow_format, _, options) in ENCODINGS.items():
+            buffer = BytesIO()
+            resized.save(buffer, pillow_format, **options)
+            renditions.append(Rendition(width, height, format_name, buffer.getvalue()))
+    return renditions
+
+
+def render_placeholder(data):
+    with Image.open(BytesIO(data)) as image:
+        return blurhash.encode_image(image)
+
+
+def read_original(post):
+    with post.image.open('rb') as original:
+        return original.read()
+
+
+def store_variants(post, renditions):
+    """
+    Saves the renditions of `post` and replaces any it had before. Returns the stored variants.
+    """
+    variants = []
+    for rendition in renditions:
+        extension = ENCODINGS[rendition.format][1]
+        variant = PostImageVariant(post=post, width=rendition.width, height=rendition.height, format=rendition.format)
+        variant.image.save(f'{post.pk}/{rendition.width}.{extension}', ContentFile(rendition.data), save=False)
+        variants.append(variant)
+    _replace_variants(post, variants)
+    return variants
+
+
+def _replace_variants(post, variants):
+    with transaction.atomic():
+        replaced = {name for name, in _returning(
+            PostImageVariant, 'DELETE FROM {table} WHERE post_id = %s RETURNING image', [post.pk],
+        )}
+        PostImageVariant.objects.bulk_create(variants)
+        replaced -= {variant.image.name for variant in variants}
+        if replaced:
+            transaction.on_commit(lambda: release_files(replaced))
+
+
+def release_files(names):
+    """
+    Deletes the rendition files in `names` that no PostImageVariant names any more; copies made for
+    reposts share the files of the post they were copied from.
+    """
+    shared = set(PostImageVariant.objects.filter(image__in=names).values_list('image', flat=True))
+    for name in set(names) - shared:
+        default_storage.delete(name)
+
+
+def store_placeholder(post, placeholder):
+    Post.objects.filter(pk=post.pk).update(image_placeholder=placeholder)
+    post.image_placeholder = placeholder
+
+
+def variant_source(post):
+    """
+    Returns another post showing the same stored image that already has renditions, if any.
+    """
+    rendered = Exists(PostImageVariant.objects.filter(post=OuterRef('pk')))
+    return Post.objects.filter(rendered, image=post.image.name).exclude(pk=post.pk).order_by('pk').first()
+
+
+def copy_variants(source, post):
+    variants = [
+        PostImageVariant(post=post, width=variant.width, height=variant.height, format=variant.format, image=variant.image.name)
+        for variant in PostImageVariant.objects.filter(post=source)
+    ]
+    _replace_variants(post, variants)
+    store_placeholder(post, source.image_placeholder)
+    return variants
+
+
+def generate_variants(post):
+    source = variant_source(post)
+    if source is not None:
+        return copy_variants(source, post)
+    data = read_original(post)
+    store_placeholder(post, render_placeholder(data))
+    return store_variants(post, render_variants(data))
@@ -0,0 +1,66 @@
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models import Exists, OuterRef
+
+from post import images
+from post.models import Post, PostImageVariant
+
+
+class Command(BaseCommand):
+    help = 'Generate the responsive image renditions and placeholders of existing posts'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=None, help='Encoding processes (default: one per CPU).')
+        parser.add_argument('--batch-size', type=int, default=50, help='Images read and encoded per round.')
+        parser.add_argument('--all', action='store_true', help='Also regenerate posts that already have renditions.')
+
+    def handle(self, *args, **options):
+        """
+        Reads the originals and stores the results in this process, and only the decode/resize/encode
+        work runs in the pool, so the workers need neither database connections nor storage access.
+        """
+        posts = Post.objects.exclude(image='').order_by('pk')
+        if not options['all']:
+            posts = posts.exclude(Exists(PostImageVariant.objects.filter(post=OuterRef('pk'))))
+
+        done = failed = 0
+        last_pk = 0
+        with ProcessPoolExecutor(max_workers=options['workers']) as pool:
+            while True:
+                batch = list(posts.filter(pk__gt=last_pk)[:options['batch_size']])
+                if not batch:
+                    break
+                last_pk = batch[-1].pk
+
+                originals = {}
+                for post in batch:
+                    source = images.variant_source(post)
+                    if source is not None:
+                        images.copy_variants(source, post)
+                        done += 1
+                        continue
+                    try:
+                        originals[post] = images.read_original(post)
+                    except Exception as exc:
+                        failed += 1
+                        self.stderr.write(f'Post {post.pk}: cannot read {post.image.name}: {exc}')
+
+                futures = {
+                    post: (
+                        pool.submit(images.render_variants, data, settings.POST_IMAGE_WIDTHS),
+                        pool.submit(images.render_placeholder, data),
+                    )
+                    for post, data in originals.items()
+                }
+                for post, (variants, placeholder) in futures.items():
+                    try:
+                        images.store_variants(post, variants.result())
+                        images.store_placeholder(post, placeholder.result())
+                        done += 1
+                    except Exception as exc:
+                        failed += 1
+                        self.stderr.write(f'Post {post.pk}: {exc}')
+
+        self.stdout.write(self.style.SUCCESS(f'Generated renditions for {done} posts ({failed} failed).'))
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from post import counters
+from post.models import Post
+from post.tasks import reconcile_reaction_counts
+
+
+class Command(BaseCommand):
+    help = 'Build the per-post reaction histogram (ReactionCount) from existing Reaction rows'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Posts processed per query.')
+
+    def handle(self, *args, **options):
+        """
+        Walks the posts by primary key and rewrites the histogram rows that differ from the source,
+        so the command can be re-run safely.
+        """
+        counters.flush()
+        written = 0
+        last_pk = 0
+        while True:
+            post_ids = list(
+                Post.objects.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:options['chunk_size']]
+            )
+            if not post_ids:
+                break
+            last_pk = post_ids[-1]
+            written += reconcile_reaction_counts(post_ids)
+
+        self.stdout.write(self.style.SUCCESS(f'Wrote {written} reaction counts.'))
@@ -0,0 +1,48 @@
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+
+from post import timeline
+from profile_app.models import Follow
+from trend.redis_store import get_redis
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the fan-out-on-write home timelines from existing Follow rows'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Follow rows loaded per query.')
+
+    def handle(self, *args, **options):
+        """
+        Marks the authors served by fan-out-on-read first, then loads every follower's timeline with
+        the recent posts of the remaining authors they follow (and their own posts).
+        """
+        r = get_redis()
+        celebrities = list(
+            Follow.objects.values('following_id')
+            .annotate(followers=Count('id'))
+            .filter(followers__gte=settings.TIMELINE_FANOUT_THRESHOLD)
+            .values_list('following_id', flat=True)
+        )
+        r.delete(timeline.CELEBRITIES_KEY)
+        if celebrities:
+            r.sadd(timeline.CELEBRITIES_KEY, *celebrities)
+
+        followed = defaultdict(list)
+        rows = (
+            Follow.objects.exclude(follower=None).exclude(following=None)
+            .values_list('follower_id', 'following_id')
+            .iterator(chunk_size=options['batch_size'])
+        )
+        for follower_id, following_id in rows:
+            followed[follower_id].append(following_id)
+
+        for follower_id, author_ids in followed.items():
+            timeline.backfill(follower_id, author_ids + [follower_id])
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Backfilled {len(followed)} timelines ({len(celebrities)} authors served on read).'
+        ))
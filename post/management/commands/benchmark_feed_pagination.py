@@ -0,0 +1,72 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import RequestFactory
+from rest_framework.request import Request
+
+from authentication.models import CustomUser
+from authentication.pagination import CustomPageNumberPagination, KeysetCursorPagination
+from post.models import Post
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Compare page-number and keyset pagination latency of the post feed on a seeded table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=100_000, help='Number of posts to seed.')
+        parser.add_argument('--pages', type=int, nargs='+', default=[1, 100, 10_000], help='Pages to measure.')
+        parser.add_argument('--repeat', type=int, default=5, help='Runs per measurement; the best is reported.')
+
+    def handle(self, *args, **options):
+        """
+        Seeds the table inside a transaction that is rolled back at the end, so the benchmark can be
+        run against a development database without leaving rows behind.
+        """
+        try:
+            with transaction.atomic():
+                self.seed(options['posts'])
+                self.measure(options['pages'], options['repeat'])
+                raise _Rollback
+        except _Rollback:
+            pass
+
+    def seed(self, total):
+        user = CustomUser.objects.create(username='pagination-bench', email='pagination-bench@example.com')
+        batch = [Post(user=user, image='images/bench.jpg', content=f'post {i}') for i in range(total)]
+        Post.objects.bulk_create(batch, batch_size=5000)
+        self.stdout.write(f'Seeded {total} posts.')
+
+    def measure(self, pages, repeat):
+        factory = RequestFactory()
+        queryset = Post.objects.all()
+        page_size = CustomPageNumberPagination.page_size
+
+        self.stdout.write(f"{'page':>8} {'offset (ms)':>12} {'keyset (ms)':>12}")
+        for page in pages:
+            offset_request = Request(factory.get('/posts/', {'p': page}))
+            offset_ms = self.best_of(repeat, lambda: CustomPageNumberPagination().paginate_queryset(
+                queryset, offset_request))
+
+            # The cursor for page N is the last row of page N - 1; resolving it is not part of the timing.
+            keyset_params = {'cursor': ''}
+            if page > 1:
+                anchor = queryset.order_by('-created_at', '-id')[(page - 1) * page_size - 1]
+                keyset_params['cursor'] = KeysetCursorPagination().cursor_token(anchor)
+            keyset_request = Request(factory.get('/posts/', keyset_params))
+            keyset_ms = self.best_of(repeat, lambda: KeysetCursorPagination().paginate_queryset(
+                queryset, keyset_request))
+
+            self.stdout.write(f'{page:>8} {offset_ms:>12.2f} {keyset_ms:>12.2f}')
+
+    def best_of(self, repeat, run):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            run()
+            timings.append((time.perf_counter() - started) * 1000)
+        return min(timings)
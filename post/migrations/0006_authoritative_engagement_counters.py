@@ -0,0 +1,39 @@
+# Generated by Django 4.2.16 on 2026-10-18 11:21
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def rebuild_counters(apps, schema_editor):
+    """
+    Counters could hold duplicate rows per post and stale totals, so rebuild them from the source
+    rows before the unique constraints are added.
+    """
+    for counter_name, source_name in (('LikeCounter', 'LikePost'), ('CommentCounter', 'Comment')):
+        Counter = apps.get_model('post', counter_name)
+        Source = apps.get_model('post', source_name)
+        Counter.objects.all().delete()
+        totals = Source.objects.values('post_id').annotate(total=Count('id')).order_by()
+        Counter.objects.bulk_create(
+            [Counter(post_id=row['post_id'], count=row['total']) for row in totals],
+            batch_size=1000,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('post', '0005_keyset_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(rebuild_counters, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='commentcounter',
+            constraint=models.UniqueConstraint(fields=('post',), name='unique_commentcounter_per_post'),
+        ),
+        migrations.AddConstraint(
+            model_name='likecounter',
+            constraint=models.UniqueConstraint(fields=('post',), name='unique_likecounter_per_post'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.16 on 2026-10-18 11:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('post', '0008_trending_scores'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='reaction',
+            index=models.Index(fields=['post', '-created_at', '-id'], name='reaction_post_created_id_idx'),
+        ),
+    ]
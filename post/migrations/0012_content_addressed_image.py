@@ -0,0 +1,19 @@
+# Generated by Django 4.2.16 on 2026-10-18 11:48
+
+from django.db import migrations
+import uploads.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('post', '0011_post_image_placeholder'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='post',
+            name='image',
+            field=uploads.fields.ContentAddressedImageField(upload_to='images/'),
+        ),
+    ]
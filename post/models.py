@@ -1,17 +1,75 @@
-from django.db import models
+from django.db import connection, models, transaction
+from django.utils import timezone
 from authentication.models import CustomUser
 from profile_app.models import Profile
-from django.db.models import Count
+from django.db.models import Exists, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from uploads.fields import ContentAddressedImageField
+
+# A toggle retries when a concurrent toggle removed or re-created the row between its statements.
+TOGGLE_ATTEMPTS = 3
+
+
+def _returning(model, sql, params):
+    """
+    Runs an INSERT/DELETE ... RETURNING statement against `model`'s table and returns the rows.
+    `{table}` in `sql` is replaced with the quoted table name.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(sql.format(table=connection.ops.quote_name(model._meta.db_table)), params)
+        return cursor.fetchall()
+
+
+def _now():
+    return connection.ops.adapt_datetimefield_value(timezone.now())
+
+
+class PostQuerySet(models.QuerySet):
+    def with_engagement(self, user=None):
+        """
+        Annotates like and comment totals and whether `user` liked each post, joins the author and
+        their profile and prefetches the reaction histogram, so serializing a page of posts does not
+        run queries per row.
+        """
+        likes = LikeCounter.objects.filter(post=OuterRef('pk')).values('count')[:1]
+        comments = CommentCounter.objects.filter(post=OuterRef('pk')).values('count')[:1]
+        if user is not None and user.is_authenticated:
+            viewer_liked = Exists(LikePost.objects.filter(post=OuterRef('pk'), user=user))
+        else:
+            viewer_liked = Value(False)
+        return self.select_related('user', 'user__profile').prefetch_related('reaction_counts').annotate(
+            likes_total=Coalesce(Subquery(likes), 0),
+            comments_total=Coalesce(Subquery(comments), 0),
+            viewer_liked=viewer_liked,
+        )
+
+    def with_media(self):
+        """
+        Prefetches the image renditions used by PostSerializer's `srcset`.
+        """
+        return self.prefetch_related('image_variants')
 
 
 class Post(models.Model):
     user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='posts')
     profile = models.ForeignKey(Profile, on_delete=models.CASCADE, related_name='posts', null=True)
-    image = models.ImageField(upload_to='images/', blank=False, null=False)
+    image = ContentAddressedImageField(upload_to='images/', blank=False, null=False)
+    # BlurHash of the image, filled in by the rendition task (see post.images).
+    image_placeholder = models.CharField(max_length=64, blank=True, default='')
     content = models.CharField(max_length=1000, blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = PostQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Keyset pagination of the feed walks this index instead of sorting the whole table.
+            models.Index(fields=['-created_at', '-id'], name='post_created_id_idx'),
+        ]
+
     def __str__(self) -> str:
         return f"{self.content} "
 
@@ -24,14 +82,26 @@ class Post(models.Model):
     like_count.short_description = 'Like Count'
     comment_count.short_description = 'Comment Count'
 
-    def top_reactions(self, top_n=3):
+    def reaction_histogram(self):
         """
-        Retrieves the top N most used reactions for the post.
+        Returns {reaction_type: count} from the materialized ReactionCount rows, using the
+        prefetched `reaction_counts` when the queryset provides them.
         """
-        top_reactions = self.post_reactions.values('reaction_type').annotate(
-            count=Count('reaction_type')
-        ).order_by('-count')[:top_n]
-        return top_reactions
+        return {counter.reaction_type: counter.count for counter in self.reaction_counts.all() if counter.count > 0}
+
+    def top_reactions(self, top_n=3, pending=None):
+        """
+        Retrieves the top N most used reactions for the post. `pending` maps reaction types to
+        deltas not yet written to the histogram (see post.counters).
+        """
+        histogram = self.reaction_histogram()
+        for reaction_type, delta in (pending or {}).items():
+            histogram[reaction_type] = histogram.get(reaction_type, 0) + delta
+        ranked = sorted(
+            ((reaction_type, count) for reaction_type, count in histogram.items() if count > 0),
+            key=lambda item: (-item[1], item[0]),
+        )
+        return [{'reaction_type': reaction_type, 'count': count} for reaction_type, count in ranked[:top_n]]
 
     def top_reactions_display(self, top_n=3):
         """
@@ -53,6 +123,11 @@ class Comment(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['post', '-created_at', '-id'], name='comment_post_created_id_idx'),
+        ]
+
     def __str__(self) -> str:
         return f"{self.user.username}: {self.content[:20]}..."
 
@@ -64,30 +139,178 @@ class LikePost(models.Model):
 
     class Meta:
         unique_together = ('post', 'user')
-    
+        indexes = [
+            models.Index(fields=['post', '-created_at'], name='likepost_post_created_idx'),
+        ]
+
     def __str__(self):
         return f"{self.user.username} liked post {self.post.id}"
 
     @classmethod
     def toggle_like(cls, post, user):
-        try:
-            like = cls.objects.get(post=post, user=user)
-            like.delete()
-            return False
-        except cls.DoesNotExist:
-            cls.objects.create(post=post, user=user)
-            return True
+        return cls.toggle(post.pk, user.pk)[0]
+
+    @classmethod
+    def toggle(cls, post_id, user_id):
+        """
+        Likes or unlikes a post and returns (liked, counter delta). Each step is one
+        INSERT ... ON CONFLICT DO NOTHING or DELETE ... RETURNING statement, so concurrent taps
+        never raise IntegrityError and no SELECT is needed first.
+        """
+        from post import counters
+
+        with transaction.atomic():
+            for _ in range(TOGGLE_ATTEMPTS):
+                if _returning(cls, (
+                    'INSERT INTO {table} (post_id, user_id, created_at) VALUES (%s, %s, %s) '
+                    'ON CONFLICT (post_id, user_id) DO NOTHING RETURNING id'
+                ), [post_id, user_id, _now()]):
+                    counters.add_like(post_id, 1)
+                    return True, 1
+                if _returning(cls, 'DELETE FROM {table} WHERE post_id = %s AND user_id = %s RETURNING id', [post_id, user_id]):
+                    counters.add_like(post_id, -1)
+                    return False, -1
+        raise RuntimeError(f'Could not toggle the like of user {user_id} on post {post_id}.')
 
 
-class LikeCounter(models.Model):
+class EngagementCounter(models.Model):
+    """
+    Denormalized per-post total. It is the source of truth for the feed: the receivers below move it
+    with an atomic F() update in the same transaction as the like or comment row, and
+    post.tasks.reconcile_engagement_counters repairs any drift.
+    """
     post = models.ForeignKey(Post, on_delete=models.CASCADE)
     count = models.IntegerField(default=0)
+    # The model whose rows, one per engagement, the count totals. Set by each concrete counter.
+    source_model = None
 
+    class Meta:
+        abstract = True
+        constraints = [
+            models.UniqueConstraint(fields=['post'], name='unique_%(class)s_per_post'),
+        ]
 
-class CommentCounter(models.Model):
-    post = models.ForeignKey(Post, on_delete=models.CASCADE)
+    @classmethod
+    def adjust(cls, post_id, delta):
+        updated = cls.objects.filter(post_id=post_id).update(count=F('count') + delta)
+        if updated or delta < 0:
+            # Decrements never create a row: the post may be going away in the same cascade.
+            return
+        # First engagement on this post: seed the counter from the source rows, which already
+        # include the row that triggered this call.
+        counter, created = cls.objects.get_or_create(
+            post_id=post_id, defaults={'count': cls.source_model.objects.filter(post_id=post_id).count()}
+        )
+        if not created:
+            cls.objects.filter(pk=counter.pk).update(count=F('count') + delta)
+
+
+class LikeCounter(EngagementCounter):
+    source_model = LikePost
+
+
+class CommentCounter(EngagementCounter):
+    source_model = Comment
+
+
+class ReactionCount(models.Model):
+    """
+    Number of reactions of one type on a post. Moved by Reaction.toggle_reaction through
+    post.counters, either directly or through the write-behind buffer.
+    """
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='reaction_counts')
+    reaction_type = models.CharField(max_length=20)
     count = models.IntegerField(default=0)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['post', 'reaction_type'], name='unique_reaction_count_per_type'),
+        ]
+
+    def __str__(self):
+        return f"{self.reaction_type} x{self.count} on post {self.post_id}"
+
+    @classmethod
+    def adjust(cls, post_id, reaction_type, delta):
+        updated = cls.objects.filter(post_id=post_id, reaction_type=reaction_type).update(count=F('count') + delta)
+        if updated or delta < 0:
+            return
+        counter, created = cls.objects.get_or_create(
+            post_id=post_id, reaction_type=reaction_type,
+            defaults={'count': Reaction.objects.filter(post_id=post_id, reaction_type=reaction_type).count()},
+        )
+        if not created:
+            cls.objects.filter(pk=counter.pk).update(count=F('count') + delta)
+
+
+class PostImageVariant(models.Model):
+    """
+    Resized, EXIF-stripped rendition of a post image in one format (see post.images).
+    """
+    WEBP = 'webp'
+    JPEG = 'jpeg'
+    FORMAT_CHOICES = [
+        (WEBP, 'WebP'),
+        (JPEG, 'JPEG'),
+    ]
+
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='image_variants')
+    width = models.PositiveIntegerField()
+    height = models.PositiveIntegerField()
+    format = models.CharField(max_length=10, choices=FORMAT_CHOICES)
+    image = models.ImageField(upload_to='images/variants/')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['post', 'width', 'format'], name='unique_post_image_variant'),
+        ]
+
+    def __str__(self):
+        return f"post {self.post_id} {self.format} {self.width}w"
+
+
+class PostScore(models.Model):
+    """
+    Time-decayed engagement score of a recently active post, refreshed by post.trending.refresh().
+    Posts whose score decays below TRENDING_MIN_SCORE are removed from the table.
+    """
+    post = models.OneToOneField(Post, on_delete=models.CASCADE, primary_key=True, related_name='trending')
+    score = models.FloatField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-score', '-post'], name='postscore_score_idx'),
+        ]
+
+    def __str__(self):
+        return f"post {self.post_id} scored {self.score:.2f}"
+
+
+class TrendingWatermark(models.Model):
+    """
+    Single row holding the time the trending scores were last computed for; events after it are
+    the only ones read by the next refresh.
+    """
+    SINGLETON_PK = 1
+
+    computed_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"trending computed at {self.computed_at}"
+
+
+class CounterFlush(models.Model):
+    """
+    A batch of buffered counter deltas applied by post.counters.flush(), recorded in the same
+    transaction so that a flush dying before it clears the batch from Redis does not apply it twice.
+    """
+    flush_id = models.CharField(max_length=32, unique=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"counter flush {self.flush_id}"
+
 
 class HiddenPost(models.Model):
     user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='hidden_posts')
@@ -121,6 +344,10 @@ class Reaction(models.Model):
         constraints = [
             models.UniqueConstraint(fields=['post', 'user'], name='unique_reaction_per_user_per_post')
         ]
+        indexes = [
+            # Keyset pagination of the reactors of a post.
+            models.Index(fields=['post', '-created_at', '-id'], name='reaction_post_created_id_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.username} reacted {self.get_reaction_type_display()} to post {self.post.id}"
@@ -130,15 +357,77 @@ class Reaction(models.Model):
         """
         Toggles a user's reaction on a post. Removes the reaction if it's the same type; otherwise, updates it.
         """
-        try:
-            reaction = cls.objects.get(post=post, user=user)
-            if reaction.reaction_type == reaction_type:
-                reaction.delete()
-                return False
+        return cls.toggle(post.pk, user.pk, reaction_type)[0] is not None
+
+    @classmethod
+    def toggle(cls, post_id, user_id, reaction_type):
+        """
+        Toggles a reaction and returns (resulting reaction type or None, {reaction type: counter
+        delta}). The current reaction is read and changed with one statement guarded on it: a new
+        reaction is INSERT ... ON CONFLICT DO NOTHING, another type INSERT ... ON CONFLICT DO UPDATE,
+        which keeps the row's id and created_at (its place among the reactors), and the same type
+        DELETE ... RETURNING. A concurrent toggle makes the guard match nothing and the toggle is
+        retried, so it never raises IntegrityError or moves the wrong counter.
+        """
+        from post import counters
+
+        with transaction.atomic():
+            for _ in range(TOGGLE_ATTEMPTS):
+                current = cls.objects.filter(post_id=post_id, user_id=user_id).values_list('id', 'reaction_type').first()
+                if current is None:
+                    if _returning(cls, (
+                        'INSERT INTO {table} (post_id, user_id, reaction_type, created_at) VALUES (%s, %s, %s, %s) '
+                        'ON CONFLICT (post_id, user_id) DO NOTHING RETURNING id'
+                    ), [post_id, user_id, reaction_type, _now()]):
+                        state, deltas = reaction_type, {reaction_type: 1}
+                        break
+                    continue
+                current_id, current_type = current
+                if current_type == reaction_type:
+                    if _returning(cls, 'DELETE FROM {table} WHERE id = %s AND reaction_type = %s RETURNING id', [current_id, reaction_type]):
+                        state, deltas = None, {reaction_type: -1}
+                        break
+                    continue
+                upserted = _returning(cls, (
+                    'INSERT INTO {table} (post_id, user_id, reaction_type, created_at) VALUES (%s, %s, %s, %s) '
+                    'ON CONFLICT (post_id, user_id) DO UPDATE SET reaction_type = excluded.reaction_type '
+                    'WHERE {table}.reaction_type = %s RETURNING id'
+                ), [post_id, user_id, reaction_type, _now(), current_type])
+                if upserted:
+                    state = reaction_type
+                    if upserted[0][0] == current_id:
+                        deltas = {current_type: -1, reaction_type: 1}
+                    else:
+                        # The reaction was removed meanwhile and this one inserted afresh.
+                        deltas = {reaction_type: 1}
+                    break
             else:
-                reaction.reaction_type = reaction_type
-                reaction.save()
-                return True
-        except cls.DoesNotExist:
-            cls.objects.create(post=post, user=user, reaction_type=reaction_type)
-            return True
+                raise RuntimeError(f'Could not toggle the reaction of user {user_id} on post {post_id}.')
+
+            for changed_type, delta in deltas.items():
+                counters.add_reaction(post_id, changed_type, delta)
+        return state, deltas
+
+
+@receiver(post_save, sender=LikePost)
+def increment_like_counter(sender, instance, created, **kwargs):
+    if created:
+        from post import counters
+        counters.add_like(instance.post_id, 1)
+
+
+@receiver(post_delete, sender=LikePost)
+def decrement_like_counter(sender, instance, **kwargs):
+    from post import counters
+    counters.add_like(instance.post_id, -1)
+
+
+@receiver(post_save, sender=Comment)
+def increment_comment_counter(sender, instance, created, **kwargs):
+    if created:
+        CommentCounter.adjust(instance.post_id, 1)
+
+
+@receiver(post_delete, sender=Comment)
+def decrement_comment_counter(sender, instance, **kwargs):
+    CommentCounter.adjust(instance.post_id, -1)
@@ -1,7 +1,10 @@
+from django.conf import settings
 from rest_framework import serializers
+from authentication.fieldsets import SparseFieldsetsMixin
 from authentication.models import CustomUser
 from .models import Post, Comment, HiddenPost, Reaction
-from profile_app.serializers import ProfileSerializer
+from . import counters
+from profile_app.serializers import ProfileSummarySerializer
 
 # Serializer for the Comment model, handles serialization of comment data
 class CommentSerializer(serializers.ModelSerializer):
@@ -16,31 +19,80 @@ class CommentSerializer(serializers.ModelSerializer):
         read_only_fields = ('id', 'custom_user_id', 'created_at', 'updated_at')
 
 # Serializer for the Post model, includes user info and custom fields for likes and comments
-class PostSerializer(serializers.ModelSerializer):
+class PostSerializer(SparseFieldsetsMixin, serializers.ModelSerializer):
     custom_user_id = serializers.ReadOnlyField(source='user.id')
     username = serializers.CharField(source='user.username', read_only=True)
     profile_id = serializers.ReadOnlyField(source='user.profile.id')
-    avatar = serializers.ImageField(source='user.avatar', read_only=True)
+    # The URL and its BlurHash both come from the profile avatar, so the placeholder matches the image.
+    avatar = serializers.ImageField(source='user.profile.avatar', read_only=True)
+    avatar_placeholder = serializers.ReadOnlyField(source='user.profile.avatar_placeholder')
     like_counter = serializers.SerializerMethodField()
     comment_counter = serializers.SerializerMethodField()
     liked = serializers.SerializerMethodField()
+    top_reactions = serializers.SerializerMethodField()
+    srcset = serializers.SerializerMethodField()
 
     class Meta:
         model = Post
-        fields = ('id', 'custom_user_id', 'profile_id', 'username', 'avatar', 'image', 'content', 'created_at', 'updated_at', 'like_counter', 'comment_counter', 'liked')
+        fields = ('id', 'custom_user_id', 'profile_id', 'username', 'avatar', 'avatar_placeholder', 'image', 'image_placeholder', 'srcset', 'content', 'created_at', 'updated_at', 'like_counter', 'comment_counter', 'liked', 'top_reactions')
+        # What each field reads from Post.objects.with_engagement().with_media(); see authentication.fieldsets.
+        sparse_requirements = {
+            'like_counter': ('likes_total',),
+            'comment_counter': ('comments_total',),
+            'liked': ('viewer_liked',),
+            'top_reactions': ('reaction_counts',),
+            'srcset': ('image_variants',),
+        }
 
     def get_username(self, obj):
         return obj.user.username if obj.user else None
 
+    # The counters and `liked` are read from Post.objects.with_engagement() annotations when the
+    # view provides them, and fall back to per-row queries otherwise.
     def get_like_counter(self, obj):
+        if hasattr(obj, 'likes_total'):
+            return obj.likes_total + self.pending_likes(obj)
         return obj.like_count()
 
+    def pending_likes(self, obj):
+        # Likes still in the write-behind buffer, fetched once for the whole page.
+        pending = self.context.get('pending_like_deltas')
+        if pending is None:
+            pending = self.context['pending_like_deltas'] = counters.pending_like_deltas(self.page_ids(obj))
+        return pending.get(obj.pk, 0)
+
+    def pending_reactions(self, obj):
+        pending = self.context.get('pending_reaction_deltas')
+        if pending is None:
+            reaction_types = [reaction_type for reaction_type, _ in Reaction.REACTION_CHOICES]
+            pending = self.context['pending_reaction_deltas'] = counters.pending_reaction_deltas(
+                self.page_ids(obj), reaction_types)
+        return {reaction_type: delta for (post_id, reaction_type), delta in pending.items() if post_id == obj.pk}
+
+    def page_ids(self, obj):
+        posts = self.root.instance if isinstance(self.root, serializers.ListSerializer) else [obj]
+        return [post.pk for post in posts]
+
+    def get_srcset(self, obj):
+        # {format: {width: url}} of the renditions built by post.images; empty until they are ready.
+        srcset = {}
+        for variant in sorted(obj.image_variants.all(), key=lambda variant: variant.width):
+            srcset.setdefault(variant.format, {})[str(variant.width)] = variant.image.url
+        return srcset
+
+    def get_top_reactions(self, obj):
+        return obj.top_reactions(pending=self.pending_reactions(obj))
+
     def get_comment_counter(self, obj):
+        if hasattr(obj, 'comments_total'):
+            return obj.comments_total
         return obj.comment_count()
 
     def get_liked(self, obj):
         request = self.context.get('request')
         if request and hasattr(request, 'user') and request.user.is_authenticated:
+            if hasattr(obj, 'viewer_liked'):
+                return obj.viewer_liked
             return obj.likes.filter(user=request.user).exists()
         return False
 
@@ -49,6 +101,40 @@ class LikeToggleSerializer(serializers.Serializer):
     post_id = serializers.PrimaryKeyRelatedField(queryset=Post.objects.all())
     # user_id = serializers.PrimaryKeyRelatedField(queryset=CustomUser.objects.all())
 
+# Serializer for the post ids of a bulk engagement summary request
+class EngagementSummaryRequestSerializer(serializers.Serializer):
+    post_ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=settings.ENGAGEMENT_SUMMARY_MAX_IDS,
+    )
+
+# Serializer for one operation of a batch of like, reaction and hide actions (see post.actions)
+class BatchOperationSerializer(serializers.Serializer):
+    TYPE_CHOICES = ['like', 'reaction', 'hide']
+
+    type = serializers.ChoiceField(choices=TYPE_CHOICES)
+    post_id = serializers.IntegerField(min_value=1)
+    value = serializers.JSONField(allow_null=True)
+
+    def validate(self, data):
+        value = data['value']
+        if data['type'] == 'reaction':
+            reaction_types = [reaction_type for reaction_type, _ in Reaction.REACTION_CHOICES]
+            if value is not None and value not in reaction_types:
+                raise serializers.ValidationError({'value': 'Must be a reaction type or null.'})
+        elif not isinstance(value, bool):
+            raise serializers.ValidationError({'value': 'Must be true or false.'})
+        return data
+
+# Serializer for a batch of like, reaction and hide actions
+class BatchActionsSerializer(serializers.Serializer):
+    operations = serializers.ListField(
+        child=BatchOperationSerializer(),
+        allow_empty=False,
+        max_length=settings.BATCH_ACTIONS_MAX_OPERATIONS,
+    )
+
 # Serializer for creating new Post instances
 class CreatePostSerializer(serializers.ModelSerializer):
 
@@ -69,12 +155,22 @@ class CreateCommentSerializer(serializers.ModelSerializer):
 
 # Serializer for displaying users who liked a post
 class LikerSerializer(serializers.ModelSerializer):
-    profile = ProfileSerializer(read_only=True)
+    profile = ProfileSummarySerializer(read_only=True)
 
     class Meta:
         model = CustomUser
         fields = ('profile',)
 
+# Compact projection of a user who reacted to a post, for the paginated reactions list
+class ReactorSerializer(serializers.ModelSerializer):
+    user_id = serializers.ReadOnlyField(source='user.id')
+    username = serializers.CharField(source='user.username', read_only=True)
+    avatar = serializers.ImageField(source='user.avatar', read_only=True)
+
+    class Meta:
+        model = Reaction
+        fields = ('user_id', 'username', 'avatar', 'reaction_type', 'created_at')
+
 # Serializer for the HiddenPost model, handles serialization of hidden posts
 class HiddenPostSerializer(serializers.ModelSerializer):
     class Meta:
@@ -113,12 +209,11 @@ class ReactionSerializer(serializers.ModelSerializer):
         user = validated_data.pop('user')
         reaction_type = validated_data['reaction_type']
 
-        # Toggle the reaction
-        reaction_exists = Reaction.toggle_reaction(post, user, reaction_type)
+        # Toggle the reaction; the resulting state comes back from the upsert, so it is not read again.
+        state, _ = Reaction.toggle(post.pk, user.pk, reaction_type)
 
-        if reaction_exists:
-            reaction = Reaction.objects.get(post=post, user=user)
-            return reaction
+        if state is not None:
+            return Reaction(post=post, user=user, reaction_type=state)
         else:
             # For serializers, it's better to return None or raise an exception
             raise serializers.ValidationError("Reaction removed.")
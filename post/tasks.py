@@ -0,0 +1,120 @@
+from celery import shared_task
+from django.db.models import Count
+
+from post import counters, images, timeline, trending
+from post.models import CommentCounter, LikeCounter, Post, Reaction, ReactionCount
+
+
+@shared_task()
+def fan_out_post(post_pk):
+    post = Post.objects.filter(pk=post_pk).values('id', 'user_id').first()
+    if post is None:
+        return 0
+    return timeline.fan_out(post['id'], post['user_id'])
+
+
+@shared_task()
+def generate_post_image_variants(post_pk):
+    post = Post.objects.filter(pk=post_pk).first()
+    if post is None:
+        return 0
+    if not post.image:
+        # The image was removed; drop the renditions of the old one.
+        return len(images.store_variants(post, []))
+    return len(images.generate_variants(post))
+
+
+@shared_task()
+def backfill_timeline(follower_pk, author_pks):
+    return timeline.backfill(follower_pk, author_pks)
+
+
+@shared_task()
+def flush_engagement_counters():
+    return counters.flush()
+
+
+@shared_task()
+def refresh_trending_scores():
+    return trending.refresh()
+
+
+@shared_task()
+def reconcile_engagement_counters(chunk_size=1000):
+    """
+    Recomputes LikeCounter, CommentCounter and ReactionCount from the source rows, one chunk of
+    posts at a time, and rewrites only the counters that drifted. Returns the number of counters
+    repaired.
+    """
+    # Buffered deltas would otherwise look like drift and be applied twice.
+    counters.flush()
+    repaired = 0
+    last_pk = 0
+    while True:
+        post_ids = list(
+            Post.objects.filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:chunk_size]
+        )
+        if not post_ids:
+            return repaired
+        last_pk = post_ids[-1]
+        # Posts with buffered likes or reactions are checked on a later run, once they settle.
+        settling = counters.settling_posts(post_ids)
+        repaired += _reconcile_chunk(LikeCounter, [post_id for post_id in post_ids if post_id not in settling])
+        repaired += _reconcile_chunk(CommentCounter, post_ids)
+        repaired += reconcile_reaction_counts(post_ids)
+
+
+def _reconcile_chunk(counter_model, post_ids):
+    actual = dict(
+        counter_model.source_model.objects.filter(post_id__in=post_ids)
+        .values('post_id').annotate(total=Count('pk')).order_by()
+        .values_list('post_id', 'total')
+    )
+    stored = dict(counter_model.objects.filter(post_id__in=post_ids).values_list('post_id', 'count'))
+
+    repaired = 0
+    for post_id in post_ids:
+        total = actual.get(post_id, 0)
+        if post_id not in stored:
+            if total:
+                _, created = counter_model.objects.get_or_create(post_id=post_id, defaults={'count': total})
+                repaired += int(created)
+        elif stored[post_id] != total:
+            # Only overwrite the value that was read, so a concurrent increment is not lost.
+            repaired += counter_model.objects.filter(post_id=post_id, count=stored[post_id]).update(count=total)
+    return repaired
+
+
+def reconcile_reaction_counts(post_ids):
+    """
+    Rebuilds the reaction histogram of the given posts, also creating the rows of posts that have
+    none yet, except posts with buffered reactions (see counters.settling_posts). Returns the
+    number of ReactionCount rows written.
+    """
+    settling = counters.settling_posts(post_ids)
+    post_ids = [post_id for post_id in post_ids if post_id not in settling]
+    actual = {
+        (post_id, reaction_type): total
+        for post_id, reaction_type, total in Reaction.objects.filter(post_id__in=post_ids)
+        .values('post_id', 'reaction_type').annotate(total=Count('pk')).order_by()
+        .values_list('post_id', 'reaction_type', 'total')
+    }
+    stored = {
+        (post_id, reaction_type): count
+        for post_id, reaction_type, count in ReactionCount.objects.filter(post_id__in=post_ids)
+        .values_list('post_id', 'reaction_type', 'count')
+    }
+
+    repaired = 0
+    for key in actual.keys() | stored.keys():
+        post_id, reaction_type = key
+        total = actual.get(key, 0)
+        if key not in stored:
+            if total:
+                _, created = ReactionCount.objects.get_or_create(
+                    post_id=post_id, reaction_type=reaction_type, defaults={'count': total})
+                repaired += int(created)
+        elif stored[key] != total:
+            repaired += ReactionCount.objects.filter(
+                post_id=post_id, reaction_type=reaction_type, count=stored[key]).update(count=total)
+    return repaired
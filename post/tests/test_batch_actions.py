@@ -0,0 +1,112 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from authentication.blocks import _local
+from post import actions
+from post.models import HiddenPost, LikeCounter, LikePost, Post, Reaction, ReactionCount
+from trend.redis_store import local_redis
+
+User = get_user_model()
+
+
+@override_settings(REDIS_URL='local://')
+class BatchActionsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='user', email='user@example.com')
+        cls.author = User.objects.create_user(username='author', email='author@example.com')
+        cls.posts = [Post.objects.create(user=cls.author, image='images/test.jpg', content=f'post {i}') for i in range(3)]
+
+    def setUp(self):
+        local_redis.flushall()
+        _local.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def send(self, operations):
+        return self.client.post(reverse('batch-actions'), {'operations': operations}, format='json')
+
+    def test_operations_apply_in_order_and_report_per_operation(self):
+        first, second, _ = self.posts
+        response = self.send([
+            {'type': 'like', 'post_id': first.id, 'value': True},
+            {'type': 'like', 'post_id': first.id, 'value': True},
+            {'type': 'reaction', 'post_id': second.id, 'value': 'love'},
+            {'type': 'reaction', 'post_id': second.id, 'value': 'wow'},
+            {'type': 'hide', 'post_id': second.id, 'value': False},
+            {'type': 'like', 'post_id': 999999, 'value': True},
+        ])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [result['status'] for result in response.data['results']],
+            ['applied', 'unchanged', 'applied', 'applied', 'unchanged', 'not_found'],
+        )
+        self.assertTrue(LikePost.objects.filter(post=first, user=self.user).exists())
+        self.assertEqual(LikeCounter.objects.get(post=first).count, 1)
+        self.assertEqual(Reaction.objects.get(post=second, user=self.user).reaction_type, 'wow')
+        self.assertEqual(dict(ReactionCount.objects.filter(post=second, count__gt=0).values_list('reaction_type', 'count')), {'wow': 1})
+
+    def test_replaying_a_batch_is_idempotent(self):
+        operations = [
+            {'type': 'like', 'post_id': post.id, 'value': True} for post in self.posts
+        ] + [{'type': 'hide', 'post_id': self.posts[0].id, 'value': True}]
+        self.send(operations)
+        response = self.send(operations)
+        self.assertEqual({result['status'] for result in response.data['results']}, {'unchanged'})
+        self.assertEqual(LikePost.objects.filter(user=self.user).count(), 3)
+        self.assertEqual(HiddenPost.objects.filter(user=self.user).count(), 1)
+
+    def test_switching_state_off_and_changing_reaction(self):
+        post = self.posts[0]
+        LikePost.toggle_like(post, self.user)
+        Reaction.toggle_reaction(post, self.user, 'haha')
+        HiddenPost.objects.create(user=self.user, post=post)
+        reaction = Reaction.objects.get(user=self.user, post=post)
+
+        self.send([
+            {'type': 'like', 'post_id': post.id, 'value': False},
+            {'type': 'reaction', 'post_id': post.id, 'value': 'angry'},
+            {'type': 'hide', 'post_id': post.id, 'value': False},
+        ])
+        self.assertFalse(LikePost.objects.filter(user=self.user).exists())
+        self.assertEqual(LikeCounter.objects.get(post=post).count, 0)
+        # The reaction keeps its row, and with it its place among the reactors.
+        self.assertEqual(Reaction.objects.get(user=self.user, post=post).created_at, reaction.created_at)
+        self.assertEqual(post.reaction_histogram(), {'angry': 1})
+        self.assertFalse(HiddenPost.objects.exists())
+
+        self.send([{'type': 'reaction', 'post_id': post.id, 'value': None}])
+        self.assertEqual(post.reaction_histogram(), {})
+
+    def test_whole_batch_is_written_with_a_fixed_number_of_queries(self):
+        for post in self.posts:
+            LikeCounter.objects.create(post=post, count=0)
+            ReactionCount.objects.create(post=post, reaction_type='like', count=0)
+        operations = [{'type': kind, 'post_id': post.id, 'value': value}
+                      for post in self.posts for kind, value in (('like', True), ('reaction', 'like'), ('hide', True))]
+        # Savepoint and release, the posts, three state reads, one bulk insert per kind and one
+        # counter update per post for likes and for reactions.
+        with self.assertNumQueries(2 + 1 + 3 + 3 + 2 * len(self.posts)):
+            self.send(operations)
+
+    def test_rows_changed_since_the_state_was_read_are_not_counted_twice(self):
+        liked, reacted, unliked = self.posts
+        # Toggles from another device land between the state reads and the writes.
+        LikePost.toggle_like(liked, self.user)
+        Reaction.toggle_reaction(reacted, self.user, 'haha')
+        HiddenPost.objects.create(user=self.user, post=liked)
+        actions._write_likes(self.user, {unliked.id: True}, {liked.id: True, unliked.id: False})
+        actions._write_reactions(self.user, {}, {reacted.id: 'love'})
+        actions._write_hides(self.user, {}, {liked.id: True})
+
+        self.assertEqual(LikeCounter.objects.get(post=liked).count, 1)
+        self.assertEqual(LikePost.objects.filter(user=self.user).count(), 1)
+        self.assertEqual(reacted.reaction_histogram(), {'haha': 1})
+        self.assertEqual(HiddenPost.objects.count(), 1)
+
+    def test_invalid_values_are_rejected(self):
+        self.assertEqual(self.send([{'type': 'like', 'post_id': 1, 'value': 'yes'}]).status_code, 400)
+        self.assertEqual(self.send([{'type': 'reaction', 'post_id': 1, 'value': 'meh'}]).status_code, 400)
+        self.assertEqual(self.send([{'type': 'bookmark', 'post_id': 1, 'value': True}]).status_code, 400)
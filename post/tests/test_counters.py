@@ -0,0 +1,71 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from authentication.blocks import _local
+from post.models import Comment, CommentCounter, LikeCounter, LikePost, Post
+from post.tasks import reconcile_engagement_counters
+from trend.redis_store import local_redis
+
+User = get_user_model()
+
+
+@override_settings(REDIS_URL='local://')
+class EngagementCounterTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='user', email='user@example.com')
+        cls.other = User.objects.create_user(username='other', email='other@example.com')
+        cls.post = Post.objects.create(user=cls.other, image='images/test.jpg', content='post')
+
+    def setUp(self):
+        local_redis.flushall()
+        _local.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def like_count(self):
+        return LikeCounter.objects.get(post=self.post).count
+
+    def comment_count(self):
+        return CommentCounter.objects.get(post=self.post).count
+
+    def test_toggle_like_moves_counter_both_ways(self):
+        self.client.post(reverse('toggle-like'), {'post_id': self.post.id})
+        self.assertEqual(self.like_count(), 1)
+        LikePost.objects.create(post=self.post, user=self.other)
+        self.assertEqual(self.like_count(), 2)
+        response = self.client.post(reverse('toggle-like'), {'post_id': self.post.id})
+        self.assertFalse(response.data['liked'])
+        self.assertEqual(self.like_count(), 1)
+
+    def test_comment_create_and_delete_move_counter(self):
+        self.client.post(reverse('create_comment'), {'post': self.post.id, 'content': 'hi'})
+        self.client.post(reverse('create_comment'), {'post': self.post.id, 'content': 'again'})
+        self.assertEqual(self.comment_count(), 2)
+        comment = Comment.objects.filter(post=self.post).first()
+        response = self.client.delete(reverse('comment-detail', args=[comment.id]))
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.comment_count(), 1)
+
+    def test_counter_is_seeded_from_existing_rows(self):
+        LikePost.objects.create(post=self.post, user=self.other)
+        LikeCounter.objects.all().delete()
+        LikePost.objects.create(post=self.post, user=self.user)
+        self.assertEqual(self.like_count(), 2)
+
+    def test_deleting_a_post_cascades_without_recreating_counters(self):
+        LikePost.objects.create(post=self.post, user=self.user)
+        Comment.objects.create(post=self.post, user=self.user, content='hi')
+        self.post.delete()
+        self.assertFalse(LikeCounter.objects.exists())
+        self.assertFalse(CommentCounter.objects.exists())
+
+    def test_reconcile_repairs_only_drifted_counters(self):
+        LikePost.objects.create(post=self.post, user=self.user)
+        Comment.objects.create(post=self.post, user=self.user, content='hi')
+        LikeCounter.objects.filter(post=self.post).update(count=7)
+        self.assertEqual(reconcile_engagement_counters(chunk_size=1), 1)
+        self.assertEqual(self.like_count(), 1)
+        self.assertEqual(self.comment_count(), 1)
@@ -0,0 +1,65 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from authentication.blocks import _local
+from post.models import Comment, LikePost, Post
+from trend.redis_store import local_redis
+
+User = get_user_model()
+
+# One query for the requester's block set (cold cache), one COUNT(*), one for the page itself and
+# one each for the prefetched reaction histograms and image renditions.
+FEED_PAGE_QUERIES = 5
+
+
+@override_settings(REDIS_URL='local://')
+class FeedQueryCountTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = User.objects.create_user(username='reader', email='reader@example.com')
+
+    def setUp(self):
+        local_redis.flushall()
+        _local.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.reader)
+
+    def seed(self, count, start=0):
+        for i in range(start, start + count):
+            author = User.objects.create_user(username=f'author{i}', email=f'author{i}@example.com')
+            post = Post.objects.create(user=author, image='images/test.jpg', content=f'post {i}')
+            LikePost.objects.create(post=post, user=self.reader)
+            Comment.objects.create(post=post, user=author, content='first')
+            Comment.objects.create(post=post, user=self.reader, content='second')
+
+    def test_feed_page_runs_a_constant_number_of_queries(self):
+        self.seed(2)
+        with self.assertNumQueries(FEED_PAGE_QUERIES):
+            self.client.get(reverse('post-list'))
+
+        _local.clear()
+        local_redis.flushall()
+        self.seed(8, start=2)
+        with self.assertNumQueries(FEED_PAGE_QUERIES):
+            response = self.client.get(reverse('post-list'))
+        self.assertEqual(len(response.data['results']), 10)
+
+    def test_annotations_match_per_row_values(self):
+        self.seed(3)
+        other = User.objects.create_user(username='other', email='other@example.com')
+        LikePost.objects.create(post=Post.objects.first(), user=other)
+
+        response = self.client.get(reverse('post-list'))
+        for item in response.data['results']:
+            post = Post.objects.get(pk=item['id'])
+            self.assertEqual(item['like_counter'], post.like_count())
+            self.assertEqual(item['comment_counter'], post.comment_count())
+            self.assertTrue(item['liked'])
+
+    def test_anonymous_feed_reports_not_liked(self):
+        self.seed(1)
+        response = APIClient().get(reverse('post-list'))
+        self.assertFalse(response.data['results'][0]['liked'])
+        self.assertEqual(response.data['results'][0]['like_counter'], 1)
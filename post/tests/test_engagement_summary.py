@@ -0,0 +1,73 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from authentication.blocks import _local
+from authentication.models import Block
+from post.models import Comment, LikePost, Post, Reaction
+from trend.redis_store import local_redis
+
+User = get_user_model()
+
+# Block set, posts with their counters, reaction histograms, the viewer's likes and reactions.
+SUMMARY_QUERIES = 5
+
+
+@override_settings(REDIS_URL='local://')
+class EngagementSummaryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.viewer = User.objects.create_user(username='viewer', email='viewer@example.com')
+        cls.author = User.objects.create_user(username='author', email='author@example.com')
+        cls.posts = [Post.objects.create(user=cls.author, image='images/test.jpg', content=f'post {i}') for i in range(30)]
+
+    def setUp(self):
+        local_redis.flushall()
+        _local.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.viewer)
+
+    def summarize(self, post_ids):
+        return self.client.post(reverse('post-engagement-summary'), {'post_ids': post_ids}, format='json')
+
+    def test_summary_fields_in_request_order(self):
+        first, second = self.posts[:2]
+        LikePost.objects.create(post=second, user=self.viewer)
+        LikePost.objects.create(post=second, user=self.author)
+        Comment.objects.create(post=first, user=self.author, content='hi')
+        Reaction.toggle_reaction(second, self.viewer, 'wow')
+        Reaction.toggle_reaction(second, self.author, 'love')
+
+        response = self.summarize([second.id, first.id, 999999])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['results'], [
+            {'post_id': second.id, 'like_counter': 2, 'comment_counter': 0,
+             'reactions': {'wow': 1, 'love': 1}, 'liked': True, 'reaction': 'wow'},
+            {'post_id': first.id, 'like_counter': 0, 'comment_counter': 1,
+             'reactions': {}, 'liked': False, 'reaction': None},
+        ])
+
+    def test_query_count_does_not_grow_with_posts(self):
+        for post in self.posts:
+            Reaction.toggle_reaction(post, self.author, 'haha')
+        with self.assertNumQueries(SUMMARY_QUERIES):
+            response = self.summarize([post.id for post in self.posts])
+        self.assertEqual(len(response.data['results']), 30)
+
+    @override_settings(ENGAGEMENT_SUMMARY_CACHE_TTL=30)
+    def test_cached_summaries_skip_the_counter_queries(self):
+        post_ids = [post.id for post in self.posts[:5]]
+        self.summarize(post_ids)
+        # Only the viewer's likes and reactions; the block set is cached as well.
+        with self.assertNumQueries(2):
+            response = self.summarize(post_ids)
+        self.assertEqual(len(response.data['results']), 5)
+
+    def test_blocked_authors_are_left_out(self):
+        Block.objects.create(blocker=self.author, blocked=self.viewer)
+        self.assertEqual(self.summarize([self.posts[0].id]).data['results'], [])
+
+    def test_request_is_validated(self):
+        self.assertEqual(self.summarize([]).status_code, 400)
+        self.assertEqual(self.summarize(list(range(1, 400))).status_code, 400)
@@ -0,0 +1,164 @@
+import os
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+from rest_framework.test import APIClient
+
+from post import images
+from post.models import Post, PostImageVariant
+from post.tasks import generate_post_image_variants
+from trend import blurhash
+
+User = get_user_model()
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def jpeg_bytes(width, height, orientation=None):
+    image = Image.new('RGB', (width, height), (200, 30, 30))
+    exif = Image.Exif()
+    exif[0x0110] = 'Secret Camera'
+    if orientation:
+        exif[0x0112] = orientation
+    buffer = BytesIO()
+    image.save(buffer, 'JPEG', exif=exif.tobytes())
+    return buffer.getvalue()
+
+
+@override_settings(
+    REDIS_URL='local://',
+    DEFAULT_FILE_STORAGE='django.core.files.storage.FileSystemStorage',
+    MEDIA_ROOT=MEDIA_ROOT,
+    MEDIA_URL='/media/',
+    POST_IMAGE_WIDTHS=[320, 640, 1080],
+)
+class PostImageVariantTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='user', email='user@example.com')
+
+    def create_post(self, data):
+        post = Post(user=self.user, content='photo')
+        post.image.save('photo.jpg', ContentFile(data), save=False)
+        post.save()
+        return post
+
+    def test_renditions_are_oriented_resized_and_stripped(self):
+        # Orientation 6 means the camera was rotated; the upright image is 600 wide and 800 high.
+        renditions = images.render_variants(jpeg_bytes(800, 600, orientation=6), widths=[320, 640, 1080])
+        self.assertEqual(
+            sorted((r.width, r.height, r.format) for r in renditions),
+            [(320, 427, 'jpeg'), (320, 427, 'webp')],
+        )
+        for rendition in renditions:
+            with Image.open(BytesIO(rendition.data)) as image:
+                self.assertEqual(image.size, (320, 427))
+                self.assertEqual(dict(image.getexif()), {})
+
+    def test_small_images_keep_their_own_width(self):
+        renditions = images.render_variants(jpeg_bytes(200, 100), widths=[320, 640])
+        self.assertEqual({r.width for r in renditions}, {200})
+
+    def test_task_stores_variants_and_serializer_exposes_srcset(self):
+        post = self.create_post(jpeg_bytes(1200, 800))
+        self.assertEqual(generate_post_image_variants(post.pk), 6)
+        self.assertEqual(PostImageVariant.objects.filter(post=post).count(), 6)
+        # Running it again replaces the renditions instead of adding more.
+        generate_post_image_variants(post.pk)
+        self.assertEqual(PostImageVariant.objects.filter(post=post).count(), 6)
+
+        client = APIClient()
+        client.force_authenticate(self.user)
+        srcset = client.get(reverse('post-detail', args=[post.id])).data['srcset']
+        self.assertEqual(sorted(srcset), ['jpeg', 'webp'])
+        self.assertEqual(list(srcset['webp']), ['320', '640', '1080'])
+        self.assertTrue(srcset['jpeg']['640'].endswith('.jpg'))
+
+    def test_task_stores_a_blurhash_placeholder(self):
+        data = jpeg_bytes(640, 480)
+        post = self.create_post(data)
+        generate_post_image_variants(post.pk)
+        post.refresh_from_db()
+        # 4x3 components: size flag, maximum, average colour and 11 detail components.
+        self.assertEqual(len(post.image_placeholder), 1 + 1 + 4 + 11 * 2)
+        self.assertEqual(post.image_placeholder, blurhash.encode_file(BytesIO(data)))
+
+        client = APIClient()
+        client.force_authenticate(self.user)
+        self.assertEqual(client.get(reverse('post-detail', args=[post.id])).data['image_placeholder'], post.image_placeholder)
+
+    def test_backfill_renders_posts_without_variants(self):
+        posts = [self.create_post(jpeg_bytes(700, 500)) for _ in range(3)]
+        call_command('backfill_post_image_variants', workers=2, stdout=StringIO())
+        self.assertEqual(
+            set(PostImageVariant.objects.values_list('post_id', flat=True)),
+            {post.pk for post in posts},
+        )
+        self.assertEqual(PostImageVariant.objects.count(), 3 * 4)
+        self.assertEqual(Post.objects.filter(image_placeholder='').count(), 0)
+
+    def test_reposted_image_reuses_the_renditions(self):
+        data = jpeg_bytes(900, 600)
+        original = self.create_post(data)
+        generate_post_image_variants(original.pk)
+        repost = self.create_post(data)
+        self.assertEqual(repost.image.name, original.image.name)
+
+        with self.assertNumQueries(8):
+            # The post, the source lookup and its variants, delete and insert in a savepoint, placeholder.
+            self.assertEqual(generate_post_image_variants(repost.pk), 4)
+        self.assertEqual(
+            set(PostImageVariant.objects.filter(post=repost).values_list('image', flat=True)),
+            set(PostImageVariant.objects.filter(post=original).values_list('image', flat=True)),
+        )
+        repost.refresh_from_db()
+        self.assertEqual(repost.image_placeholder, Post.objects.get(pk=original.pk).image_placeholder)
+
+    def test_replaced_renditions_release_files_no_other_post_names(self):
+        data = jpeg_bytes(900, 600)
+        original = self.create_post(data)
+        generate_post_image_variants(original.pk)
+        repost = self.create_post(data)
+        generate_post_image_variants(repost.pk)
+        shared = set(PostImageVariant.objects.filter(post=original).values_list('image', flat=True))
+
+        # Rendered again, e.g. after POST_IMAGE_WIDTHS changed.
+        with self.captureOnCommitCallbacks(execute=True):
+            images.store_variants(original, images.render_variants(data))
+        # The repost still shows the first renditions.
+        self.assertTrue(all(default_storage.exists(name) for name in shared))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            images.store_variants(repost, images.render_variants(data))
+        self.assertFalse(any(default_storage.exists(name) for name in shared))
+        for variant in PostImageVariant.objects.all():
+            self.assertTrue(os.path.exists(variant.image.path))
+
+    def test_changing_the_image_renders_it_again(self):
+        post = self.create_post(jpeg_bytes(700, 500))
+        client = APIClient()
+        client.force_authenticate(self.user)
+        url = reverse('post-detail', args=[post.id])
+        with mock.patch.object(generate_post_image_variants, 'delay') as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                client.patch(url, {'content': 'new caption'})
+            delay.assert_not_called()
+            with self.captureOnCommitCallbacks(execute=True):
+                response = client.patch(url, {'image': SimpleUploadedFile('new.jpg', jpeg_bytes(500, 700), 'image/jpeg')})
+        self.assertEqual(response.status_code, 200)
+        delay.assert_called_once_with(post.pk)
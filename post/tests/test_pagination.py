@@ -0,0 +1,108 @@
+import base64
+import json
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from authentication.blocks import _local
+from post.models import Comment, LikePost, Post
+from trend.redis_store import local_redis
+
+User = get_user_model()
+
+
+def cursor(values, reverse=False):
+    payload = json.dumps({'v': values, 'r': int(reverse)})
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii')
+
+
+@override_settings(REDIS_URL='local://')
+class KeysetPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='reader', email='reader@example.com', password='pass')
+        cls.author = User.objects.create_user(username='author', email='author@example.com', password='pass')
+        cls.posts = [
+            Post.objects.create(user=cls.author, image='images/test.jpg', content=f'post {i}')
+            for i in range(25)
+        ]
+
+    def setUp(self):
+        local_redis.flushall()
+        _local.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def walk(self, url, params):
+        seen = []
+        response = self.client.get(url, params)
+        while True:
+            self.assertEqual(response.status_code, 200)
+            seen.extend(item['id'] for item in response.data['results'])
+            if not response.data['next']:
+                return seen
+            response = self.client.get(response.data['next'])
+
+    def test_feed_cursor_walks_every_post_once_newest_first(self):
+        ids = self.walk(reverse('post-list'), {'cursor': ''})
+        self.assertEqual(ids, [post.id for post in reversed(self.posts)])
+
+    def test_new_posts_do_not_shift_the_next_page(self):
+        first = self.client.get(reverse('post-list'), {'cursor': ''})
+        Post.objects.create(user=self.author, image='images/test.jpg', content='late post')
+        second = self.client.get(first.data['next'])
+        self.assertEqual(second.data['results'][0]['id'], self.posts[-11].id)
+
+    def test_previous_link_returns_the_earlier_page(self):
+        first = self.client.get(reverse('post-list'), {'cursor': ''})
+        second = self.client.get(first.data['next'])
+        back = self.client.get(second.data['previous'])
+        self.assertEqual(
+            [item['id'] for item in back.data['results']],
+            [item['id'] for item in first.data['results']],
+        )
+
+    def test_page_number_mode_is_kept_without_cursor(self):
+        response = self.client.get(reverse('post-list'), {'p': 2})
+        self.assertEqual(response.data['count'], 25)
+        self.assertEqual(len(response.data['results']), 10)
+
+    def test_invalid_cursor_is_rejected(self):
+        response = self.client.get(reverse('post-list'), {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 404)
+
+    def test_tampered_cursor_values_are_rejected(self):
+        post = self.posts[0]
+        endpoints = [
+            (reverse('post-list'), {}),
+            (reverse('post-likers-list', args=[post.id]), {}),
+            (reverse('post_comments', args=[post.id]), {}),
+            (reverse('trending-posts'), {}),
+            (reverse('following-timeline'), {}),
+            (reverse('search'), {'q': 'post'}),
+        ]
+        tampered = [['garbage', 1], [{'a': 1}, 1], [None, None], [[1], 1], [True, 1], ['2024-01-01T00:00:00+00:00', 'x']]
+        for url, params in endpoints:
+            for values in tampered:
+                # Timelines are keyed on the id alone.
+                values = values[:1] if url == reverse('following-timeline') else values
+                with self.subTest(url=url, values=values):
+                    response = self.client.get(url, {**params, 'cursor': cursor(values)})
+                    self.assertEqual(response.status_code, 404)
+
+    def test_comments_and_likers_support_cursor(self):
+        post = self.posts[0]
+        for i in range(12):
+            Comment.objects.create(post=post, user=self.author, content=f'comment {i}')
+        self.assertEqual(len(self.walk(reverse('post_comments', args=[post.id]), {'cursor': ''})), 12)
+
+        likers = [User.objects.create_user(username=f'liker{i}', email=f'liker{i}@example.com') for i in range(12)]
+        for liker in likers:
+            LikePost.objects.create(post=post, user=liker)
+        response = self.client.get(reverse('post-likers-list', args=[post.id]), {'cursor': ''})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 10)
+        rest = self.client.get(response.data['next'])
+        self.assertEqual(len(rest.data['results']), 2)
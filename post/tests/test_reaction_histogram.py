@@ -0,0 +1,64 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from authentication.blocks import _local
+from post.models import Post, Reaction, ReactionCount
+from trend.redis_store import local_redis
+
+User = get_user_model()
+
+
+@override_settings(REDIS_URL='local://')
+class ReactionHistogramTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author', email='author@example.com')
+        cls.post = Post.objects.create(user=cls.author, image='images/test.jpg', content='post')
+        cls.fans = [User.objects.create_user(username=f'fan{i}', email=f'fan{i}@example.com') for i in range(4)]
+
+    def setUp(self):
+        local_redis.flushall()
+        _local.clear()
+
+    def histogram(self):
+        return Post.objects.get(pk=self.post.pk).reaction_histogram()
+
+    def test_toggle_maintains_histogram_including_type_changes(self):
+        Reaction.toggle_reaction(self.post, self.fans[0], 'love')
+        Reaction.toggle_reaction(self.post, self.fans[1], 'love')
+        Reaction.toggle_reaction(self.post, self.fans[2], 'haha')
+        self.assertEqual(self.histogram(), {'love': 2, 'haha': 1})
+
+        Reaction.toggle_reaction(self.post, self.fans[1], 'haha')
+        Reaction.toggle_reaction(self.post, self.fans[0], 'love')
+        self.assertEqual(self.histogram(), {'haha': 2})
+
+    def test_top_reactions_reads_no_raw_rows(self):
+        for fan, reaction_type in zip(self.fans, ('wow', 'wow', 'like', 'angry')):
+            Reaction.toggle_reaction(self.post, fan, reaction_type)
+        post = Post.objects.prefetch_related('reaction_counts').get(pk=self.post.pk)
+        with self.assertNumQueries(0):
+            top = post.top_reactions(top_n=2)
+        self.assertEqual(top, [{'reaction_type': 'wow', 'count': 2}, {'reaction_type': 'angry', 'count': 1}])
+
+    def test_feed_serializes_top_reactions(self):
+        Reaction.toggle_reaction(self.post, self.fans[0], 'love')
+        client = APIClient()
+        client.force_authenticate(self.fans[1])
+        response = client.get(reverse('post-detail', args=[self.post.id]))
+        self.assertEqual(response.data['top_reactions'], [{'reaction_type': 'love', 'count': 1}])
+
+    def test_backfill_builds_histogram_from_existing_reactions(self):
+        Reaction.objects.create(post=self.post, user=self.fans[0], reaction_type='liar')
+        Reaction.objects.create(post=self.post, user=self.fans[1], reaction_type='liar')
+        ReactionCount.objects.create(post=self.post, reaction_type='love', count=5)
+
+        call_command('backfill_reaction_counts', stdout=StringIO())
+        self.assertEqual(self.histogram(), {'liar': 2})
+        call_command('backfill_reaction_counts', stdout=StringIO())
+        self.assertEqual(ReactionCount.objects.get(post=self.post, reaction_type='liar').count, 2)
@@ -0,0 +1,51 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from authentication.blocks import _local
+from post.models import Post, Reaction
+from trend.redis_store import local_redis
+
+User = get_user_model()
+
+
+@override_settings(REDIS_URL='local://')
+class ReactionListTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.viewer = User.objects.create_user(username='viewer', email='viewer@example.com')
+        cls.post = Post.objects.create(user=cls.viewer, image='images/test.jpg', content='post')
+        cls.reactors = [User.objects.create_user(username=f'reactor{i}', email=f'reactor{i}@example.com') for i in range(15)]
+        for i, reactor in enumerate(cls.reactors):
+            Reaction.toggle_reaction(cls.post, reactor, 'love' if i % 3 else 'wow')
+
+    def setUp(self):
+        local_redis.flushall()
+        _local.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.viewer)
+
+    def test_counts_header_and_cursor_pages(self):
+        url = reverse('reactions-list', args=[self.post.id])
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['counts'], {'love': 10, 'wow': 5})
+        self.assertEqual(response.data['total'], 15)
+        self.assertEqual(len(response.data['results']), 10)
+        self.assertEqual(
+            set(response.data['results'][0]),
+            {'user_id', 'username', 'avatar', 'reaction_type', 'created_at'},
+        )
+        rest = self.client.get(response.data['next'])
+        self.assertEqual(len(rest.data['results']), 5)
+        self.assertIsNone(rest.data['next'])
+
+    def test_list_can_be_filtered_by_type(self):
+        response = self.client.get(reverse('reactions-list', args=[self.post.id]), {'type': 'wow'})
+        self.assertEqual({item['reaction_type'] for item in response.data['results']}, {'wow'})
+        self.assertEqual(len(response.data['results']), 5)
+        self.assertEqual(response.data['counts'], {'love': 10, 'wow': 5})
+
+    def test_missing_post_is_not_found(self):
+        self.assertEqual(self.client.get(reverse('reactions-list', args=[999999])).status_code, 404)
@@ -0,0 +1,75 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from authentication.blocks import _local
+from post.models import LikePost, Post
+from profile_app.models import Profile
+from trend.redis_store import local_redis
+
+User = get_user_model()
+
+
+@override_settings(REDIS_URL='local://')
+class SparseFieldsetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = User.objects.create_user(username='reader', email='reader@example.com')
+        cls.author = User.objects.create_user(username='author', email='author@example.com')
+        for i in range(3):
+            post = Post.objects.create(user=cls.author, image='images/test.jpg', content=f'post {i}')
+            LikePost.objects.create(post=post, user=cls.reader)
+
+    def setUp(self):
+        local_redis.flushall()
+        _local.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.reader)
+        # Warm the requester's block set.
+        self.client.get(reverse('post-list'))
+
+    def test_fields_keeps_only_the_listed_fields(self):
+        # COUNT(*) and the page; no histogram or rendition prefetches.
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('post-list'), {'fields': 'id, username,avatar'})
+        self.assertEqual(len(queries), 2)
+        self.assertNotIn('likes_total', queries[-1]['sql'])
+        self.assertNotIn('viewer_liked', queries[-1]['sql'])
+        self.assertEqual(set(response.data['results'][0]), {'id', 'username', 'avatar'})
+
+    def test_omit_drops_only_what_the_remaining_fields_do_not_need(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('post-list'), {'omit': 'srcset,like_counter'})
+        self.assertEqual(len(queries), 3)
+        self.assertNotIn('likes_total', queries[1]['sql'])
+        self.assertIn('viewer_liked', queries[1]['sql'])
+        row = response.data['results'][0]
+        self.assertNotIn('srcset', row)
+        self.assertNotIn('like_counter', row)
+        self.assertTrue(row['liked'])
+        self.assertEqual(row['top_reactions'], [])
+
+    def test_avatar_and_placeholder_describe_the_same_image(self):
+        User.objects.filter(pk=self.author.pk).update(avatar='images/old.jpeg')
+        Profile.objects.filter(user=self.author).update(avatar='profile_pics/new.png', avatar_placeholder='LKO2?U%2Tw=w')
+        response = self.client.get(reverse('post-list'), {'fields': 'avatar,avatar_placeholder'})
+        row = response.data['results'][0]
+        self.assertTrue(row['avatar'].endswith('profile_pics/new.png'))
+        self.assertEqual(row['avatar_placeholder'], 'LKO2?U%2Tw=w')
+
+    def test_profile_skips_unrequested_method_fields(self):
+        profile = self.author.profile
+        url = reverse('profile-details', args=[profile.pk])
+        # The profile and its user, instead of the posts page and five counts.
+        with self.assertNumQueries(2):
+            response = self.client.get(url, {'fields': 'id,username,avatar'})
+        self.assertEqual(response.data, {'id': profile.pk, 'username': 'author', 'avatar': None})
+
+        # Updates answer with the full representation.
+        self.client.force_authenticate(self.author)
+        response = self.client.patch(url + '?fields=id', {'bio': 'hello'})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('user_posts', response.data)
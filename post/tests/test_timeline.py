@@ -0,0 +1,84 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from post import timeline
+from post.models import HiddenPost, Post
+from profile_app.models import Follow
+from trend.redis_store import local_redis
+
+User = get_user_model()
+
+
+@override_settings(REDIS_URL='local://', TIMELINE_MAX_LENGTH=5, TIMELINE_FANOUT_THRESHOLD=3)
+class FollowingTimelineTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = User.objects.create_user(username='reader', email='reader@example.com')
+        cls.author = User.objects.create_user(username='author', email='author@example.com')
+        cls.stranger = User.objects.create_user(username='stranger', email='stranger@example.com')
+        Follow.objects.create(follower=cls.reader, following=cls.author)
+
+    def setUp(self):
+        local_redis.flushall()
+        self.client = APIClient()
+        self.client.force_authenticate(self.reader)
+
+    def publish(self, user, content='post'):
+        post = Post.objects.create(user=user, image='images/test.jpg', content=content)
+        timeline.fan_out(post.id, user.id)
+        return post
+
+    def test_posts_are_pushed_to_followers_only(self):
+        post = self.publish(self.author)
+        self.publish(self.stranger)
+        self.assertEqual(timeline.read(self.reader.id), [post.id])
+
+    def test_timeline_is_trimmed_to_max_length(self):
+        posts = [self.publish(self.author) for _ in range(7)]
+        self.assertEqual(timeline.read(self.reader.id, limit=10), [p.id for p in reversed(posts[-5:])])
+
+    def test_popular_authors_are_merged_on_read(self):
+        for i in range(3):
+            fan = User.objects.create_user(username=f'fan{i}', email=f'fan{i}@example.com')
+            Follow.objects.create(follower=fan, following=self.stranger)
+        Follow.objects.create(follower=self.reader, following=self.stranger)
+
+        popular = self.publish(self.stranger)
+        regular = self.publish(self.author)
+        pushed = local_redis.zrevrangebyscore(timeline.timeline_key(self.reader.id), '+inf', '-inf')
+        self.assertNotIn(str(popular.id), pushed)
+        self.assertEqual(timeline.read(self.reader.id), [regular.id, popular.id])
+
+    def test_view_paginates_and_applies_visibility(self):
+        posts = [self.publish(self.author, f'post {i}') for i in range(12)]
+        HiddenPost.objects.create(user=self.reader, post=posts[-1])
+        with self.settings(TIMELINE_MAX_LENGTH=50):
+            for post in posts:
+                timeline.fan_out(post.id, self.author.id)
+            first = self.client.get(reverse('following-timeline'))
+            second = self.client.get(first.data['next'])
+        ids = [item['id'] for item in first.data['results'] + second.data['results']]
+        self.assertEqual(ids, [p.id for p in reversed(posts[:-1])])
+        self.assertIsNone(second.data['next'])
+
+    def test_pages_read_past_a_run_of_unfollowed_entries(self):
+        older = [self.publish(self.author, f'older {i}') for i in range(3)]
+        Follow.objects.create(follower=self.reader, following=self.stranger)
+        with self.settings(TIMELINE_MAX_LENGTH=50):
+            for post in older:
+                timeline.fan_out(post.id, self.author.id)
+            for i in range(25):
+                self.publish(self.stranger, f'newer {i}')
+        Follow.objects.filter(follower=self.reader, following=self.stranger).delete()
+
+        response = self.client.get(reverse('following-timeline'))
+        self.assertEqual([item['id'] for item in response.data['results']], [p.id for p in reversed(older)])
+        self.assertIsNone(response.data['next'])
+
+    def test_unfollowed_authors_disappear(self):
+        self.publish(self.author)
+        Follow.objects.filter(follower=self.reader).delete()
+        response = self.client.get(reverse('following-timeline'))
+        self.assertEqual(response.data['results'], [])
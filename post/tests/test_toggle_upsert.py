@@ -0,0 +1,126 @@
+import threading
+import time
+
+from django.contrib.auth import get_user_model
+from django.db import OperationalError, close_old_connections, connection
+from django.db.models import Count
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from post.models import LikeCounter, LikePost, Post, Reaction, ReactionCount
+from trend.redis_store import local_redis
+
+User = get_user_model()
+
+
+@override_settings(REDIS_URL='local://')
+class ToggleUpsertTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='user', email='user@example.com')
+        cls.post = Post.objects.create(user=cls.user, image='images/test.jpg', content='post')
+
+    def test_like_toggle_returns_state_and_delta(self):
+        self.assertEqual(LikePost.toggle(self.post.id, self.user.id), (True, 1))
+        like = LikePost.objects.get(post=self.post, user=self.user)
+        self.assertIsNotNone(like.created_at)
+        self.assertEqual(LikePost.toggle(self.post.id, self.user.id), (False, -1))
+        self.assertEqual(LikeCounter.objects.get(post=self.post).count, 0)
+
+    def test_reaction_toggle_returns_state_and_deltas(self):
+        self.assertEqual(Reaction.toggle(self.post.id, self.user.id, 'love'), ('love', {'love': 1}))
+        self.assertEqual(Reaction.toggle(self.post.id, self.user.id, 'wow'), ('wow', {'love': -1, 'wow': 1}))
+        self.assertEqual(Reaction.toggle(self.post.id, self.user.id, 'wow'), (None, {'wow': -1}))
+        self.assertFalse(Reaction.objects.exists())
+
+    def test_changing_the_type_keeps_the_reaction_row(self):
+        Reaction.toggle(self.post.id, self.user.id, 'like')
+        before = Reaction.objects.get(post=self.post, user=self.user)
+        Reaction.toggle(self.post.id, self.user.id, 'love')
+        after = Reaction.objects.get(post=self.post, user=self.user)
+        self.assertEqual((after.id, after.created_at, after.reaction_type), (before.id, before.created_at, 'love'))
+        self.assertEqual(self.post.reaction_histogram(), {'love': 1})
+
+    def test_toggle_endpoint_returns_the_upserted_reaction(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.post(reverse('toggle-reaction', args=[self.post.id]), {'reaction_type': 'haha'})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data, {'reaction_type': 'haha'})
+        client.post(reverse('toggle-reaction', args=[self.post.id]), {'reaction_type': 'haha'})
+        self.assertFalse(Reaction.objects.filter(post=self.post).exists())
+
+
+@override_settings(REDIS_URL='local://')
+class ConcurrentToggleTests(TransactionTestCase):
+    THREADS = 8
+    TOGGLES = 5
+    # Attempts per toggle while SQLite reports the database locked.
+    LOCKED_ATTEMPTS = 200
+
+    def setUp(self):
+        local_redis.flushall()
+        self.author = User.objects.create_user(username='author', email='author@example.com')
+        self.post = Post.objects.create(user=self.author, image='images/test.jpg', content='post')
+        self.users = [User.objects.create_user(username=f'tapper{i}', email=f'tapper{i}@example.com') for i in range(self.THREADS)]
+
+    def run_in_parallel(self, toggle, users=None):
+        users = users or self.users
+        errors = []
+        barrier = threading.Barrier(self.THREADS)
+
+        def tap(user):
+            try:
+                barrier.wait()
+                for i in range(self.TOGGLES):
+                    for attempt in range(self.LOCKED_ATTEMPTS):
+                        try:
+                            toggle(user, i)
+                            break
+                        except OperationalError:
+                            # SQLite allows a single writer; a locked database is retried.
+                            if attempt == self.LOCKED_ATTEMPTS - 1:
+                                raise
+                            time.sleep(0.01)
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                close_old_connections()
+                connection.close()
+
+        threads = [threading.Thread(target=tap, args=(user,)) for user in users]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+
+    def test_parallel_like_toggles_keep_counter_exact(self):
+        self.run_in_parallel(lambda user, i: LikePost.toggle(self.post.id, user.id))
+        # An odd number of taps per user leaves every user liking the post.
+        self.assertEqual(LikePost.objects.filter(post=self.post).count(), self.THREADS)
+        self.assertEqual(LikeCounter.objects.get(post=self.post).count, self.THREADS)
+
+    def test_parallel_reaction_toggles_keep_histogram_exact(self):
+        types = ['love', 'wow', 'love', 'haha', 'haha']
+        self.run_in_parallel(lambda user, i: Reaction.toggle(self.post.id, user.id, types[i]))
+        # love, wow, love, haha, haha ends with no reaction for every user.
+        self.assertFalse(Reaction.objects.filter(post=self.post).exists())
+        self.assertEqual(set(ReactionCount.objects.filter(post=self.post).values_list('count', flat=True)), {0})
+
+    def test_parallel_toggles_of_one_user_keep_counter_exact(self):
+        user = self.users[0]
+        self.run_in_parallel(lambda user, i: LikePost.toggle(self.post.id, user.id), users=[user] * self.THREADS)
+        likes = LikePost.objects.filter(post=self.post).count()
+        self.assertIn(likes, (0, 1))
+        self.assertEqual(LikeCounter.objects.get(post=self.post).count, likes)
+
+    def test_parallel_reaction_toggles_of_one_user_keep_histogram_exact(self):
+        user = self.users[0]
+        types = ['love', 'wow', 'love', 'haha', 'haha']
+        self.run_in_parallel(lambda user, i: Reaction.toggle(self.post.id, user.id, types[i]), users=[user] * self.THREADS)
+        reactions = dict(Reaction.objects.filter(post=self.post).values_list('reaction_type').annotate(count=Count('id')))
+        self.assertLessEqual(sum(reactions.values()), 1)
+        self.assertEqual(dict(ReactionCount.objects.filter(post=self.post, count__gt=0).values_list('reaction_type', 'count')), reactions)
+        self.assertFalse(ReactionCount.objects.filter(post=self.post, count__lt=0).exists())
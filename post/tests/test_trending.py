@@ -0,0 +1,96 @@
+import math
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from authentication.blocks import _local
+from authentication.models import Block
+from post import trending
+from post.models import Comment, LikePost, Post, PostScore, TrendingWatermark
+from trend.redis_store import local_redis
+
+User = get_user_model()
+
+
+@override_settings(
+    REDIS_URL='local://', TRENDING_HALF_LIFE_HOURS=1.0, TRENDING_LOOKBACK_HOURS=24, TRENDING_MIN_SCORE=0.05,
+    TRENDING_COMMIT_GRACE=0,
+)
+class TrendingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author', email='author@example.com')
+        cls.reader = User.objects.create_user(username='reader', email='reader@example.com')
+        cls.fans = [User.objects.create_user(username=f'fan{i}', email=f'fan{i}@example.com') for i in range(6)]
+        cls.posts = [Post.objects.create(user=cls.author, image='images/test.jpg', content=f'post {i}') for i in range(3)]
+
+    def setUp(self):
+        local_redis.flushall()
+        _local.clear()
+        self.now = timezone.now()
+
+    def like(self, post, user, age):
+        like = LikePost.objects.create(post=post, user=user)
+        LikePost.objects.filter(pk=like.pk).update(created_at=self.now - age)
+
+    def score(self, post):
+        return PostScore.objects.get(post=post).score
+
+    def test_scores_weight_and_decay_events(self):
+        self.like(self.posts[0], self.fans[0], timedelta(0))
+        self.like(self.posts[1], self.fans[0], timedelta(hours=1))
+        comment = Comment.objects.create(post=self.posts[2], user=self.fans[0], content='hot')
+        Comment.objects.filter(pk=comment.pk).update(created_at=self.now)
+
+        self.assertEqual(trending.refresh(self.now), 3)
+        self.assertAlmostEqual(self.score(self.posts[0]), 1.0)
+        self.assertAlmostEqual(self.score(self.posts[1]), 0.5)
+        self.assertAlmostEqual(self.score(self.posts[2]), 3.0)
+
+    def test_refresh_is_incremental(self):
+        self.like(self.posts[0], self.fans[0], timedelta(hours=2))
+        trending.refresh(self.now - timedelta(hours=1))
+        self.assertAlmostEqual(self.score(self.posts[0]), 0.5)
+
+        self.like(self.posts[0], self.fans[1], timedelta(minutes=30))
+        self.assertEqual(trending.refresh(self.now), 1)
+        self.assertAlmostEqual(self.score(self.posts[0]), 0.25 + math.sqrt(0.5))
+        self.assertEqual(TrendingWatermark.objects.get().computed_at, self.now)
+
+    @override_settings(TRENDING_COMMIT_GRACE=60)
+    def test_events_committing_late_are_read_by_a_later_refresh(self):
+        # Stamped 30 seconds ago, by a transaction that only commits after the first refresh.
+        trending.refresh(self.now)
+        self.assertEqual(TrendingWatermark.objects.get().computed_at, self.now - timedelta(seconds=60))
+        self.like(self.posts[0], self.fans[0], timedelta(seconds=30))
+
+        self.assertEqual(trending.refresh(self.now + timedelta(seconds=60)), 1)
+        self.assertAlmostEqual(self.score(self.posts[0]), 2 ** (-30 / 3600))
+        self.assertEqual(trending.refresh(self.now + timedelta(seconds=120)), 0)
+
+    def test_decayed_scores_are_pruned(self):
+        self.like(self.posts[0], self.fans[0], timedelta(hours=1))
+        trending.refresh(self.now - timedelta(minutes=30))
+        trending.refresh(self.now + timedelta(hours=6))
+        self.assertFalse(PostScore.objects.exists())
+
+    def test_endpoint_orders_by_score_and_hides_blocked_authors(self):
+        for post, likes in zip(self.posts, (1, 3, 2)):
+            for fan in self.fans[:likes]:
+                self.like(post, fan, timedelta(0))
+        trending.refresh(self.now)
+
+        client = APIClient()
+        client.force_authenticate(self.reader)
+        response = client.get(reverse('trending-posts'), {'limit': 2})
+        self.assertEqual([item['id'] for item in response.data['results']], [self.posts[1].id, self.posts[2].id])
+        rest = client.get(response.data['next'])
+        self.assertEqual([item['id'] for item in rest.data['results']], [self.posts[0].id])
+
+        Block.objects.create(blocker=self.reader, blocked=self.author)
+        response = client.get(reverse('trending-posts'))
+        self.assertEqual(response.data['results'], [])
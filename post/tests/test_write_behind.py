@@ -0,0 +1,142 @@
+from unittest import mock
+
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ImproperlyConfigured
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from authentication.blocks import _local
+from post import counters
+from post.models import CounterFlush, LikeCounter, LikePost, Post, Reaction, ReactionCount
+from post.tasks import flush_engagement_counters, reconcile_engagement_counters
+from trend.redis_store import local_redis
+
+User = get_user_model()
+
+
+@override_settings(REDIS_URL='local://', ENGAGEMENT_WRITE_BEHIND=True)
+class WriteBehindCounterTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author', email='author@example.com')
+        cls.post = Post.objects.create(user=cls.author, image='images/test.jpg', content='viral')
+        cls.fans = [User.objects.create_user(username=f'fan{i}', email=f'fan{i}@example.com') for i in range(5)]
+
+    def setUp(self):
+        local_redis.flushall()
+        _local.clear()
+        self.client = APIClient()
+
+    def like(self, user):
+        self.client.force_authenticate(user)
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(reverse('toggle-like'), {'post_id': self.post.id})
+
+    def test_likes_are_buffered_until_flushed(self):
+        for fan in self.fans:
+            self.like(fan)
+        self.assertFalse(LikeCounter.objects.filter(post=self.post).exists())
+        self.assertEqual(counters.pending_like_deltas([self.post.id]), {self.post.id: 5})
+
+        self.assertEqual(flush_engagement_counters(), 1)
+        self.assertEqual(LikeCounter.objects.get(post=self.post).count, 5)
+        self.assertEqual(counters.pending_like_deltas([self.post.id]), {})
+
+    def test_reads_include_pending_deltas(self):
+        for fan in self.fans[:3]:
+            self.like(fan)
+        flush_engagement_counters()
+        self.like(self.fans[3])
+        self.like(self.fans[0])  # unlike
+
+        response = self.client.get(reverse('post-list'))
+        self.assertEqual(response.data['results'][0]['like_counter'], 3)
+        response = self.client.get(reverse('post-detail', args=[self.post.id]))
+        self.assertEqual(response.data['like_counter'], 3)
+
+    def test_reaction_changes_are_buffered_per_type(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Reaction.toggle_reaction(self.post, self.fans[0], 'love')
+            Reaction.toggle_reaction(self.post, self.fans[1], 'love')
+            Reaction.toggle_reaction(self.post, self.fans[1], 'haha')
+        flush_engagement_counters()
+        self.assertEqual(
+            dict(ReactionCount.objects.filter(post=self.post).values_list('reaction_type', 'count')),
+            {'love': 1, 'haha': 1},
+        )
+
+    def test_missing_counter_rows_are_seeded_from_existing_rows(self):
+        # Likes and reactions recorded before their counter rows existed.
+        for fan in self.fans[:2]:
+            LikePost.objects.create(post=self.post, user=fan)
+            Reaction.objects.create(post=self.post, user=fan, reaction_type='love')
+        self.like(self.fans[2])
+        with self.captureOnCommitCallbacks(execute=True):
+            Reaction.toggle_reaction(self.post, self.fans[2], 'love')
+        local_redis.rename(counters.LIKES_KEY, counters.LIKES_KEY + ':flushing')
+        self.like(self.fans[3])
+
+        flush_engagement_counters()
+        self.assertEqual(LikeCounter.objects.get(post=self.post).count, 3)
+        self.assertEqual(ReactionCount.objects.get(post=self.post, reaction_type='love').count, 3)
+        flush_engagement_counters()
+        self.assertEqual(LikeCounter.objects.get(post=self.post).count, 4)
+
+    def test_leftover_flush_is_applied_before_new_deltas(self):
+        self.like(self.fans[0])
+        local_redis.rename(counters.LIKES_KEY, counters.LIKES_KEY + ':flushing')
+        self.like(self.fans[1])
+
+        flush_engagement_counters()
+        self.assertEqual(LikeCounter.objects.get(post=self.post).count, 1)
+        flush_engagement_counters()
+        self.assertEqual(LikeCounter.objects.get(post=self.post).count, 2)
+
+    def test_reconcile_does_not_count_buffered_likes_twice(self):
+        for fan in self.fans[:2]:
+            self.like(fan)
+        reconcile_engagement_counters()
+        self.assertEqual(LikeCounter.objects.get(post=self.post).count, 2)
+        self.assertEqual(LikePost.objects.filter(post=self.post).count(), 2)
+
+    def test_flush_dying_after_its_commit_is_not_applied_twice(self):
+        for fan in self.fans[:2]:
+            self.like(fan)
+        with mock.patch.object(local_redis, 'delete', side_effect=ConnectionError):
+            with self.assertRaises(ConnectionError):
+                flush_engagement_counters()
+        self.assertEqual(LikeCounter.objects.get(post=self.post).count, 2)
+        self.assertEqual(CounterFlush.objects.count(), 1)
+
+        # The leftover hash is cleared without being applied again; new likes still are.
+        self.like(self.fans[2])
+        flush_engagement_counters()
+        self.assertEqual(LikeCounter.objects.get(post=self.post).count, 2)
+        flush_engagement_counters()
+        self.assertEqual(LikeCounter.objects.get(post=self.post).count, 3)
+
+    def test_reconcile_leaves_deltas_on_their_way_to_redis(self):
+        self.like(self.fans[0])
+        flush_engagement_counters()
+        # The like is committed, but its HINCRBY has not run yet.
+        self.client.force_authenticate(self.fans[1])
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.client.post(reverse('toggle-like'), {'post_id': self.post.id})
+        reconcile_engagement_counters()
+        self.assertEqual(LikeCounter.objects.get(post=self.post).count, 1)
+
+        callbacks[0]()
+        flush_engagement_counters()
+        self.assertEqual(LikeCounter.objects.get(post=self.post).count, 2)
+
+        # Once the post settles, drift is repaired.
+        LikeCounter.objects.filter(post=self.post).update(count=7)
+        with mock.patch.object(counters, 'SETTLE_SECONDS', 0):
+            reconcile_engagement_counters()
+        self.assertEqual(LikeCounter.objects.get(post=self.post).count, 2)
+
+    def test_write_behind_needs_a_shared_redis(self):
+        with self.assertRaises(ImproperlyConfigured):
+            apps.get_app_config('post').ready()
@@ -0,0 +1,110 @@
+"""
+Fan-out-on-write home timeline.
+
+Each new post id is pushed into a Redis sorted set per follower (scored by the post id, which grows
+with creation time), so reading the "following" feed is one bounded range fetch plus a hydration
+query. Authors with at least TIMELINE_FANOUT_THRESHOLD followers are not fanned out; their posts are
+merged in at read time instead (fan-out-on-read), which keeps a single post from triggering millions
+of writes.
+"""
+from django.conf import settings
+
+from profile_app.models import Follow
+from trend.redis_store import get_redis
+
+from .models import Post
+
+CELEBRITIES_KEY = 'timeline:celebrities'
+FANOUT_BATCH_SIZE = 1000
+
+
+def timeline_key(user_id):
+    return f'timeline:{user_id}'
+
+
+def is_celebrity(author_id):
+    threshold = settings.TIMELINE_FANOUT_THRESHOLD
+    return Follow.objects.filter(following_id=author_id).count() >= threshold
+
+
+def fan_out(post_id, author_id):
+    """
+    Pushes a post into the timelines of its author and the author's followers.
+    Returns the number of timelines written, which is 0 for authors served by fan-out-on-read.
+    """
+    r = get_redis()
+    if is_celebrity(author_id):
+        r.sadd(CELEBRITIES_KEY, author_id)
+        return 0
+    r.srem(CELEBRITIES_KEY, author_id)
+
+    follower_ids = (
+        Follow.objects.filter(following_id=author_id)
+        .values_list('follower_id', flat=True)
+        .iterator(chunk_size=FANOUT_BATCH_SIZE)
+    )
+    written = 0
+    batch = [author_id]
+    for follower_id in follower_ids:
+        batch.append(follower_id)
+        if len(batch) >= FANOUT_BATCH_SIZE:
+            written += _push(r, batch, {post_id: post_id})
+            batch = []
+    if batch:
+        written += _push(r, batch, {post_id: post_id})
+    return written
+
+
+def backfill(follower_id, author_ids):
+    """
+    Loads the most recent posts of the given authors into a follower's timeline, e.g. after a new
+    follow or when the timeline store was flushed.
+    """
+    r = get_redis()
+    celebrities = {int(member) for member in r.smembers(CELEBRITIES_KEY)}
+    author_ids = [author_id for author_id in author_ids if author_id not in celebrities]
+    if not author_ids:
+        return 0
+    post_ids = list(
+        Post.objects.filter(user_id__in=author_ids)
+        .order_by('-id')
+        .values_list('id', flat=True)[:settings.TIMELINE_MAX_LENGTH]
+    )
+    if not post_ids:
+        return 0
+    return _push(r, [follower_id], {post_id: post_id for post_id in post_ids})
+
+
+def read(user_id, before=None, limit=10):
+    """
+    Returns up to `limit` post ids older than `before`, newest first, merging the pushed timeline
+    with the recent posts of followed authors that are not fanned out.
+    """
+    r = get_redis()
+    upper = f'({before}' if before is not None else '+inf'
+    pushed = [int(member) for member in r.zrevrangebyscore(timeline_key(user_id), upper, '-inf', start=0, num=limit)]
+
+    celebrities = [int(member) for member in r.smembers(CELEBRITIES_KEY)]
+    pulled = []
+    if celebrities:
+        followed = Post.objects.filter(
+            user_id__in=celebrities,
+            user__followers__follower_id=user_id,
+        )
+        if before is not None:
+            followed = followed.filter(id__lt=before)
+        pulled = list(followed.order_by('-id').values_list('id', flat=True).distinct()[:limit])
+
+    return sorted(set(pushed).union(pulled), reverse=True)[:limit]
+
+
+def _push(r, user_ids, entries):
+    max_length = settings.TIMELINE_MAX_LENGTH
+    pipe = r.pipeline(transaction=False)
+    for user_id in user_ids:
+        key = timeline_key(user_id)
+        pipe.zadd(key, entries)
+        # Keep only the newest TIMELINE_MAX_LENGTH entries.
+        pipe.zremrangebyrank(key, 0, -(max_length + 1))
+    pipe.execute()
+    return len(user_ids)
@@ -0,0 +1,101 @@
+"""
+Trending posts.
+
+A post's score is the sum of its likes, reactions and comments, each weighted and decayed
+exponentially with age (half-life TRENDING_HALF_LIFE_HOURS). Because the decay is exponential the
+score can be maintained incrementally: every refresh multiplies the stored scores by the decay since
+the previous run and adds the contributions of the events created since then only. Unlikes and
+deleted comments are not subtracted; their contribution simply decays away.
+
+Scores that fall below TRENDING_MIN_SCORE are deleted, so the table only holds recently active posts.
+
+An event's created_at is set before its transaction commits, so a refresh reading up to the
+present could pass over an event that commits just after it. Scores are therefore computed up to
+TRENDING_COMMIT_GRACE seconds ago, and the watermark only advances that far.
+"""
+import math
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Comment, LikePost, PostScore, Reaction, TrendingWatermark
+
+# (source model, weight) of every event counted in a post's score.
+EVENT_WEIGHTS = (
+    (LikePost, 1.0),
+    (Reaction, 1.0),
+    (Comment, 3.0),
+)
+UPDATE_BATCH_SIZE = 1000
+
+
+def decay_rate():
+    return math.log(2) / (settings.TRENDING_HALF_LIFE_HOURS * 3600)
+
+
+def refresh(now=None):
+    """
+    Brings PostScore up to TRENDING_COMMIT_GRACE seconds before `now`. Returns the number of posts
+    whose score received new events. Runs are serialized by a row lock on the watermark, which is
+    created first so that even the first runs have a row to lock.
+    """
+    now = (now or timezone.now()) - timedelta(seconds=settings.TRENDING_COMMIT_GRACE)
+    rate = decay_rate()
+    with transaction.atomic():
+        TrendingWatermark.objects.get_or_create(
+            pk=TrendingWatermark.SINGLETON_PK,
+            defaults={'computed_at': now - timedelta(hours=settings.TRENDING_LOOKBACK_HOURS)},
+        )
+        watermark = TrendingWatermark.objects.select_for_update().get(pk=TrendingWatermark.SINGLETON_PK)
+        since = watermark.computed_at
+        if since >= now:
+            return 0
+
+        elapsed = (now - since).total_seconds()
+        PostScore.objects.update(score=F('score') * math.exp(-rate * elapsed))
+
+        post_ids, totals = _contributions(since, now, rate)
+        _add_scores(post_ids, totals)
+        PostScore.objects.filter(score__lt=settings.TRENDING_MIN_SCORE).delete()
+
+        watermark.computed_at = now
+        watermark.save()
+    return len(post_ids)
+
+
+def _contributions(since, now, rate):
+    """
+    Returns (post_ids, scores): the decayed weight of every event in (since, now], summed per post.
+    """
+    post_ids, timestamps, weights = [], [], []
+    for model, weight in EVENT_WEIGHTS:
+        rows = model.objects.filter(created_at__gt=since, created_at__lte=now).values_list('post_id', 'created_at')
+        for post_id, created_at in rows.iterator(chunk_size=10_000):
+            post_ids.append(post_id)
+            timestamps.append(created_at.timestamp())
+            weights.append(weight)
+    if not post_ids:
+        return np.empty(0, dtype=np.int64), np.empty(0)
+
+    ages = now.timestamp() - np.asarray(timestamps)
+    contributions = np.asarray(weights) * np.exp(-rate * ages)
+    unique_ids, positions = np.unique(np.asarray(post_ids, dtype=np.int64), return_inverse=True)
+    return unique_ids, np.bincount(positions, weights=contributions)
+
+
+def _add_scores(post_ids, totals):
+    additions = dict(zip(post_ids.tolist(), totals.tolist()))
+    if not additions:
+        return
+    existing = PostScore.objects.in_bulk(list(additions))
+    for post_id, score in existing.items():
+        score.score += additions.pop(post_id)
+    PostScore.objects.bulk_update(existing.values(), ['score'], batch_size=UPDATE_BATCH_SIZE)
+    PostScore.objects.bulk_create(
+        [PostScore(post_id=post_id, score=score) for post_id, score in additions.items()],
+        batch_size=UPDATE_BATCH_SIZE,
+    )
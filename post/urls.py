@@ -5,13 +5,17 @@ from .views import (
     CommentDetail,
     LikeToggleView,
     PostComments, CreatePost, CreateComment,  HideOrUnhidePostView,
-    PostLikersList,ReactionToggleView,ReactionListView)
+    PostLikersList,ReactionToggleView,ReactionListView,
+    FollowingTimeline, TrendingPostList, PostEngagementSummary, BatchActionsView)
 
 
 urlpatterns = [
     # posts endpoints
     path('post/createpost/', CreatePost.as_view(), name='create_post'),
     path('posts/', PostList.as_view(), name='post-list'),
+    path('posts/following/', FollowingTimeline.as_view(), name='following-timeline'),
+    path('posts/trending/', TrendingPostList.as_view(), name='trending-posts'),
+    path('posts/engagement/', PostEngagementSummary.as_view(), name='post-engagement-summary'),
     path('post/<int:pk>/', PostDetail.as_view(), name='post-detail'),
     # comments endpoints
     path('post/createcomment/', CreateComment.as_view(), name='create_comment'),
@@ -23,6 +27,7 @@ urlpatterns = [
     # likes endpoints
     path('post/<int:pk>/likers/', PostLikersList.as_view(), name='post-likers-list'),
     path('post/toggle-like/', LikeToggleView.as_view(), name='toggle-like'),
+    path('posts/actions/batch/', BatchActionsView.as_view(), name='batch-actions'),
 
     path('post/hide-or-unhide-post/', HideOrUnhidePostView.as_view(), name='hide-or-unhide-post'),
 
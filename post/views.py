@@ -1,22 +1,33 @@
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q
 from django.shortcuts import get_object_or_404
 from rest_framework.permissions import IsAuthenticatedOrReadOnly
-from .models import Post, Comment, LikePost, LikeCounter, HiddenPost, CommentCounter,Reaction
+from .models import Post, Comment, LikePost, HiddenPost, Reaction
 from rest_framework import serializers
 from rest_framework.views import APIView
 from rest_framework import generics, status
 from rest_framework.response import Response
 from rest_framework.exceptions import PermissionDenied
-from authentication.pagination import CustomPageNumberPagination
+from django.db.models import F
+from authentication.pagination import CountsCursorPagination, CursorOrPageNumberPagination, KeysetCursorPagination
 from .serializers import (CreateCommentSerializer,
                           CreatePostSerializer,
                           PostSerializer,
                           CommentSerializer,
                           LikeToggleSerializer,
+                          EngagementSummaryRequestSerializer,
+                          BatchActionsSerializer,
                           HiddenPostSerializer,
                           LikerSerializer,
-                          ReactionSerializer)
+                          ReactionSerializer,
+                          ReactorSerializer)
 from rest_framework.permissions import IsAuthenticated
-from authentication.models import Block, CustomUser
+from authentication.blocks import get_blocked_user_ids
+from authentication.fieldsets import SparseFieldsetsViewMixin
+from authentication.models import CustomUser
+from profile_app.models import Follow
+from . import actions, counters, engagement, timeline
+from .tasks import fan_out_post, generate_post_image_variants
 
 
 # Create Post view
@@ -27,7 +38,10 @@ class CreatePost(generics.CreateAPIView):
 
     # need adjustment: Overriding `perform_create` may not be necessary if user assignment is handled in the serializer's `create` method.
     def perform_create(self, serializer):
-        serializer.save(user=self.request.user)
+        post = serializer.save(user=self.request.user)
+        # Push the post into the followers' home timelines and render its image sizes once it is committed.
+        transaction.on_commit(lambda: fan_out_post.delay(post.pk))
+        transaction.on_commit(lambda: generate_post_image_variants.delay(post.pk))
 
     # need adjustment: Overriding the `create` method is unnecessary unless you need custom response data.
     # If you need additional fields in the response, consider including them in the serializer.
@@ -54,11 +68,11 @@ class CreatePost(generics.CreateAPIView):
 
 
 # Post views
-class PostList(generics.ListCreateAPIView):
+class PostList(SparseFieldsetsViewMixin, generics.ListCreateAPIView):
     queryset = Post.objects.all().order_by('-created_at')
     serializer_class = PostSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
-    pagination_class = CustomPageNumberPagination
+    pagination_class = CursorOrPageNumberPagination
 
     def get_queryset(self):
         '''
@@ -71,18 +85,78 @@ class PostList(generics.ListCreateAPIView):
         queryset = super().get_queryset()
         user = self.request.user
         if user.is_authenticated:
-            blocked_users = Block.objects.filter(blocker=user).values_list('blocked', flat=True)
-            blocked_by_users = Block.objects.filter(blocked=user).values_list('blocker', flat=True)
-            users_to_exclude = list(set(blocked_users).union(set(blocked_by_users)))
+            users_to_exclude = get_blocked_user_ids(user)
             # Retrieve IDs of posts hidden by any user
             # hidden_post_ids = HiddenPost.objects.values_list('post_id', flat=True)
             hidden_post_ids = HiddenPost.objects.filter(user=user).values_list('post_id', flat=True)
             queryset = Post.objects.exclude(user__in=users_to_exclude).exclude(id__in=hidden_post_ids)
 
-        return queryset.order_by('-created_at')
+        return queryset.with_engagement(user).with_media().order_by('-created_at')
 
 
-class PostDetail(generics.RetrieveUpdateDestroyAPIView):
+class TrendingPagination(KeysetCursorPagination):
+    ordering = ('-trending_score', '-id')
+
+
+class TrendingPostList(SparseFieldsetsViewMixin, generics.ListAPIView):
+    '''
+    Posts ranked by their time-decayed engagement score (see post/trending.py). Scores are refreshed
+    periodically, so a post can move between pages while a client walks the cursor.
+    '''
+    serializer_class = PostSerializer
+    permission_classes = [IsAuthenticatedOrReadOnly]
+    pagination_class = TrendingPagination
+
+    def get_queryset(self):
+        user = self.request.user
+        queryset = Post.objects.filter(trending__isnull=False).annotate(trending_score=F('trending__score'))
+        if user.is_authenticated:
+            queryset = queryset.exclude(user__in=get_blocked_user_ids(user)).exclude(
+                Exists(HiddenPost.objects.filter(user=user, post=OuterRef('pk')))
+            )
+        return queryset.with_engagement(user).with_media()
+
+
+class TimelinePagination(KeysetCursorPagination):
+    ordering = ('-id',)
+
+    def get_previous_link(self):
+        # Timelines are read forward only; the range fetch is always "older than the cursor".
+        return None
+
+
+class FollowingTimeline(SparseFieldsetsViewMixin, generics.ListAPIView):
+    '''
+    Home timeline made of the posts of the users the requester follows (and their own posts).
+    Post ids come from the fan-out-on-write timeline store; only the current page is hydrated.
+    '''
+    serializer_class = PostSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = TimelinePagination
+
+    def get_queryset(self):
+        user = self.request.user
+        position, _ = self.paginator.decode_cursor(self.request, Post.objects.all())
+        before = position[0] if position else None
+        wanted = self.paginator.get_page_size(self.request) + 1
+
+        still_following = Follow.objects.filter(follower=user, following=OuterRef('user'))
+        hidden = HiddenPost.objects.filter(user=user, post=OuterRef('pk'))
+        visible = Post.objects.filter(Q(user=user) | Exists(still_following)).exclude(Exists(hidden))
+
+        # Entries dropped by the visibility filters (unfollowed authors, hidden posts) are made up
+        # for by reading further down the timeline, so a page only comes back short at its end.
+        post_ids = []
+        while len(post_ids) < wanted:
+            batch = timeline.read(user.id, before=before, limit=wanted * 2)
+            post_ids += visible.filter(id__in=batch).order_by('-id').values_list('id', flat=True)[:wanted - len(post_ids)]
+            if len(batch) < wanted * 2:
+                break
+            before = batch[-1]
+        return visible.filter(id__in=post_ids).with_engagement(user).with_media()
+
+
+class PostDetail(SparseFieldsetsViewMixin, generics.RetrieveUpdateDestroyAPIView):
     '''
     Retrieve, update, or delete a specific post.
     - Any user can retrieve the post.
@@ -92,8 +166,15 @@ class PostDetail(generics.RetrieveUpdateDestroyAPIView):
     serializer_class = PostSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
 
+    def get_queryset(self):
+        return super().get_queryset().with_engagement(self.request.user).with_media()
+
     def perform_update(self, serializer):
-        serializer.save(user=self.request.user)
+        previous_image = serializer.instance.image.name
+        post = serializer.save(user=self.request.user)
+        if post.image.name != previous_image:
+            # Render the sizes of the new image once it is committed; they replace the old ones.
+            transaction.on_commit(lambda: generate_post_image_variants.delay(post.pk))
 
     def perform_destroy(self, instance):
         # Optionally, ensure that only the post owner can delete it
@@ -112,14 +193,10 @@ class CreateComment(generics.CreateAPIView):
     permission_classes = [IsAuthenticated]
     
     def perform_create(self, serializer):
-        # Save the new comment and set the user automatically
-        comment = serializer.save(user=self.request.user)
-        
-        # Update CommentCounter
-        post = comment.post  # Get the post from the newly created comment
-        comment_counter, created = CommentCounter.objects.get_or_create(post=post)
-        comment_counter.count = post.comment_count()
-        comment_counter.save()
+        # Save the new comment and set the user automatically. The CommentCounter is incremented
+        # by a post_save receiver, in the same transaction as the comment.
+        with transaction.atomic():
+            serializer.save(user=self.request.user)
 
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
@@ -156,13 +233,15 @@ class CommentDetail(generics.RetrieveUpdateDestroyAPIView):
         # Only the owner of the comment can delete it
         if instance.user != self.request.user:
             raise PermissionDenied("You can only delete your own comment.")
-        instance.delete()
+        # The CommentCounter is decremented by a post_delete receiver in this transaction
+        with transaction.atomic():
+            instance.delete()
 
 
 # Post comments view
 class PostComments(generics.ListAPIView):
     serializer_class = CommentSerializer
-    pagination_class = CustomPageNumberPagination
+    pagination_class = CursorOrPageNumberPagination
 
 
     def get_queryset(self):
@@ -174,12 +253,15 @@ class PostComments(generics.ListAPIView):
             # Handle case when user is not authenticated
             return Comment.objects.none()
         # Get list of blocked user IDs
-        blocked_users = Block.objects.filter(blocker=request_user).values_list('blocked', flat=True)
-        blocked_by_users = Block.objects.filter(blocked=request_user).values_list('blocker', flat=True)
-        users_to_exclude = list(set(blocked_users).union(set(blocked_by_users)))
+        users_to_exclude = get_blocked_user_ids(request_user)
 
         # Exclude comments from blocked users
-        return Comment.objects.filter(post=post).exclude(user__in=users_to_exclude).order_by('-created_at')
+        return (
+            Comment.objects.filter(post=post)
+            .exclude(user__in=users_to_exclude)
+            .select_related('user', 'user__profile')
+            .order_by('-created_at')
+        )
 
 
 class LikeToggleView(generics.GenericAPIView):
@@ -194,45 +276,67 @@ class LikeToggleView(generics.GenericAPIView):
         post = validated_data['post_id']  # Get the post from the validated data
         user = request.user  # Automatically get the authenticated user as the liker
 
-        try:
-            # Check if the authenticated user has already liked the post
-            like = LikePost.objects.get(post=post, user=user)
-            # If the user has already liked the post, unlike it
-            like.delete()
-            message = "Post unliked successfully."
-            liked = False
-        except LikePost.DoesNotExist:
-            # If the user has not liked the post, like it
-            LikePost.objects.create(post=post, user=user)
-            message = "Post liked successfully."
-            liked = True
-
-        # Update the like counter for the post
-        like_counter, created = LikeCounter.objects.get_or_create(post=post)
-        like_counter.count = post.like_count()
-        like_counter.save()
+        # The LikeCounter moves in the same transaction as the like row (see LikePost receivers)
+        with transaction.atomic():
+            liked = LikePost.toggle_like(post, user)
+        message = "Post liked successfully." if liked else "Post unliked successfully."
 
         return Response({"message": message, "liked": liked}, status=status.HTTP_200_OK)
 
 
 
+class PostEngagementSummary(generics.GenericAPIView):
+    '''
+    Like and comment counts, reaction histogram and the requester's like and reaction for up to
+    ENGAGEMENT_SUMMARY_MAX_IDS posts in one request, in a fixed number of grouped queries.
+    '''
+    serializer_class = EngagementSummaryRequestSerializer
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        results = engagement.summarize(request.user, serializer.validated_data['post_ids'])
+        return Response({"results": results}, status=status.HTTP_200_OK)
+
+
+class BatchActionsView(generics.GenericAPIView):
+    '''
+    Applies an ordered list of idempotent like, reaction and hide operations in one transaction,
+    for clients replaying actions queued while offline. Returns one result per operation.
+    '''
+    serializer_class = BatchActionsSerializer
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        results = actions.apply_batch(request.user, serializer.validated_data['operations'])
+        return Response({"results": results}, status=status.HTTP_200_OK)
+
+
 class PostLikersList(generics.ListAPIView):
     """
         List all post Likers.
     """
     serializer_class = LikerSerializer
-    pagination_class = CustomPageNumberPagination
+    pagination_class = CursorOrPageNumberPagination
     permission_classes = [IsAuthenticated]
+    # Likers are listed in the order they liked the post, not by account creation.
+    cursor_ordering = ('-liked_at', '-id')
 
     def get_queryset(self):
         post_id = self.kwargs.get('pk')
         request_user = self.request.user
-        # Get list of blocked user IDs 
-        blocked_users = Block.objects.filter(blocker=request_user).values_list('blocked', flat=True)
-        blocked_by_users = Block.objects.filter(blocked=request_user).values_list('blocker', flat=True)
-        users_to_exclude = list(set(blocked_users).union(set(blocked_by_users)))
-        likers_ids = LikePost.objects.filter(post_id=post_id).values_list('user_id', flat=True).order_by('-created_at')
-        return CustomUser.objects.filter(id__in=likers_ids).exclude(id__in=users_to_exclude)
+        # Get list of blocked user IDs
+        users_to_exclude = get_blocked_user_ids(request_user)
+        return (
+            CustomUser.objects.filter(likepost__post_id=post_id)
+            .exclude(id__in=users_to_exclude)
+            .annotate(liked_at=F('likepost__created_at'))
+            .select_related('profile')
+            .order_by('-liked_at', '-id')
+        )
 
         
 class HideOrUnhidePostView(APIView):
@@ -299,9 +403,34 @@ class ReactionToggleView(generics.CreateAPIView):
 
 
 class ReactionListView(generics.ListAPIView):
-    serializer_class = ReactionSerializer
+    '''
+    Reaction counts per type, read from the materialized histogram, followed by a cursor-paginated
+    list of the users who reacted, newest first. `?type=<reaction type>` restricts the list to one
+    reaction type.
+    '''
+    serializer_class = ReactorSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = CountsCursorPagination
+
+    def get_counts(self):
+        post = get_object_or_404(Post, pk=self.kwargs.get('pk'))
+        reaction_types = [reaction_type for reaction_type, _ in Reaction.REACTION_CHOICES]
+        pending = counters.pending_reaction_deltas([post.pk], reaction_types)
+        return {
+            item['reaction_type']: item['count']
+            for item in post.top_reactions(top_n=len(reaction_types), pending={
+                reaction_type: delta for (_, reaction_type), delta in pending.items()
+            })
+        }
 
     def get_queryset(self):
         post_id = self.kwargs.get('pk')
-        return Reaction.objects.filter(post_id=post_id)
\ No newline at end of file
+        queryset = (
+            Reaction.objects.filter(post_id=post_id)
+            .exclude(user__in=get_blocked_user_ids(self.request.user))
+            .select_related('user')
+        )
+        reaction_type = self.request.query_params.get('type')
+        if reaction_type:
+            queryset = queryset.filter(reaction_type=reaction_type)
+        return queryset
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.16 on 2026-10-18 11:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('profile_app', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='avatar_placeholder',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 4.2.16 on 2026-10-18 11:48
+
+from django.db import migrations
+import uploads.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('profile_app', '0002_profile_avatar_placeholder'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='profile',
+            name='avatar',
+            field=uploads.fields.ContentAddressedImageField(blank=True, null=True, upload_to='profile_pics'),
+        ),
+        migrations.AlterField(
+            model_name='profile',
+            name='background_pic',
+            field=uploads.fields.ContentAddressedImageField(blank=True, null=True, upload_to='background_pics'),
+        ),
+    ]
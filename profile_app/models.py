@@ -1,27 +1,43 @@
 import os
-from django.db import models
+from django.db import models, transaction
 from authentication.models import CustomUser
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 from django.core.exceptions import ValidationError
 from django.core.files import File
 from django.core.files.storage import default_storage
+from uploads.fields import ContentAddressedImageField
 
 
 class Profile(models.Model):
     user = models.OneToOneField(CustomUser, on_delete=models.CASCADE, related_name='profile',null=True)
     bio = models.TextField(blank=True, null=True)
-    avatar = models.ImageField(upload_to='profile_pics', blank=True, null=True)
-    background_pic = models.ImageField(upload_to='background_pics', blank=True, null=True)
+    avatar = ContentAddressedImageField(upload_to='profile_pics', blank=True, null=True)
+    # BlurHash of the avatar, recomputed in the background whenever the avatar changes.
+    avatar_placeholder = models.CharField(max_length=64, blank=True, default='')
+    background_pic = ContentAddressedImageField(upload_to='background_pics', blank=True, null=True)
     hide_avatar = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._saved_avatar = instance.__dict__.get('avatar')
+        return instance
+
     def save(self, *args, **kwargs):
         if not self.avatar and self.user and self.user.avatar.name != 'images/avatar.jpeg':
             
             self.avatar = self.user.avatar
+        avatar_changed = (self.avatar.name or '') != (getattr(self, '_saved_avatar', None) or '')
+        if avatar_changed:
+            self.avatar_placeholder = ''
         super().save(*args, **kwargs)
+        self._saved_avatar = self.avatar.name
+        if avatar_changed and self.avatar:
+            from profile_app.tasks import compute_avatar_placeholder
+            transaction.on_commit(lambda: compute_avatar_placeholder.delay(self.pk))
 
     def post_count(self):
         return self.posts.count()
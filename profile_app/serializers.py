@@ -1,7 +1,9 @@
 from rest_framework import serializers
+from rest_framework.fields import get_attribute
 from .models import Profile, Follow
 from post.models import Post
 from rest_framework.pagination import PageNumberPagination
+from authentication.fieldsets import SparseFieldsetsMixin
 from authentication.pagination import CustomPageNumberPagination
 from post.models import HiddenPost
 
@@ -16,7 +18,7 @@ class PostSerializer(serializers.ModelSerializer):
         fields = ('id', 'content', 'created_at', 'updated_at', 'image')
 
 
-class ProfileSerializer(serializers.ModelSerializer):
+class ProfileSerializer(SparseFieldsetsMixin, serializers.ModelSerializer):
     user_posts = serializers.SerializerMethodField()
     posts_count = serializers.SerializerMethodField()
     is_following = serializers.SerializerMethodField()
@@ -25,6 +27,7 @@ class ProfileSerializer(serializers.ModelSerializer):
     vlogs_count = serializers.SerializerMethodField()
     username = serializers.CharField(source='user.username', read_only=True)
     avatar = serializers.ImageField(max_length=None, use_url=True, allow_null=True, required=False)
+    avatar_placeholder = serializers.ReadOnlyField()
 
     def get_user_posts(self, profile):
         user = self.context['request'].user
@@ -80,7 +83,46 @@ class ProfileSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Profile
-        fields = ('id', 'username', 'bio', 'avatar', 'background_pic', 'created_at', 'updated_at', 'posts_count', 'following_count', 'followers_count', 'is_following', 'user_posts', 'hide_avatar', 'vlogs_count')
+        fields = ('id', 'username', 'bio', 'avatar', 'avatar_placeholder', 'background_pic', 'created_at', 'updated_at', 'posts_count', 'following_count', 'followers_count', 'is_following', 'user_posts', 'hide_avatar', 'vlogs_count')
+
+
+# Compact projection of a profile for list endpoints (likers, followers, blocks)
+class ProfileSummarySerializer(serializers.ModelSerializer):
+    username = serializers.CharField(source='user.username', read_only=True)
+    avatar = serializers.ImageField(read_only=True)
+    avatar_placeholder = serializers.ReadOnlyField()
+    is_following = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Profile
+        fields = ('id', 'username', 'avatar', 'avatar_placeholder', 'hide_avatar', 'is_following')
+        read_only_fields = ('hide_avatar',)
+
+    def get_is_following(self, profile):
+        request = self.context.get('request')
+        if not (request and request.user.is_authenticated):
+            return False
+        # The followed users among the whole page, fetched with one query.
+        followed = self.context.get('followed_user_ids')
+        if followed is None:
+            user_ids = [page_profile.user_id for page_profile in self.page_profiles(profile)]
+            followed = self.context['followed_user_ids'] = set(
+                Follow.objects.filter(follower=request.user, following_id__in=user_ids)
+                .values_list('following_id', flat=True)
+            )
+        return profile.user_id in followed
+
+    def page_profiles(self, profile):
+        # The summary may be nested in the rows of the page (a liker, a block), so the profiles are
+        # found by following the sources from the root's rows down to this serializer.
+        if not isinstance(self.root, serializers.ListSerializer):
+            return [profile]
+        path, field = [], self
+        while field is not self.root:
+            path[:0] = [attr for attr in field.source_attrs if attr]
+            field = field.parent
+        profiles = (get_attribute(row, path) for row in self.root.instance)
+        return [page_profile for page_profile in profiles if page_profile is not None]
 
 
 class FollowSerializer(serializers.ModelSerializer):
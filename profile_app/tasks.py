@@ -0,0 +1,17 @@
+from celery import shared_task
+
+from profile_app.models import Profile
+from trend import blurhash
+
+
+@shared_task()
+def compute_avatar_placeholder(profile_pk):
+    profile = Profile.objects.filter(pk=profile_pk).first()
+    if profile is None or not profile.avatar:
+        return None
+    avatar_name = profile.avatar.name
+    with profile.avatar.open('rb') as avatar:
+        placeholder = blurhash.encode_file(avatar)
+    # Skip the write if the avatar was replaced meanwhile; its own task stores the new placeholder.
+    Profile.objects.filter(pk=profile_pk, avatar=avatar_name).update(avatar_placeholder=placeholder)
+    return placeholder
@@ -1,3 +1,135 @@
-from django.test import TestCase
+import shutil
+import tempfile
+from io import BytesIO
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+from rest_framework.test import APIClient
+
+from authentication.blocks import _local
+from authentication.models import Block
+from post.models import LikePost, Post
+from profile_app.models import Follow, Profile
+from profile_app.tasks import compute_avatar_placeholder
+from trend.redis_store import local_redis
+
+User = get_user_model()
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def png(colour):
+    buffer = BytesIO()
+    Image.new('RGB', (64, 64), colour).save(buffer, 'PNG')
+    return ContentFile(buffer.getvalue())
+
+
+@override_settings(
+    DEFAULT_FILE_STORAGE='django.core.files.storage.FileSystemStorage',
+    MEDIA_ROOT=MEDIA_ROOT,
+)
+class AvatarPlaceholderTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.profile = User.objects.create_user(username='user', email='user@example.com').profile
+
+    def test_new_avatar_schedules_placeholder(self):
+        self.profile.avatar.save('blue.png', png((0, 0, 255)), save=False)
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.profile.save()
+        self.assertEqual(len(callbacks), 1)
+
+        placeholder = compute_avatar_placeholder(self.profile.pk)
+        self.profile.refresh_from_db()
+        self.assertEqual(self.profile.avatar_placeholder, placeholder)
+
+    def test_unchanged_avatar_keeps_placeholder(self):
+        self.profile.avatar.save('red.png', png((255, 0, 0)), save=False)
+        self.profile.save()
+        compute_avatar_placeholder(self.profile.pk)
+        self.profile.refresh_from_db()
+
+        self.profile.bio = 'hello'
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.profile.save()
+        self.assertEqual(callbacks, [])
+        self.profile.refresh_from_db()
+        self.assertNotEqual(self.profile.avatar_placeholder, '')
+
+
+@override_settings(REDIS_URL='local://')
+class ProfileSummaryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='user', email='user@example.com')
+        cls.others = [User.objects.create_user(username=f'other{i}', email=f'other{i}@example.com') for i in range(10)]
+        for other in cls.others:
+            Follow.objects.create(follower=other, following=cls.user)
+        for other in cls.others[::2]:
+            Follow.objects.create(follower=cls.user, following=other)
+
+    def setUp(self):
+        local_redis.flushall()
+        _local.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def following_flags(self, rows):
+        return {row['username']: row['is_following'] for row in rows}
+
+    def expected_flags(self):
+        return {other.username: i % 2 == 0 for i, other in enumerate(self.others)}
+
+    def test_followers_page_resolves_is_following_at_once(self):
+        url = reverse('followers-list', args=[self.user.pk])
+        self.client.get(url)
+        # User, count, page and the followed users among the page.
+        with self.assertNumQueries(4):
+            response = self.client.get(url)
+        self.assertEqual(self.following_flags(response.data['results']), self.expected_flags())
+        self.assertEqual(
+            set(response.data['results'][0]),
+            {'id', 'username', 'avatar', 'avatar_placeholder', 'hide_avatar', 'is_following'},
+        )
+
+    def test_summaries_tell_clients_to_hide_the_avatar(self):
+        Profile.objects.filter(user=self.others[0]).update(hide_avatar=True, avatar_placeholder='LKO2?U%2Tw=w')
+        response = self.client.get(reverse('followers-list', args=[self.user.pk]))
+        rows = {row['username']: row for row in response.data['results']}
+        self.assertEqual(
+            (rows['other0']['hide_avatar'], rows['other0']['avatar_placeholder']), (True, 'LKO2?U%2Tw=w'),
+        )
+        self.assertFalse(rows['other1']['hide_avatar'])
+
+    def test_likers_page_resolves_is_following_at_once(self):
+        post = Post.objects.create(user=self.user, image='images/test.jpg', content='post')
+        for other in self.others:
+            LikePost.objects.create(post=post, user=other)
+        url = reverse('post-likers-list', args=[post.id])
+        self.client.get(url)
+        with self.assertNumQueries(3):
+            response = self.client.get(url)
+        rows = [row['profile'] for row in response.data['results']]
+        self.assertEqual(self.following_flags(rows), self.expected_flags())
+
+    def test_block_list_uses_summaries(self):
+        for other in self.others[:4]:
+            Block.objects.create(blocker=self.user, blocked=other)
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('block-list'))
+        rows = [row['blocked_profile'] for row in response.data['data']]
+        # Blocking removes the follows both ways.
+        self.assertEqual(self.following_flags(rows), {other.username: False for other in self.others[:4]})
+
+    def test_anonymous_profile_list_skips_follow_lookup(self):
+        self.client.force_authenticate(None)
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('profile'))
+        self.assertTrue(all(row['is_following'] is False for row in response.data['results']))
@@ -1,12 +1,15 @@
+from django.db import transaction
 from rest_framework import generics, status
-from .serializers import ProfileSerializer, FollowSerializer
+from .serializers import ProfileSerializer, ProfileSummarySerializer, FollowSerializer
 from rest_framework.permissions import IsAuthenticated
 from django.core.exceptions import PermissionDenied
 from .models import Profile, Follow
 from django.db.models import Exists, OuterRef
+from authentication.blocks import get_blocked_user_ids
 from authentication.models import Block, CustomUser
 from rest_framework.response import Response
 from authentication.pagination import CustomPageNumberPagination
+from post.tasks import backfill_timeline
 # from vlog.models import Video
 # from vlog.serializers import VideoSerializer
 
@@ -39,20 +42,18 @@ class ProfileViewList(generics.ListAPIView):
     created when a user registers.
     """
     queryset = Profile.objects.all()
-    serializer_class = ProfileSerializer
+    serializer_class = ProfileSummarySerializer
     pagination_class = CustomPageNumberPagination
 
     def get_queryset(self):
         """
         Filter out blocked profiles for authenticated users.
         """
-        queryset = Profile.objects.all().order_by('-created_at')
+        queryset = Profile.objects.select_related('user')
         user = self.request.user
         if user.is_authenticated:
-            blocked_users = Block.objects.filter(blocker=user).values_list('blocked', flat=True)
-            blocked_by_users = Block.objects.filter(blocked=user).values_list('blocker', flat=True)
-            users_to_exclude = list(set(blocked_users).union(set(blocked_by_users)))
-            queryset = Profile.objects.exclude(user__in=users_to_exclude)
+            users_to_exclude = get_blocked_user_ids(user)
+            queryset = queryset.exclude(user__in=users_to_exclude)
         return queryset.order_by('-created_at')
 
 class ProfileDetails(generics.RetrieveUpdateAPIView):
@@ -123,6 +124,8 @@ class FollowUserView(generics.CreateAPIView):
             return Response({'error': 'You are already following this user.'}, status=status.HTTP_400_BAD_REQUEST)
         # Create a new follow relationship
         follow = Follow.objects.create(follower=follower, following=following)
+        # Seed the follower's home timeline with the recent posts of the newly followed user.
+        transaction.on_commit(lambda: backfill_timeline.delay(follower.pk, [following.pk]))
         serializer = FollowSerializer(follow)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
@@ -155,7 +158,7 @@ class FollowersListAPIView(generics.ListAPIView):
     """
     List all followers of a user.
     """
-    serializer_class = ProfileSerializer
+    serializer_class = ProfileSummarySerializer
     pagination_class = CustomPageNumberPagination
     permission_classes = [IsAuthenticated]
 
@@ -166,11 +169,12 @@ class FollowersListAPIView(generics.ListAPIView):
             user = CustomUser.objects.get(pk=user_id)
             # Get list of followers' user IDs
             followers = user.followers.all().values_list('follower', flat=True)
-            blocked_users = Block.objects.filter(blocker=request_user).values_list('blocked', flat=True)
-            # Filter out blocked users from followers list
-            followers = [follower for follower in followers if follower not in blocked_users]
-            # Return profiles of all followers
-            return Profile.objects.filter(user__in=followers)
+            # Return profiles of all followers, leaving out blocked users
+            return (
+                Profile.objects.filter(user__in=followers)
+                .exclude(user__in=get_blocked_user_ids(request_user))
+                .select_related('user')
+            )
         except CustomUser.DoesNotExist:
             return Profile.objects.none()
      
@@ -179,7 +183,7 @@ class FollowingListAPIView(generics.ListAPIView):
     """
     List all users a user is following.
     """
-    serializer_class = ProfileSerializer
+    serializer_class = ProfileSummarySerializer
     permission_classes = [IsAuthenticated]
     pagination_class = CustomPageNumberPagination
 
@@ -190,12 +194,12 @@ class FollowingListAPIView(generics.ListAPIView):
             user = CustomUser.objects.get(pk=user_id)
             # Get list of following user IDs
             followings = user.following.all().values_list('following', flat=True)
-            # Get list of blocked user IDs
-            blocked_users = Block.objects.filter(blocker=request_user).values_list('blocked', flat=True)
-            # Filter out blocked users from followings list
-            followings = [following for following in followings if following not in blocked_users]
-            # Return profiles of all users being followed
-            return Profile.objects.filter(user__in=followings)
+            # Return profiles of all users being followed, leaving out blocked users
+            return (
+                Profile.objects.filter(user__in=followings)
+                .exclude(user__in=get_blocked_user_ids(request_user))
+                .select_related('user')
+            )
         except CustomUser.DoesNotExist:
             return Profile.objects.none()
         
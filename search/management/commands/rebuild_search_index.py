@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from post.models import Comment, Post
+from search.models import SearchDocument
+from vlog.models import Video
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search index from the posts, videos and comments'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Documents written per statement.')
+
+    def handle(self, *args, **options):
+        """
+        Needed after writes that skip the model signals, such as bulk_create() or update().
+        """
+        sources = [
+            (Post.objects.all(), SearchDocument.for_post),
+            (Video.objects.all(), SearchDocument.for_video),
+            (Comment.objects.all(), SearchDocument.for_comment),
+        ]
+        total = 0
+        with transaction.atomic():
+            SearchDocument.objects.all().delete()
+            for queryset, document in sources:
+                batch = []
+                for instance in queryset.order_by('pk').iterator(chunk_size=options['batch_size']):
+                    batch.append(document(instance))
+                    if len(batch) == options['batch_size']:
+                        SearchDocument.objects.bulk_create(batch)
+                        total += len(batch)
+                        batch = []
+                SearchDocument.objects.bulk_create(batch)
+                total += len(batch)
+        self.stdout.write(self.style.SUCCESS(f'Indexed {total} documents.'))
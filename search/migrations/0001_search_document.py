@@ -0,0 +1,84 @@
+# Generated by Django 4.2.16 on 2026-10-18 11:53
+
+from django.db import migrations, models
+
+
+SQLITE_TABLE = """
+CREATE VIRTUAL TABLE search_document USING fts5(
+    body, kind UNINDEXED, object_id UNINDEXED, user_id UNINDEXED, post_id UNINDEXED, created_at UNINDEXED,
+    tokenize = 'unicode61 remove_diacritics 2'
+)
+"""
+
+POSTGRES_TABLE = [
+    """
+    CREATE TABLE search_document (
+        rowid bigint PRIMARY KEY,
+        body text NOT NULL,
+        kind varchar(10) NOT NULL,
+        object_id bigint NOT NULL,
+        user_id bigint NOT NULL,
+        post_id bigint NULL,
+        created_at timestamp with time zone NOT NULL,
+        document tsvector GENERATED ALWAYS AS (to_tsvector('simple', body)) STORED
+    )
+    """,
+    "CREATE INDEX search_document_document_idx ON search_document USING GIN (document)",
+]
+
+# Document ids are object_id * 4 + 1 for posts, + 2 for videos and + 3 for comments.
+POPULATE = [
+    """
+    INSERT INTO search_document (rowid, body, kind, object_id, user_id, post_id, created_at)
+    SELECT id * 4 + 1, COALESCE(content, ''), 'post', id, user_id, id, created_at FROM post_post
+    """,
+    """
+    INSERT INTO search_document (rowid, body, kind, object_id, user_id, post_id, created_at)
+    SELECT id * 4 + 2, title || CASE WHEN COALESCE(description, '') = '' THEN '' ELSE ' ' || description END,
+           'video', id, author_id, NULL, created_at FROM vlog_video
+    """,
+    """
+    INSERT INTO search_document (rowid, body, kind, object_id, user_id, post_id, created_at)
+    SELECT id * 4 + 3, content, 'comment', id, user_id, post_id, created_at FROM post_comment
+    """,
+]
+
+
+def create_index(apps, schema_editor):
+    statements = POSTGRES_TABLE if schema_editor.connection.vendor == 'postgresql' else [SQLITE_TABLE]
+    for statement in statements + POPULATE:
+        schema_editor.execute(statement)
+
+
+def drop_index(apps, schema_editor):
+    schema_editor.execute('DROP TABLE search_document')
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('post', '0012_content_addressed_image'),
+        ('vlog', '0007_content_addressed_video'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('id', models.BigIntegerField(db_column='rowid', primary_key=True, serialize=False)),
+                ('body', models.TextField()),
+                ('kind', models.CharField(choices=[('post', 'Post'), ('video', 'Video'), ('comment', 'Comment')], max_length=10)),
+                ('object_id', models.BigIntegerField()),
+                ('user_id', models.BigIntegerField()),
+                ('post_id', models.BigIntegerField(null=True)),
+                ('created_at', models.DateTimeField()),
+            ],
+            options={
+                'db_table': 'search_document',
+                'managed': False,
+            },
+        ),
+        migrations.RunPython(create_index, drop_index),
+    ]
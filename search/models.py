@@ -0,0 +1,126 @@
+from django.db import connection, models, transaction
+from django.db.models import BooleanField, FloatField
+from django.db.models.expressions import RawSQL
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from post.models import Comment, Post
+from vlog.models import Video
+
+from . import query as search_query
+
+
+class SearchQuerySet(models.QuerySet):
+    def search(self, text):
+        """
+        Documents matching every term of `text`, annotated with `rank`, higher being more
+        relevant. Text without any term matches nothing.
+        """
+        query = search_query.prepare(text, connection.vendor)
+        if query is None:
+            return self.none()
+        if connection.vendor == 'postgresql':
+            tsquery = "to_tsquery('simple', %s)"
+            match = RawSQL(f'"search_document"."document" @@ {tsquery}', (query,), output_field=BooleanField())
+            rank = RawSQL(f'ts_rank_cd("search_document"."document", {tsquery})', (query,), output_field=FloatField())
+        else:
+            match = RawSQL('"search_document" MATCH %s', (query,), output_field=BooleanField())
+            # bm25() is lower for better matches.
+            rank = RawSQL('-bm25("search_document")', (), output_field=FloatField())
+        return self.filter(match).annotate(rank=rank)
+
+
+class SearchDocument(models.Model):
+    """
+    One row of the full-text index per post, video and comment, written by the receivers below.
+
+    The table is created by the migration for the database in use: an FTS5 virtual table on
+    SQLite, and on PostgreSQL a table with a generated `tsvector` column and a GIN index over it.
+    Only `body` is searchable; the other columns filter and identify the results. The primary
+    key encodes the kind and id of the indexed object so that updates address the row directly.
+    """
+    POST = 'post'
+    VIDEO = 'video'
+    COMMENT = 'comment'
+    KIND_CHOICES = [
+        (POST, 'Post'),
+        (VIDEO, 'Video'),
+        (COMMENT, 'Comment'),
+    ]
+    KIND_CODES = {POST: 1, VIDEO: 2, COMMENT: 3}
+
+    id = models.BigIntegerField(primary_key=True, db_column='rowid')
+    body = models.TextField()
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    object_id = models.BigIntegerField()
+    user_id = models.BigIntegerField()
+    # The post a post or comment belongs to, for the hidden-posts filter.
+    post_id = models.BigIntegerField(null=True)
+    created_at = models.DateTimeField()
+
+    objects = SearchQuerySet.as_manager()
+
+    class Meta:
+        managed = False
+        db_table = 'search_document'
+
+    @classmethod
+    def document_id(cls, kind, object_id):
+        return object_id * 4 + cls.KIND_CODES[kind]
+
+    @classmethod
+    def for_post(cls, post):
+        return cls(id=cls.document_id(cls.POST, post.pk), body=post.content or '', kind=cls.POST,
+                   object_id=post.pk, user_id=post.user_id, post_id=post.pk, created_at=post.created_at)
+
+    @classmethod
+    def for_video(cls, video):
+        body = ' '.join(filter(None, [video.title, video.description]))
+        return cls(id=cls.document_id(cls.VIDEO, video.pk), body=body, kind=cls.VIDEO,
+                   object_id=video.pk, user_id=video.author_id, post_id=None, created_at=video.created_at)
+
+    @classmethod
+    def for_comment(cls, comment):
+        return cls(id=cls.document_id(cls.COMMENT, comment.pk), body=comment.content, kind=cls.COMMENT,
+                   object_id=comment.pk, user_id=comment.user_id, post_id=comment.post_id, created_at=comment.created_at)
+
+    @classmethod
+    def replace(cls, documents):
+        """
+        Writes `documents` over their previous versions. FTS5 tables have no upsert, so the old
+        rows are deleted first.
+        """
+        with transaction.atomic():
+            cls.objects.filter(pk__in=[document.pk for document in documents]).delete()
+            cls.objects.bulk_create(documents)
+
+
+def _indexed_fields_saved(update_fields, indexed):
+    # Saves naming their fields (counters, placeholders, processing status) leave the text alone.
+    return update_fields is None or not indexed.isdisjoint(update_fields)
+
+
+@receiver(post_save, sender=Post)
+def index_post(sender, instance, raw=False, update_fields=None, **kwargs):
+    if not raw and _indexed_fields_saved(update_fields, {'content'}):
+        SearchDocument.replace([SearchDocument.for_post(instance)])
+
+
+@receiver(post_save, sender=Video)
+def index_video(sender, instance, raw=False, update_fields=None, **kwargs):
+    if not raw and _indexed_fields_saved(update_fields, {'title', 'description'}):
+        SearchDocument.replace([SearchDocument.for_video(instance)])
+
+
+@receiver(post_save, sender=Comment)
+def index_comment(sender, instance, raw=False, **kwargs):
+    if not raw:
+        SearchDocument.replace([SearchDocument.for_comment(instance)])
+
+
+@receiver(post_delete, sender=Post)
+@receiver(post_delete, sender=Video)
+@receiver(post_delete, sender=Comment)
+def unindex(sender, instance, **kwargs):
+    kind = {Post: SearchDocument.POST, Video: SearchDocument.VIDEO, Comment: SearchDocument.COMMENT}[sender]
+    SearchDocument.objects.filter(pk=SearchDocument.document_id(kind, instance.pk)).delete()
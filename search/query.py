@@ -0,0 +1,25 @@
+"""
+Turns the text typed in the search box into a full-text query.
+
+Only word characters are kept, so user input can never be parsed as query syntax. Every term must
+match, and the last one also matches as a prefix so results show up while the user is typing.
+"""
+import re
+
+MAX_TERMS = 8
+TERM = re.compile(r'\w+')
+
+
+def terms(text):
+    return TERM.findall((text or '').lower())[:MAX_TERMS]
+
+
+def prepare(text, vendor):
+    words = terms(text)
+    if not words:
+        return None
+    if vendor == 'postgresql':
+        # to_tsquery syntax.
+        return ' & '.join(words[:-1] + [f'{words[-1]}:*'])
+    # FTS5 syntax: quoted strings are matched as terms, and juxtaposition is AND.
+    return ' '.join([f'"{word}"' for word in words[:-1]] + [f'"{words[-1]}"*'])
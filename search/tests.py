@@ -0,0 +1,136 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from authentication.blocks import _local
+from authentication.models import Block
+from post.models import Comment, HiddenPost, Post
+from search.models import SearchDocument
+from trend.redis_store import local_redis
+from vlog.models import Video
+
+User = get_user_model()
+
+
+@override_settings(REDIS_URL='local://')
+class SearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='user', email='user@example.com')
+        cls.author = User.objects.create_user(username='author', email='author@example.com')
+
+    def setUp(self):
+        local_redis.flushall()
+        _local.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def search(self, q, **params):
+        response = self.client.get(reverse('search'), {'q': q, **params})
+        self.assertEqual(response.status_code, 200, response.data)
+        return response.data
+
+    def found(self, q, **params):
+        return [(result['type'], result['object']['id']) for result in self.search(q, **params)['results']]
+
+    def create_video(self, title, description='', status=Video.READY):
+        return Video.objects.create(author=self.author, title=title, description=description, video='vlogs/test.mp4', status=status)
+
+    def test_posts_videos_and_comments_are_ranked_together(self):
+        post = Post.objects.create(user=self.author, image='images/test.jpg', content='Sunset at the beach, beach, beach')
+        video = self.create_video('Volleyball', 'Beach volleyball finals')
+        comment = Comment.objects.create(post=post, user=self.author, content='I miss the beach')
+        Post.objects.create(user=self.author, image='images/test.jpg', content='Mountains')
+
+        results = self.search('Beach')['results']
+        self.assertEqual({(r['type'], r['object']['id']) for r in results}, {('post', post.id), ('video', video.id), ('comment', comment.id)})
+        # The post repeating the term ranks first.
+        self.assertEqual((results[0]['type'], results[0]['object']['id']), ('post', post.id))
+        self.assertEqual([r['rank'] for r in results], sorted([r['rank'] for r in results], reverse=True))
+        self.assertEqual(results[0]['object']['content'], post.content)
+
+        self.assertEqual({kind for kind, _ in self.found('beach', type='video,comment')}, {'video', 'comment'})
+        # The last term also matches as a prefix.
+        self.assertEqual(self.found('volley'), [('video', video.id)])
+        self.assertEqual(self.found('sunset beach'), [('post', post.id)])
+
+    def test_index_follows_edits_and_deletes(self):
+        post = Post.objects.create(user=self.author, image='images/test.jpg', content='first draft')
+        self.assertEqual(self.found('draft'), [('post', post.id)])
+        post.content = 'final version'
+        post.save()
+        self.assertEqual(self.found('draft'), [])
+        self.assertEqual(self.found('final'), [('post', post.id)])
+        post.delete()
+        self.assertEqual(self.found('final'), [])
+        self.assertFalse(SearchDocument.objects.exists())
+
+    def test_saves_of_other_fields_do_not_reindex(self):
+        post = Post.objects.create(user=self.author, image='images/test.jpg', content='first draft')
+        video = self.create_video('Volleyball')
+        post.content = 'final version'
+        video.title = 'Surfing'
+        post.save(update_fields=['image_placeholder'])
+        video.save(update_fields=['status'])
+        # The index still has the text it had.
+        self.assertEqual(self.found('draft'), [('post', post.id)])
+        self.assertEqual(self.found('surfing'), [])
+
+        post.save(update_fields=['content', 'image_placeholder'])
+        video.save(update_fields=['description'])
+        self.assertEqual(self.found('final'), [('post', post.id)])
+        self.assertEqual(self.found('surfing'), [('video', video.id)])
+
+    def test_videos_are_found_once_ready(self):
+        video = self.create_video('Skateboarding', status=Video.PROCESSING)
+        self.assertEqual(self.found('skateboarding'), [])
+        self.client.force_authenticate(self.author)
+        self.assertEqual(self.found('skateboarding'), [('video', video.id)])
+
+    def test_blocked_users_and_hidden_posts_are_filtered(self):
+        blocked = User.objects.create_user(username='blocked', email='blocked@example.com')
+        Block.objects.create(blocker=self.user, blocked=blocked)
+        blocked_post = Post.objects.create(user=blocked, image='images/test.jpg', content='garden party')
+        Comment.objects.create(post=blocked_post, user=self.author, content='garden looks great')
+        hidden = Post.objects.create(user=self.author, image='images/test.jpg', content='garden tour')
+        Comment.objects.create(post=hidden, user=self.author, content='garden again')
+        HiddenPost.objects.create(user=self.user, post=hidden)
+        visible = Post.objects.create(user=self.author, image='images/test.jpg', content='garden tools')
+
+        self.assertEqual(self.found('garden'), [('post', visible.id)])
+        self.client.force_authenticate(None)
+        self.assertEqual(len(self.found('garden')), 5)
+
+    def test_cursor_walks_every_result_once(self):
+        posts = [
+            Post.objects.create(user=self.author, image='images/test.jpg', content='cats ' * (i % 4 + 1) + 'and more words')
+            for i in range(23)
+        ]
+        seen, ranks = [], []
+        page = self.search('cats')
+        while True:
+            seen += [result['object']['id'] for result in page['results']]
+            ranks += [result['rank'] for result in page['results']]
+            if not page['next']:
+                break
+            response = self.client.get(page['next'])
+            self.assertEqual(response.status_code, 200)
+            page = response.data
+        self.assertEqual(sorted(seen), sorted(post.id for post in posts))
+        self.assertEqual(ranks, sorted(ranks, reverse=True))
+
+    def test_query_text_is_never_parsed_as_syntax(self):
+        post = Post.objects.create(user=self.author, image='images/test.jpg', content='quotes "and" stars')
+        self.assertEqual(self.found('"and" * (stars'), [('post', post.id)])
+        self.assertEqual(self.client.get(reverse('search'), {'q': '*?!'}).status_code, 400)
+        self.assertEqual(self.client.get(reverse('search'), {'q': 'x', 'type': 'user'}).status_code, 400)
+
+    def test_rebuild_restores_rows_written_in_bulk(self):
+        posts = Post.objects.bulk_create([Post(user=self.author, image='images/test.jpg', content='bulk rows')])
+        self.assertEqual(self.found('bulk'), [])
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(self.found('bulk'), [('post', posts[0].id)])
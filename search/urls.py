@@ -0,0 +1,7 @@
+from django.urls import path
+from .views import SearchView
+
+urlpatterns = [
+    # search endpoints
+    path('search/', SearchView.as_view(), name='search'),
+]
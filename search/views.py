@@ -0,0 +1,90 @@
+from rest_framework import generics
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import IsAuthenticatedOrReadOnly
+
+from authentication.blocks import get_blocked_user_ids
+from authentication.pagination import KeysetCursorPagination
+from post.models import Comment, HiddenPost, Post
+from post.serializers import CommentSerializer, PostSerializer
+from vlog.models import Video
+from vlog.serializers import VideoSerializer
+
+from . import query as search_query
+from .models import SearchDocument
+
+
+class SearchPagination(KeysetCursorPagination):
+    ordering = ('-rank', '-id')
+
+
+class SearchView(generics.ListAPIView):
+    '''
+    Full-text search over post content, video titles and descriptions and comments, most relevant
+    first. `?type=post,video,comment` narrows the kinds. Results from blocked users and posts the
+    user hid are left out.
+    '''
+    permission_classes = [IsAuthenticatedOrReadOnly]
+    pagination_class = SearchPagination
+
+    def get_queryset(self):
+        text = self.request.query_params.get('q', '')
+        if not search_query.terms(text):
+            raise ValidationError({"q": "Enter a search term."})
+        queryset = SearchDocument.objects.search(text)
+
+        kinds = [kind for kind in self.request.query_params.get('type', '').split(',') if kind]
+        if kinds:
+            unknown = set(kinds) - set(SearchDocument.KIND_CODES)
+            if unknown:
+                raise ValidationError({"type": f"Unknown result type: {', '.join(sorted(unknown))}."})
+            queryset = queryset.filter(kind__in=kinds)
+
+        user = self.request.user
+        if user.is_authenticated:
+            blocked = get_blocked_user_ids(user)
+            queryset = queryset.exclude(user_id__in=blocked).exclude(
+                post_id__in=HiddenPost.objects.filter(user=user).values('post_id')
+            )
+            if blocked:
+                # Comments under posts of blocked users.
+                queryset = queryset.exclude(post_id__in=Post.objects.filter(user__in=blocked).values('id'))
+        return queryset.only('id', 'kind', 'object_id', 'post_id')
+
+    def list(self, request, *args, **kwargs):
+        documents = self.paginate_queryset(self.get_queryset())
+        return self.get_paginated_response(self.serialize(documents))
+
+    def serialize(self, documents):
+        '''
+        Loads and serializes the objects of a page of documents with one query per kind. Objects
+        deleted since the page was read, and videos not ready for others to watch, are skipped.
+        '''
+        ids = {kind: [] for kind in SearchDocument.KIND_CODES}
+        for document in documents:
+            ids[document.kind].append(document.object_id)
+
+        context = self.get_serializer_context()
+        user = self.request.user
+        objects = {}
+        if ids[SearchDocument.POST]:
+            posts = Post.objects.filter(pk__in=ids[SearchDocument.POST]).with_engagement(user).with_media()
+            objects[SearchDocument.POST] = PostSerializer(posts, many=True, context=context).data
+        if ids[SearchDocument.VIDEO]:
+            videos = Video.objects.visible_to(user).filter(pk__in=ids[SearchDocument.VIDEO]).select_related('author')
+            objects[SearchDocument.VIDEO] = VideoSerializer(videos, many=True, context=context).data
+        if ids[SearchDocument.COMMENT]:
+            comments = Comment.objects.filter(pk__in=ids[SearchDocument.COMMENT]).select_related('user__profile')
+            objects[SearchDocument.COMMENT] = CommentSerializer(comments, many=True, context=context).data
+        by_id = {(kind, item['id']): item for kind, items in objects.items() for item in items}
+
+        results = []
+        for document in documents:
+            item = by_id.get((document.kind, document.object_id))
+            if item is not None:
+                results.append({
+                    "type": document.kind,
+                    "rank": document.rank,
+                    "post_id": document.post_id,
+                    "object": item,
+                })
+        return results
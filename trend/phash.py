@@ -0,0 +1,39 @@
+"""
+Perceptual hash (pHash) of images, used to find re-uploads of the same picture.
+
+The image is reduced to 32x32 grey levels and transformed with a 2D DCT; each of the 64 bits is
+whether one of the lowest 8x8 frequencies is above their median. Re-encoding, resizing or light
+edits flip only a few bits, so near-duplicates are hashes within a small Hamming distance.
+
+JPEGs are decoded in draft mode, which lets libjpeg scale down while decoding, so hashing a large
+photo costs a few milliseconds.
+"""
+import numpy as np
+from PIL import Image, ImageOps
+
+HASH_SIZE = 8
+SAMPLE_SIZE = 32
+
+# DCT-II basis: row k holds cos(pi * k * (2n + 1) / 2N) for every sample n.
+_DCT = np.cos(np.pi * np.arange(SAMPLE_SIZE)[:, None] * (2 * np.arange(SAMPLE_SIZE)[None, :] + 1) / (2 * SAMPLE_SIZE))
+
+
+def hash_image(image):
+    """
+    Returns the 64-bit hash of a Pillow image as an unsigned int.
+    """
+    image.draft('L', (SAMPLE_SIZE * 2, SAMPLE_SIZE * 2))
+    image = ImageOps.exif_transpose(image).convert('L').resize((SAMPLE_SIZE, SAMPLE_SIZE), Image.LANCZOS)
+    pixels = np.asarray(image, dtype=np.float64)
+    low = (_DCT @ pixels @ _DCT.T)[:HASH_SIZE, :HASH_SIZE]
+    bits = (low > np.median(low)).flatten()
+    return int(''.join('1' if bit else '0' for bit in bits), 2)
+
+
+def hash_file(file):
+    with Image.open(file) as image:
+        return hash_image(image)
+
+
+def distance(a, b):
+    return (a ^ b).bit_count()
@@ -0,0 +1,305 @@
+"""
+Access to the Redis instance shared by timelines, counters and caches.
+
+The web and Celery processes must share it: timelines are written by the fan-out task and read
+by the web workers. REDIS_URL = "local://" selects an in-process stand-in with the same
+interface, which tests use to run without a Redis server; it is not shared between processes.
+"""
+import threading
+import time
+from functools import lru_cache
+
+import redis
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+LOCAL_URL = 'local://'
+
+
+def get_redis():
+    url = settings.REDIS_URL
+    if url == LOCAL_URL:
+        return local_redis
+    if not url:
+        raise ImproperlyConfigured('REDIS_URL must point to the Redis shared by the web and Celery processes.')
+    return _client(url)
+
+
+@lru_cache(maxsize=None)
+def _client(url):
+    return redis.Redis.from_url(url, decode_responses=True)
+
+
+def _score_bound(value):
+    """
+    Parses a Redis score bound ("-inf", "+inf", "(12", 12) into (number, exclusive).
+    """
+    if isinstance(value, str):
+        if value in ('-inf', '+inf', 'inf'):
+            return float(value), False
+        if value.startswith('('):
+            return float(value[1:]), True
+    return float(value), False
+
+
+class LocalRedis:
+    """
+    Thread-safe, in-process implementation of the subset of Redis commands used by the project.
+    Values are stored as strings like a client created with decode_responses=True returns them.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._data = {}
+        self._expiry = {}
+
+    # keys
+
+    def _alive(self, key):
+        deadline = self._expiry.get(key)
+        if deadline is not None and deadline <= time.monotonic():
+            self._data.pop(key, None)
+            self._expiry.pop(key, None)
+        return key in self._data
+
+    def _get(self, key, default_factory=None):
+        if self._alive(key):
+            return self._data[key]
+        if default_factory is None:
+            return None
+        value = self._data[key] = default_factory()
+        return value
+
+    def delete(self, *keys):
+        with self._lock:
+            removed = 0
+            for key in keys:
+                if self._alive(key):
+                    removed += 1
+                self._data.pop(key, None)
+                self._expiry.pop(key, None)
+            return removed
+
+    def exists(self, *keys):
+        with self._lock:
+            return sum(1 for key in keys if self._alive(key))
+
+    def expire(self, key, seconds):
+        with self._lock:
+            if not self._alive(key):
+                return False
+            self._expiry[key] = time.monotonic() + seconds
+            return True
+
+    def rename(self, src, dst):
+        with self._lock:
+            if not self._alive(src):
+                raise redis.ResponseError('no such key')
+            self._data[dst] = self._data.pop(src)
+            self._expiry.pop(dst, None)
+            if src in self._expiry:
+                self._expiry[dst] = self._expiry.pop(src)
+            return True
+
+    def flushall(self):
+        with self._lock:
+            self._data.clear()
+            self._expiry.clear()
+            return True
+
+    # strings
+
+    def get(self, key):
+        with self._lock:
+            return self._get(key)
+
+    def mget(self, keys, *args):
+        with self._lock:
+            names = list(keys) if isinstance(keys, (list, tuple)) else [keys]
+            return [self._get(name) for name in names + list(args)]
+
+    def set(self, key, value, ex=None):
+        with self._lock:
+            self._data[key] = str(value)
+            self._expiry.pop(key, None)
+            if ex is not None:
+                self._expiry[key] = time.monotonic() + ex
+            return True
+
+    # hashes
+
+    def hincrby(self, key, field, amount=1):
+        with self._lock:
+            fields = self._get(key, dict)
+            value = int(fields.get(str(field), 0)) + amount
+            fields[str(field)] = str(value)
+            return value
+
+    def hsetnx(self, key, field, value):
+        with self._lock:
+            fields = self._get(key, dict)
+            if str(field) in fields:
+                return 0
+            fields[str(field)] = str(value)
+            return 1
+
+    def hmget(self, key, keys, *args):
+        with self._lock:
+            fields = self._get(key) or {}
+            names = list(keys) if isinstance(keys, (list, tuple)) else [keys]
+            return [fields.get(str(name)) for name in names + list(args)]
+
+    def hgetall(self, key):
+        with self._lock:
+            return dict(self._get(key) or {})
+
+    # sets
+
+    def sadd(self, key, *members):
+        with self._lock:
+            members_set = self._get(key, set)
+            before = len(members_set)
+            members_set.update(str(member) for member in members)
+            return len(members_set) - before
+
+    def srem(self, key, *members):
+        with self._lock:
+            members_set = self._get(key) or set()
+            removed = sum(1 for member in members if str(member) in members_set)
+            members_set.difference_update(str(member) for member in members)
+            return removed
+
+    def smembers(self, key):
+        with self._lock:
+            return set(self._get(key) or ())
+
+    # sorted sets
+
+    def zadd(self, key, mapping):
+        with self._lock:
+            zset = self._get(key, dict)
+            added = sum(1 for member in mapping if str(member) not in zset)
+            for member, score in mapping.items():
+                zset[str(member)] = float(score)
+            return added
+
+    def zrem(self, key, *members):
+        with self._lock:
+            zset = self._get(key, dict)
+            return sum(1 for member in members if zset.pop(str(member), None) is not None)
+
+    def zincrby(self, key, amount, value):
+        with self._lock:
+            zset = self._get(key, dict)
+            zset[str(value)] = zset.get(str(value), 0.0) + float(amount)
+            return zset[str(value)]
+
+    def zunionstore(self, dest, keys):
+        """
+        Sums the scores of `keys` into `dest` (the default SUM aggregate).
+        """
+        with self._lock:
+            union = {}
+            for key in keys:
+                for member, score in (self._get(key) or {}).items():
+                    union[member] = union.get(member, 0.0) + score
+            self.delete(dest)
+            if union:
+                self._data[dest] = union
+            return len(union)
+
+    def zscore(self, key, member):
+        with self._lock:
+            return (self._get(key) or {}).get(str(member))
+
+    def zremrangebyscore(self, key, min, max):
+        with self._lock:
+            low, low_open = _score_bound(min)
+            high, high_open = _score_bound(max)
+            zset = self._get(key) or {}
+            doomed = [
+                member for member, score in zset.items()
+                if (score > low or (score == low and not low_open))
+                and (score < high or (score == high and not high_open))
+            ]
+            for member in doomed:
+                del zset[member]
+            return len(doomed)
+
+    def zcard(self, key):
+        with self._lock:
+            return len(self._get(key) or {})
+
+    def _sorted(self, key, descending=False):
+        zset = self._get(key) or {}
+        return sorted(zset.items(), key=lambda item: (item[1], item[0]), reverse=descending)
+
+    def zrevrangebyscore(self, key, max, min, start=None, num=None, withscores=False):
+        with self._lock:
+            high, high_open = _score_bound(max)
+            low, low_open = _score_bound(min)
+            items = [
+                (member, score) for member, score in self._sorted(key, descending=True)
+                if (score < high or (score == high and not high_open))
+                and (score > low or (score == low and not low_open))
+            ]
+            if start is not None:
+                items = items[start:start + num if num is not None and num >= 0 else None]
+            return items if withscores else [member for member, _ in items]
+
+    def zrevrange(self, key, start, end, withscores=False):
+        with self._lock:
+            items = self._sorted(key, descending=True)
+            end = end + len(items) if end < 0 else end
+            items = items[start:end + 1]
+            return items if withscores else [member for member, _ in items]
+
+    def zremrangebyrank(self, key, start, end):
+        with self._lock:
+            items = self._sorted(key)
+            length = len(items)
+            start = start + length if start < 0 else start
+            end = end + length if end < 0 else end
+            if end < 0:
+                return 0
+            doomed = items[max(start, 0):end + 1]
+            zset = self._get(key) or {}
+            for member, _ in doomed:
+                del zset[member]
+            return len(doomed)
+
+    def pipeline(self, transaction=True):
+        return LocalPipeline(self)
+
+
+class LocalPipeline:
+    """
+    Queues commands and runs them under the store lock on execute(), like a MULTI/EXEC pipeline.
+    """
+
+    def __init__(self, store):
+        self._store = store
+        self._commands = []
+
+    def __getattr__(self, name):
+        command = getattr(self._store, name)
+
+        def queue(*args, **kwargs):
+            self._commands.append((command, args, kwargs))
+            return self
+        return queue
+
+    def execute(self):
+        with self._store._lock:
+            results = [command(*args, **kwargs) for command, args, kwargs in self._commands]
+        self._commands = []
+        return results
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self._commands = []
+
+
+local_redis = LocalRedis()
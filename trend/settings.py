@@ -45,6 +45,9 @@ INSTALLED_APPS = [
     'post',
     'profile_app',
     'authentication',
+    'uploads',
+    'search',
+    'hashtags',
     'storages',
 ]
 
@@ -208,10 +211,91 @@ CELERY_RESULT_BACKEND = env.str(
 CELERY_ACCEPT_CONTENT = ["json"]
 CELERY_TASK_SERIALIZER = "json"
 CELERY_RESULT_SERIALIZER = "json"
+# Video transcodes run on their own queue, served by the celery-transcode worker (see docker-compose.yml)
+CELERY_TASK_ROUTES = {
+    "vlog.tasks.transcode_rendition": {"queue": env.str("VIDEO_TRANSCODE_QUEUE", default="transcode")},
+}
 
 # Celery Beat
 CELERY_BEAT_SCHEDULER = "django_celery_beat.schedulers:DatabaseScheduler"
+CELERY_BEAT_SCHEDULE = {
+    "reconcile-engagement-counters": {
+        "task": "post.tasks.reconcile_engagement_counters",
+        "schedule": timedelta(hours=1),
+    },
+    "flush-engagement-counters": {
+        "task": "post.tasks.flush_engagement_counters",
+        "schedule": timedelta(seconds=env.int("ENGAGEMENT_FLUSH_INTERVAL", default=5)),
+    },
+    "refresh-trending-scores": {
+        "task": "post.tasks.refresh_trending_scores",
+        "schedule": timedelta(seconds=env.int("TRENDING_REFRESH_INTERVAL", default=60)),
+    },
+    "expire-upload-tickets": {
+        "task": "uploads.tasks.expire_upload_tickets",
+        "schedule": timedelta(hours=1),
+    },
+    "collect-media-blobs": {
+        "task": "uploads.tasks.collect_media_blobs",
+        "schedule": timedelta(hours=1),
+    },
+}
+
+# Redis used for timelines, counters and caches; shared by the web and Celery processes, so it
+# defaults to the broker. "local://" selects the in-process stand-in, for tests only.
+REDIS_URL = env.str("REDIS_URL", default=CELERY_BROKER_URL)
+
+# Block relationship cache settings
+BLOCK_CACHE_TTL = env.int("BLOCK_CACHE_TTL", default=3600)
+BLOCK_CACHE_LOCAL_TTL = env.int("BLOCK_CACHE_LOCAL_TTL", default=5)
+BLOCK_CACHE_LOCAL_SIZE = env.int("BLOCK_CACHE_LOCAL_SIZE", default=10000)
+
+# Widths (in pixels) of the WebP and JPEG renditions generated for every post image
+POST_IMAGE_WIDTHS = env.list("POST_IMAGE_WIDTHS", cast=int, default=[320, 640, 1080])
+
+# Home timeline settings
+TIMELINE_MAX_LENGTH = env.int("TIMELINE_MAX_LENGTH", default=800)
+TIMELINE_FANOUT_THRESHOLD = env.int("TIMELINE_FANOUT_THRESHOLD", default=10000)
+
+# Buffer like and reaction counter deltas in Redis and apply them in batches (see post/counters.py)
+ENGAGEMENT_WRITE_BEHIND = env.bool("ENGAGEMENT_WRITE_BEHIND", default=False)
+
+# Bulk engagement summary (POST /posts/engagement/); a cache TTL of 0 disables the cache
+ENGAGEMENT_SUMMARY_MAX_IDS = env.int("ENGAGEMENT_SUMMARY_MAX_IDS", default=300)
+ENGAGEMENT_SUMMARY_CACHE_TTL = env.int("ENGAGEMENT_SUMMARY_CACHE_TTL", default=0)
+
+# Maximum number of operations accepted by the batch like/reaction/hide endpoint
+BATCH_ACTIONS_MAX_OPERATIONS = env.int("BATCH_ACTIONS_MAX_OPERATIONS", default=200)
+
+# Trending scores (see post/trending.py)
+TRENDING_HALF_LIFE_HOURS = env.float("TRENDING_HALF_LIFE_HOURS", default=6.0)
+TRENDING_LOOKBACK_HOURS = env.int("TRENDING_LOOKBACK_HOURS", default=48)
+TRENDING_MIN_SCORE = env.float("TRENDING_MIN_SCORE", default=0.05)
+# Seconds the scores lag behind, so likes and comments whose transaction commits a little after
+# their created_at are still read by the refresh that covers them
+TRENDING_COMMIT_GRACE = env.int("TRENDING_COMMIT_GRACE", default=60)
+
+# Minutes of hashtag use counted by the trending hashtags (see hashtags/trending.py)
+HASHTAG_TRENDING_WINDOW = env.int("HASHTAG_TRENDING_WINDOW", default=60)
 
 # Vlog settings
 MAX_VIDEO_SIZE = env.float("MAX_VIDEO_SIZE", default=200 * 1024 * 1024)
 MAX_VIDEO_DURATION = env.float("MAX_VIDEO_DURATION", default=15)
+# Used by vlog/probe.py for containers it does not parse itself; ffmpeg's stream summary is used
+# when it is not installed
+FFPROBE_BINARY = env.str("FFPROBE_BINARY", default="ffprobe")
+
+# HLS transcoding (see vlog/hls.py): ffmpeg threads per transcode and seconds before one is aborted
+VIDEO_TRANSCODE_THREADS = env.int("VIDEO_TRANSCODE_THREADS", default=2)
+VIDEO_TRANSCODE_TIMEOUT = env.int("VIDEO_TRANSCODE_TIMEOUT", default=30 * 60)
+
+# Direct-to-storage uploads (see uploads/backends.py); use uploads.backends.LocalUploadBackend
+# when media is not stored on S3
+UPLOAD_BACKEND = env.str("UPLOAD_BACKEND", default="uploads.backends.S3PresignedBackend")
+UPLOAD_TICKET_TTL = env.int("UPLOAD_TICKET_TTL", default=15 * 60)
+# Seconds after which a finalized upload still processing is considered lost and failed
+UPLOAD_PROCESSING_TIMEOUT = env.int("UPLOAD_PROCESSING_TIMEOUT", default=30 * 60)
+UPLOAD_MAX_IMAGE_SIZE = env.int("UPLOAD_MAX_IMAGE_SIZE", default=20 * 1024 * 1024)
+
+# Seconds an unreferenced media blob is kept before it is deleted (see uploads/blobs.py)
+MEDIA_BLOB_GRACE = env.int("MEDIA_BLOB_GRACE", default=60 * 60)
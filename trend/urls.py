@@ -20,6 +20,7 @@ from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
+from uploads.media import media_urlpatterns
 from .swagger import urlpatterns as swagger_urls
 
 
@@ -30,11 +31,13 @@ urlpatterns = [
     path('', include('post.urls')),
     path('', include('profile_app.urls')),
     path('', include('vlog.urls')),
+    path('', include('uploads.urls')),
+    path('', include('search.urls')),
+    path('', include('hashtags.urls')),
 
 
-] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+] + media_urlpatterns()
 urlpatterns += swagger_urls
 
 if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
     urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_URL)
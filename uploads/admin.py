@@ -0,0 +1,15 @@
+from django.contrib import admin
+from .models import MediaBlob, UploadTicket
+
+class UploadTicketAdmin(admin.ModelAdmin):
+    list_display = ('id', 'user', 'kind', 'status', 'size', 'created_at', 'expires_at')
+    list_filter = ('kind', 'status')
+    raw_id_fields = ('user', 'post', 'video')
+
+admin.site.register(UploadTicket, UploadTicketAdmin)
+
+class MediaBlobAdmin(admin.ModelAdmin):
+    list_display = ('name', 'size', 'refcount', 'phash', 'created_at')
+    search_fields = ('sha256', 'name')
+
+admin.site.register(MediaBlob, MediaBlobAdmin)
@@ -0,0 +1,58 @@
+"""
+Upload backends hand out the instructions a client follows to PUT a file straight into storage.
+
+S3PresignedBackend signs a PUT for the bucket of the default S3 storage; pointing
+AWS_S3_ENDPOINT_URL at a MinIO server makes it work against MinIO too. LocalUploadBackend is the
+stand-in for development and tests: the client PUTs to uploads/<id>/data/ on this server with a
+signed token, and the body is written to the default storage under the ticket's key.
+
+The backend in use is UPLOAD_BACKEND.
+"""
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core import signing
+from django.core.files.storage import default_storage
+from django.urls import reverse
+from django.utils.module_loading import import_string
+from storages.utils import clean_name
+
+
+class S3PresignedBackend:
+    def upload_instructions(self, ticket, request):
+        storage = default_storage
+        url = storage.connection.meta.client.generate_presigned_url(
+            'put_object',
+            Params={
+                'Bucket': storage.bucket_name,
+                'Key': storage._normalize_name(clean_name(ticket.key)),
+                'ContentType': ticket.content_type,
+            },
+            ExpiresIn=settings.UPLOAD_TICKET_TTL,
+            HttpMethod='PUT',
+        )
+        return {'method': 'PUT', 'url': url, 'headers': {'Content-Type': ticket.content_type}}
+
+
+class LocalUploadBackend:
+    salt = 'uploads.local'
+
+    def upload_instructions(self, ticket, request):
+        token = signing.dumps(str(ticket.pk), salt=self.salt)
+        url = request.build_absolute_uri(reverse('upload-data', args=[ticket.pk]))
+        return {
+            'method': 'PUT',
+            'url': f"{url}?{urlencode({'token': token})}",
+            'headers': {'Content-Type': ticket.content_type},
+        }
+
+    def check_token(self, ticket, token):
+        try:
+            value = signing.loads(token, salt=self.salt, max_age=settings.UPLOAD_TICKET_TTL)
+        except signing.BadSignature:
+            return False
+        return value == str(ticket.pk)
+
+
+def get_backend():
+    return import_string(settings.UPLOAD_BACKEND)()
@@ -0,0 +1,195 @@
+"""
+Content-addressed media storage.
+
+Files saved through the fields in uploads/fields.py are stored once per content, under
+`<upload_to>/<sha256[:2]>/<sha256>.<ext>`, and recorded as a MediaBlob. Saving the same bytes
+again (a reposted meme, a re-uploaded avatar) returns the existing name without writing anything.
+
+The fields count their references: a row that starts naming a blob acquires it, and a row that
+is deleted or switches to another file releases it. Bulk writes skip the model signals, so the
+counts are only a hint; collect_garbage() recounts the references of every blob that looks
+unused before deleting it, and leaves blobs touched within MEDIA_BLOB_GRACE alone so that a file
+stored by a request whose row is not committed yet is not collected.
+
+Images are indexed by perceptual hash (trend/phash.py) for near-duplicate lookups.
+"""
+import hashlib
+import os
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.base import File
+from django.core.files.storage import default_storage
+from django.db.models import Count, F, Q
+from django.utils import timezone
+
+from trend import phash
+
+from .fields import FIELDS
+from .models import MediaBlob
+
+BANDS = 4
+BAND_BITS = 16
+# Largest distance the banded index is guaranteed to find.
+MAX_DISTANCE = BANDS - 1
+
+
+def content_address(file):
+    digest = hashlib.sha256()
+    for chunk in file.chunks():
+        digest.update(chunk)
+    file.seek(0)
+    return digest.hexdigest()
+
+
+def blob_name(directory, digest, filename):
+    extension = os.path.splitext(filename)[1].lower()
+    return f"{directory.rstrip('/')}/{digest[:2]}/{digest}{extension}"
+
+
+def to_signed(value):
+    # 64-bit hashes are stored in a signed BigIntegerField.
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+def to_unsigned(value):
+    return value + (1 << 64) if value < 0 else value
+
+
+def phash_fields(value):
+    """
+    MediaBlob field values for the unsigned perceptual hash `value`.
+    """
+    mask = (1 << BAND_BITS) - 1
+    fields = {'phash': to_signed(value)}
+    for band in range(BANDS):
+        fields[f'phash_band{band}'] = (value >> (band * BAND_BITS)) & mask
+    return fields
+
+
+def perceptual_hash(file):
+    try:
+        value = phash.hash_file(file)
+    except Exception:
+        return None
+    finally:
+        file.seek(0)
+    return value
+
+
+def store(file, directory, filename, storage=None, image=False):
+    """
+    Returns the storage name holding the content of `file`, saving it only if no blob has it.
+    """
+    storage = storage or default_storage
+    if not hasattr(file, 'chunks'):
+        file = File(file)
+    digest = content_address(file)
+    blob = MediaBlob.objects.filter(pk=digest).first()
+    if blob is not None:
+        # Keeps the blob out of the garbage collector until the new reference is saved.
+        MediaBlob.objects.filter(pk=digest).update(updated_at=timezone.now())
+        return blob.name
+
+    name = blob_name(directory, digest, filename)
+    if not storage.exists(name):
+        name = storage.save(name, file)
+    fields = {'name': name, 'size': storage.size(name)}
+    if image:
+        value = perceptual_hash(file)
+        if value is not None:
+            fields.update(phash_fields(value))
+    blob, created = MediaBlob.objects.get_or_create(sha256=digest, defaults=fields)
+    if not created and blob.name != name:
+        # Another request stored the same content at the same time under another name.
+        storage.delete(name)
+    return blob.name
+
+
+def adopt(name, storage=None, image=False):
+    """
+    Registers a file that was written straight to storage (a direct upload). Returns the name of
+    the existing blob when the content is already stored, after deleting the new copy.
+    """
+    storage = storage or default_storage
+    with storage.open(name, 'rb') as file:
+        digest = content_address(file)
+        value = perceptual_hash(file) if image else None
+    fields = {'name': name, 'size': storage.size(name)}
+    if value is not None:
+        fields.update(phash_fields(value))
+    blob, created = MediaBlob.objects.get_or_create(sha256=digest, defaults=fields)
+    if not created and blob.name != name:
+        storage.delete(name)
+        MediaBlob.objects.filter(pk=digest).update(updated_at=timezone.now())
+    return blob.name
+
+
+def acquire(name):
+    if name:
+        MediaBlob.objects.filter(name=name).update(refcount=F('refcount') + 1, updated_at=timezone.now())
+
+
+def release(name):
+    if name:
+        MediaBlob.objects.filter(name=name).update(refcount=F('refcount') - 1, updated_at=timezone.now())
+
+
+def count_references(names):
+    counts = Counter()
+    for model, field_name in FIELDS:
+        rows = (model._default_manager.filter(**{f'{field_name}__in': names})
+                .values_list(field_name).annotate(references=Count('pk')).order_by())
+        counts.update(dict(rows))
+    return counts
+
+
+def collect_garbage(grace=None):
+    """
+    Deletes the blobs no row references any more, with their files. Returns how many were deleted.
+    """
+    grace = settings.MEDIA_BLOB_GRACE if grace is None else grace
+    cutoff = timezone.now() - timedelta(seconds=grace)
+    candidates = list(MediaBlob.objects.filter(refcount__lte=0, updated_at__lte=cutoff))
+    if not candidates:
+        return 0
+    references = count_references([blob.name for blob in candidates])
+    deleted = 0
+    for blob in candidates:
+        if references[blob.name]:
+            MediaBlob.objects.filter(pk=blob.pk).update(refcount=references[blob.name])
+            continue
+        # The condition skips blobs acquired since they were read.
+        if MediaBlob.objects.filter(pk=blob.pk, refcount__lte=0, updated_at__lte=cutoff).delete()[0]:
+            default_storage.delete(blob.name)
+            deleted += 1
+    return deleted
+
+
+def similar(value, max_distance=MAX_DISTANCE):
+    """
+    Returns (distance, blob) for the images whose perceptual hash is within `max_distance` of
+    the unsigned hash `value`, closest first. Distances above MAX_DISTANCE may be missed.
+    """
+    bands = phash_fields(value)
+    match = Q()
+    for band in range(BANDS):
+        match |= Q(**{f'phash_band{band}': bands[f'phash_band{band}']})
+    matches = []
+    for blob in MediaBlob.objects.filter(match):
+        found = phash.distance(value, to_unsigned(blob.phash))
+        if found <= max_distance:
+            matches.append((found, blob))
+    return sorted(matches, key=lambda match: (match[0], match[1].created_at))
+
+
+def seen_before(file, max_distance=MAX_DISTANCE):
+    """
+    Moderation lookup: the blob with exactly this content, if any, and the similar images.
+    """
+    if not hasattr(file, 'chunks'):
+        file = File(file)
+    exact = MediaBlob.objects.filter(pk=content_address(file)).first()
+    value = perceptual_hash(file)
+    return exact, similar(value, max_distance) if value is not None else []
@@ -0,0 +1,82 @@
+"""
+File fields that store their files content-addressed and keep the MediaBlob reference counts.
+See uploads/blobs.py.
+"""
+import os
+
+from django.db import models
+from django.db.models.fields.files import FieldFile, ImageFieldFile
+from django.db.models.signals import post_delete, post_init, post_save
+
+# (model, field name) of every content-addressed field.
+FIELDS = []
+
+
+class ContentAddressedFieldFile(FieldFile):
+    def save(self, name, content, save=True):
+        from uploads import blobs
+
+        directory = os.path.dirname(self.field.generate_filename(self.instance, name))
+        self.name = blobs.store(content, directory, name, self.storage, image=self.field.is_image)
+        setattr(self.instance, self.field.attname, self.name)
+        self._committed = True
+        if save:
+            self.instance.save()
+
+    save.alters_data = True
+
+
+class ContentAddressedImageFieldFile(ContentAddressedFieldFile, ImageFieldFile):
+    pass
+
+
+class ContentAddressedMixin:
+    is_image = False
+
+    def contribute_to_class(self, cls, name, **kwargs):
+        super().contribute_to_class(cls, name, **kwargs)
+        # Historical models built by migrations keep no references.
+        if cls._meta.abstract or cls.__module__ == '__fake__':
+            return
+        FIELDS.append((cls, name))
+        post_init.connect(self._remember_name, sender=cls, weak=False)
+        post_save.connect(self._update_references, sender=cls, weak=False)
+        post_delete.connect(self._drop_reference, sender=cls, weak=False)
+
+    def _current_name(self, instance):
+        value = instance.__dict__.get(self.attname)
+        return getattr(value, 'name', value) or ''
+
+    def _remember_name(self, instance, **kwargs):
+        # Deferred fields stay unknown; their references are left for the garbage collector to recount.
+        if self.attname in instance.__dict__:
+            instance.__dict__.setdefault('_blob_names', {})[self.attname] = self._current_name(instance)
+
+    def _update_references(self, instance, created, update_fields=None, raw=False, **kwargs):
+        if raw or (update_fields is not None and self.name not in update_fields):
+            return
+        from uploads import blobs
+
+        saved = instance.__dict__.setdefault('_blob_names', {})
+        name = self._current_name(instance)
+        previous = '' if created else saved.get(self.attname)
+        if previous is None or name == previous:
+            saved[self.attname] = name
+            return
+        blobs.acquire(name)
+        blobs.release(previous)
+        saved[self.attname] = name
+
+    def _drop_reference(self, instance, **kwargs):
+        from uploads import blobs
+
+        blobs.release(instance.__dict__.get('_blob_names', {}).get(self.attname, self._current_name(instance)))
+
+
+class ContentAddressedFileField(ContentAddressedMixin, models.FileField):
+    attr_class = ContentAddressedFieldFile
+
+
+class ContentAddressedImageField(ContentAddressedMixin, models.ImageField):
+    attr_class = ContentAddressedImageFieldFile
+    is_image = True
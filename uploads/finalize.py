@@ -0,0 +1,137 @@
+"""
+Validation of direct uploads and creation of the posts and videos they belong to.
+
+The upload never passes through a Django worker, so everything CreatePost and VideoList check on
+the way in is checked here instead, on the stored object, by uploads.tasks.finalize_upload.
+Objects that fail validation are deleted from storage and their ticket is marked failed with the
+reason. Unexpected errors are retried by the task, which then fails the ticket the same way; a
+ticket whose worker died is failed by uploads.tasks.expire_upload_tickets.
+"""
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.storage import default_storage
+from django.db import transaction
+from PIL import Image
+
+from post.models import Post
+from post.tasks import fan_out_post, generate_post_image_variants
+from vlog.models import Video
+from vlog.probe import ProbeError, probe
+
+from . import blobs
+from .models import MediaBlob, UploadTicket
+
+EXTENSIONS = {
+    UploadTicket.POST: ['jpg', 'jpeg', 'png', 'webp', 'gif'],
+    UploadTicket.VIDEO: ['mp4', 'mov', 'avi', 'mkv', 'webm', '3gp'],
+}
+CONTENT_TYPE_PREFIXES = {
+    UploadTicket.POST: 'image/',
+    UploadTicket.VIDEO: 'video/',
+}
+# Pillow reports many phone JPEGs as MPO.
+IMAGE_FORMATS = {'JPEG', 'MPO', 'PNG', 'WEBP', 'GIF'}
+
+
+def max_size(kind):
+    return settings.UPLOAD_MAX_IMAGE_SIZE if kind == UploadTicket.POST else settings.MAX_VIDEO_SIZE
+
+
+def upload_key(kind, extension):
+    """
+    Stores the upload where the model's own upload_to would, so finalizing needs no copy.
+    """
+    field = Post._meta.get_field('image') if kind == UploadTicket.POST else Video._meta.get_field('video')
+    return f'{field.upload_to}{uuid.uuid4().hex}.{extension}'
+
+
+def check_object(ticket):
+    """
+    Cheap checks that only need the object's metadata; the finalize endpoint runs them before
+    queueing the task.
+    """
+    if not default_storage.exists(ticket.key):
+        raise ValidationError('The file has not been uploaded.')
+    if default_storage.size(ticket.key) > ticket.size:
+        raise ValidationError('The uploaded file is larger than announced.')
+
+
+def validate_image(ticket):
+    try:
+        with default_storage.open(ticket.key, 'rb') as file, Image.open(file) as image:
+            image_format = image.format
+            image.verify()
+    except Exception:
+        raise ValidationError('The file is not a valid image.')
+    if image_format not in IMAGE_FORMATS:
+        raise ValidationError(f'Unsupported image format {image_format}.')
+
+
+def validate_video(ticket):
+    """
+    Returns the duration of the video in seconds.
+    """
+    try:
+        path = default_storage.path(ticket.key)
+    except NotImplementedError:
+        path = None
+    try:
+        with default_storage.open(ticket.key, 'rb') as file:
+            duration = probe(file, path=path).duration
+    except ProbeError as e:
+        raise ValidationError(f'Unable to process video file: {e}')
+    if duration > settings.MAX_VIDEO_DURATION:
+        raise ValidationError(f'Video duration exceeds the maximum limit of {settings.MAX_VIDEO_DURATION} seconds.')
+    return duration
+
+
+def fail(ticket, message):
+    """
+    Marks a ticket failed and deletes its upload, unless the upload already became a blob; the
+    blob garbage collector deletes those once nothing names them.
+    """
+    if not MediaBlob.objects.filter(name=ticket.key).exists():
+        default_storage.delete(ticket.key)
+    ticket.status = UploadTicket.FAILED
+    ticket.error = message
+    ticket.save(update_fields=['status', 'error', 'updated_at'])
+    return ticket
+
+
+def finalize(ticket):
+    """
+    Validates the object of a ticket being processed and creates its post or video.
+    """
+    try:
+        check_object(ticket)
+        if ticket.kind == UploadTicket.POST:
+            validate_image(ticket)
+        else:
+            duration = validate_video(ticket)
+    except ValidationError as exc:
+        return fail(ticket, ' '.join(exc.messages))
+
+    # A file that is already stored is reused and the new copy deleted.
+    name = blobs.adopt(ticket.key, image=ticket.kind == UploadTicket.POST)
+    with transaction.atomic():
+        if ticket.kind == UploadTicket.POST:
+            post = Post.objects.create(user_id=ticket.user_id, image=name, content=ticket.metadata.get('content'))
+            transaction.on_commit(lambda: fan_out_post.delay(post.pk))
+            transaction.on_commit(lambda: generate_post_image_variants.delay(post.pk))
+            ticket.post = post
+        else:
+            # With the duration known, the video's ingest chain only renders the thumbnail.
+            ticket.video = Video.objects.create(
+                author_id=ticket.user_id,
+                title=ticket.metadata['title'],
+                description=ticket.metadata.get('description'),
+                video=name,
+                duration=timedelta(seconds=duration),
+            )
+        ticket.status = UploadTicket.COMPLETE
+        ticket.error = ''
+        ticket.save(update_fields=['status', 'error', 'post', 'video', 'updated_at'])
+    return ticket
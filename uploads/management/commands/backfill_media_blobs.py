@@ -0,0 +1,55 @@
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import models
+
+from uploads import blobs
+from uploads.fields import FIELDS
+from uploads.models import MediaBlob
+
+
+class Command(BaseCommand):
+    help = 'Register existing media as content-addressed blobs, point duplicates at a single copy and recount references'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Blobs recounted per query round.')
+
+    def handle(self, *args, **options):
+        known = set(MediaBlob.objects.values_list('name', flat=True))
+        registered = merged = missing = 0
+        for model, field_name in FIELDS:
+            is_image = isinstance(model._meta.get_field(field_name), models.ImageField)
+            names = list(
+                model._default_manager.exclude(**{f'{field_name}__isnull': True}).exclude(**{field_name: ''})
+                .values_list(field_name, flat=True).distinct().order_by(field_name)
+            )
+            for name in names:
+                if name in known:
+                    continue
+                if not default_storage.exists(name):
+                    missing += 1
+                    self.stderr.write(f'{model.__name__}.{field_name}: {name} is missing from storage')
+                    continue
+                canonical = blobs.adopt(name, image=is_image)
+                known.add(canonical)
+                if canonical == name:
+                    registered += 1
+                    continue
+                # adopt() deleted the duplicate; every row naming it now names the kept copy.
+                for other_model, other_field in FIELDS:
+                    other_model._default_manager.filter(**{other_field: name}).update(**{other_field: canonical})
+                merged += 1
+
+        last_name = ''
+        while True:
+            batch = list(MediaBlob.objects.filter(name__gt=last_name).order_by('name')[:options['batch_size']])
+            if not batch:
+                break
+            last_name = batch[-1].name
+            references = blobs.count_references([blob.name for blob in batch])
+            for blob in batch:
+                blob.refcount = references[blob.name]
+            MediaBlob.objects.bulk_update(batch, ['refcount'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Registered {registered} files, merged {merged} duplicates ({missing} missing).'
+        ))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from uploads import blobs
+
+
+class Command(BaseCommand):
+    help = 'List the stored media identical or similar to an image file, with how many rows use each'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Image file to look up.')
+        parser.add_argument('--max-distance', type=int, default=blobs.MAX_DISTANCE, help='Largest perceptual hash distance listed.')
+
+    def handle(self, *args, **options):
+        with open(options['path'], 'rb') as file:
+            exact, matches = blobs.seen_before(file, options['max_distance'])
+        if exact is not None:
+            self.stdout.write(f'identical: {exact.name} ({exact.refcount} references)')
+        for distance, blob in matches:
+            if blob != exact:
+                self.stdout.write(f'distance {distance}: {blob.name} ({blob.refcount} references)')
+        if exact is None and not matches:
+            self.stdout.write('Not seen before.')
@@ -0,0 +1,231 @@
+"""
+Serving media files with HTTP range support, for deployments that serve MEDIA_URL themselves
+(DEBUG with a local MEDIA_URL; S3 answers range requests on its own).
+
+django.views.static.serve ignores `Range`, so seeking in a vlog downloads the whole file again.
+serve() answers single and multiple byte ranges with 206 Partial Content, honours `If-Range`
+and the other conditional headers, and marks files with an ETag and Last-Modified.
+
+Files of a file system storage are handed to the WSGI server as files (FileResponse), which
+gunicorn and uWSGI send with os.sendfile(), a single range included: the file is positioned at
+the start of the range and the response length caps the transfer. Files of other storages are
+read in chunks from the storage. Multipart responses are always read in chunks.
+"""
+import mimetypes
+import os
+import posixpath
+import re
+import secrets
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.urls import re_path
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe
+from django.views.decorators.http import require_safe
+
+CHUNK_SIZE = 64 * 1024
+# More ranges than this, once merged, are answered with the whole file.
+MAX_RANGES = 16
+RANGE_SPEC = re.compile(r'^(\d*)-(\d*)$')
+
+
+class _RangeFile:
+    """
+    Reads at most `length` bytes of `file` from its current position. It keeps the file number, so
+    WSGI servers can still send the range with sendfile().
+    """
+
+    def __init__(self, file, length):
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        size = self.remaining if size < 0 else min(size, self.remaining)
+        data = self.file.read(size) if size else b''
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def close(self):
+        self.file.close()
+
+
+def parse_ranges(header, size):
+    """
+    Returns the byte ranges of a Range header as sorted, merged (first, last) pairs, last included.
+    Returns None when the header is malformed, not in bytes or asks for too many ranges, in which
+    case the whole file is sent, and an empty list when no range overlaps the file.
+    """
+    unit, _, specs = header.partition('=')
+    if unit.strip().lower() != 'bytes':
+        return None
+    ranges = []
+    for spec in specs.split(','):
+        match = RANGE_SPEC.match(spec.strip())
+        if match is None or match.group(0) == '-':
+            return None
+        first, last = match.groups()
+        if not first:
+            # The last `last` bytes.
+            if int(last) > 0 and size:
+                ranges.append((max(0, size - int(last)), size - 1))
+            continue
+        first, last = int(first), int(last) if last else None
+        if last is not None and last < first:
+            return None
+        if first < size:
+            ranges.append((first, size - 1 if last is None else min(last, size - 1)))
+
+    merged = []
+    for first, last in sorted(ranges):
+        if merged and first <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], last))
+        else:
+            merged.append((first, last))
+    return merged if len(merged) <= MAX_RANGES else None
+
+
+def _if_range_matches(request, etag, last_modified):
+    value = request.headers.get('If-Range')
+    if value is None:
+        return True
+    if value.startswith('"'):
+        # Only strong validators match.
+        return etag is not None and value == etag
+    date = parse_http_date_safe(value)
+    return date is not None and last_modified is not None and date == int(last_modified)
+
+
+def _chunks(file, first, length):
+    file.seek(first)
+    while length:
+        data = file.read(min(CHUNK_SIZE, length))
+        if not data:
+            break
+        length -= len(data)
+        yield data
+
+
+def _range(file, first, length):
+    try:
+        yield from _chunks(file, first, length)
+    finally:
+        file.close()
+
+
+def _multipart(file, ranges, size, content_type, boundary):
+    """
+    Returns the parts of a multipart/byteranges body and its length.
+    """
+    headers = [
+        (f'\r\n--{boundary}\r\nContent-Type: {content_type}\r\n'
+         f'Content-Range: bytes {first}-{last}/{size}\r\n\r\n').encode('ascii')
+        for first, last in ranges
+    ]
+    closing = f'\r\n--{boundary}--\r\n'.encode('ascii')
+    length = sum(len(header) for header in headers) + sum(last - first + 1 for first, last in ranges) + len(closing)
+
+    def parts():
+        try:
+            for header, (first, last) in zip(headers, ranges):
+                yield header
+                yield from _chunks(file, first, last - first + 1)
+            yield closing
+        finally:
+            file.close()
+
+    return parts(), length
+
+
+def _stat(storage, name):
+    """
+    Returns (local path or None, size, modification timestamp or None) of a stored file.
+    """
+    if isinstance(storage, FileSystemStorage):
+        path = storage.path(name)
+        if not os.path.isfile(path):
+            raise Http404('"%s" does not exist' % name)
+        stat = os.stat(path)
+        return path, stat.st_size, stat.st_mtime
+    if not storage.exists(name):
+        raise Http404('"%s" does not exist' % name)
+    try:
+        modified = storage.get_modified_time(name).timestamp()
+    except NotImplementedError:
+        modified = None
+    return None, storage.size(name), modified
+
+
+@require_safe
+def serve(request, path, storage=None):
+    """
+    Serves the stored file `path` of the default storage.
+    """
+    storage = storage or default_storage
+    name = posixpath.normpath(path).lstrip('/')
+    if name in ('', '.') or name == '..' or name.startswith('../'):
+        raise Http404('"%s" does not exist' % path)
+    try:
+        local_path, size, modified = _stat(storage, name)
+    except SuspiciousFileOperation:
+        raise Http404('"%s" does not exist' % path)
+
+    etag = f'"{int(modified * 1_000_000):x}-{size:x}"' if modified is not None else None
+    response = get_conditional_response(request, etag=etag, last_modified=modified and int(modified))
+    if response is None:
+        response = _file_response(request, storage, name, local_path, size, etag, modified)
+    response.headers['Accept-Ranges'] = 'bytes'
+    if etag is not None:
+        response.headers['ETag'] = etag
+    if modified is not None:
+        response.headers['Last-Modified'] = http_date(modified)
+    return response
+
+
+def _file_response(request, storage, name, local_path, size, etag, modified):
+    content_type = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+    ranges = None
+    if 'Range' in request.headers and _if_range_matches(request, etag, modified):
+        ranges = parse_ranges(request.headers['Range'], size)
+    if ranges == []:
+        response = HttpResponse(status=416)
+        response.headers['Content-Range'] = f'bytes */{size}'
+        return response
+
+    file = open(local_path, 'rb') if local_path is not None else storage.open(name, 'rb')
+    if ranges is None:
+        return FileResponse(file, content_type=content_type)
+
+    if len(ranges) == 1:
+        (first, last), = ranges
+        length = last - first + 1
+        if local_path is not None:
+            file.seek(first)
+            response = FileResponse(_RangeFile(file, length), status=206, content_type=content_type)
+        else:
+            response = StreamingHttpResponse(_range(file, first, length), status=206, content_type=content_type)
+        response.headers['Content-Range'] = f'bytes {first}-{last}/{size}'
+        response.headers['Content-Length'] = str(length)
+        return response
+
+    boundary = secrets.token_hex(16)
+    parts, length = _multipart(file, ranges, size, content_type, boundary)
+    response = StreamingHttpResponse(parts, status=206, content_type=f'multipart/byteranges; boundary={boundary}')
+    response.headers['Content-Length'] = str(length)
+    return response
+
+
+def media_urlpatterns():
+    """
+    The URL pattern serving MEDIA_URL with serve(), like django.conf.urls.static.static(): only in
+    DEBUG, and only for a MEDIA_URL on this host.
+    """
+    if not settings.DEBUG or not settings.MEDIA_URL or urlsplit(settings.MEDIA_URL).netloc:
+        return []
+    return [re_path(r'^%s(?P<path>.*)$' % re.escape(settings.MEDIA_URL.lstrip('/')), serve)]
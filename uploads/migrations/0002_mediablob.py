@@ -0,0 +1,32 @@
+# Generated by Django 4.2.16 on 2026-10-18 11:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('uploads', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MediaBlob',
+            fields=[
+                ('sha256', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=255, unique=True)),
+                ('size', models.PositiveBigIntegerField()),
+                ('refcount', models.IntegerField(default=0)),
+                ('phash', models.BigIntegerField(blank=True, null=True)),
+                ('phash_band0', models.PositiveIntegerField(blank=True, null=True)),
+                ('phash_band1', models.PositiveIntegerField(blank=True, null=True)),
+                ('phash_band2', models.PositiveIntegerField(blank=True, null=True)),
+                ('phash_band3', models.PositiveIntegerField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['phash_band0'], name='mediablob_phash_band0_idx'), models.Index(fields=['phash_band1'], name='mediablob_phash_band1_idx'), models.Index(fields=['phash_band2'], name='mediablob_phash_band2_idx'), models.Index(fields=['phash_band3'], name='mediablob_phash_band3_idx'), models.Index(fields=['refcount', 'updated_at'], name='mediablob_refcount_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,94 @@
+import uuid
+
+from django.db import models
+from django.utils import timezone
+
+from authentication.models import CustomUser
+
+
+class UploadTicket(models.Model):
+    """
+    A direct-to-storage upload. The client PUTs the file at `key` following the instructions of
+    the upload backend (uploads/backends.py) and then finalizes the ticket; uploads.tasks.finalize_upload
+    validates the stored object and creates the Post or Video from it.
+    """
+    POST = 'post'
+    VIDEO = 'video'
+    KIND_CHOICES = [
+        (POST, 'Post image'),
+        (VIDEO, 'Video'),
+    ]
+
+    PENDING = 'pending'
+    PROCESSING = 'processing'
+    COMPLETE = 'complete'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'Waiting for the upload'),
+        (PROCESSING, 'Processing'),
+        (COMPLETE, 'Complete'),
+        (FAILED, 'Failed'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='upload_tickets')
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    key = models.CharField(max_length=255, unique=True)
+    content_type = models.CharField(max_length=100)
+    # Size announced by the client; the stored object may not be larger.
+    size = models.PositiveBigIntegerField()
+    status = models.CharField(max_length=12, choices=STATUS_CHOICES, default=PENDING)
+    error = models.TextField(blank=True, default='')
+    # Fields of the post or video, sent with the finalize request.
+    metadata = models.JSONField(default=dict, blank=True)
+    post = models.ForeignKey('post.Post', on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    video = models.ForeignKey('vlog.Video', on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    expires_at = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'expires_at'], name='uploadticket_status_exp_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username}: {self.kind} upload {self.pk} ({self.status})"
+
+    @property
+    def is_expired(self):
+        return self.expires_at <= timezone.now()
+
+
+class MediaBlob(models.Model):
+    """
+    One stored file per distinct content, addressed by its SHA-256 (see uploads/blobs.py).
+    `refcount` is the number of model fields naming the file; unreferenced blobs are deleted by
+    uploads.tasks.collect_media_blobs.
+
+    Images also carry their perceptual hash, split into four 16-bit bands that are indexed
+    separately: two hashes within a Hamming distance of 3 share at least one band exactly.
+    """
+    sha256 = models.CharField(max_length=64, primary_key=True)
+    name = models.CharField(max_length=255, unique=True)
+    size = models.PositiveBigIntegerField()
+    refcount = models.IntegerField(default=0)
+    phash = models.BigIntegerField(null=True, blank=True)
+    phash_band0 = models.PositiveIntegerField(null=True, blank=True)
+    phash_band1 = models.PositiveIntegerField(null=True, blank=True)
+    phash_band2 = models.PositiveIntegerField(null=True, blank=True)
+    phash_band3 = models.PositiveIntegerField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['phash_band0'], name='mediablob_phash_band0_idx'),
+            models.Index(fields=['phash_band1'], name='mediablob_phash_band1_idx'),
+            models.Index(fields=['phash_band2'], name='mediablob_phash_band2_idx'),
+            models.Index(fields=['phash_band3'], name='mediablob_phash_band3_idx'),
+            models.Index(fields=['refcount', 'updated_at'], name='mediablob_refcount_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} ({self.refcount} references)"
@@ -0,0 +1,60 @@
+import os
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+from rest_framework import serializers
+
+from uploads import finalize
+from uploads.models import UploadTicket
+
+
+class UploadTicketSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = UploadTicket
+        fields = ['id', 'kind', 'key', 'content_type', 'size', 'status', 'error', 'post', 'video', 'expires_at', 'created_at']
+        read_only_fields = fields
+
+
+class UploadTicketRequestSerializer(serializers.ModelSerializer):
+    filename = serializers.CharField(max_length=255, write_only=True)
+    size = serializers.IntegerField(min_value=1)
+
+    class Meta:
+        model = UploadTicket
+        fields = ['kind', 'filename', 'content_type', 'size']
+
+    def validate(self, attrs):
+        kind = attrs['kind']
+        extension = os.path.splitext(attrs['filename'])[1].lstrip('.').lower()
+        if extension not in finalize.EXTENSIONS[kind]:
+            raise serializers.ValidationError({'filename': f"File extension '{extension}' is not allowed."})
+        if not attrs['content_type'].startswith(finalize.CONTENT_TYPE_PREFIXES[kind]):
+            raise serializers.ValidationError({'content_type': f"Content type '{attrs['content_type']}' is not allowed."})
+        limit = finalize.max_size(kind)
+        if attrs['size'] > limit:
+            raise serializers.ValidationError({'size': f'File size should not exceed {limit / (1024 * 1024)} MB.'})
+        attrs['key'] = finalize.upload_key(kind, extension)
+        return attrs
+
+    def create(self, validated_data):
+        validated_data.pop('filename')
+        validated_data['user'] = self.context['request'].user
+        validated_data['expires_at'] = timezone.now() + timedelta(seconds=settings.UPLOAD_TICKET_TTL)
+        return super().create(validated_data)
+
+
+# Fields sent with the finalize request, per kind of upload.
+class PostUploadSerializer(serializers.Serializer):
+    content = serializers.CharField(max_length=1000, required=False, allow_blank=True, allow_null=True)
+
+
+class VideoUploadSerializer(serializers.Serializer):
+    title = serializers.CharField(max_length=200)
+    description = serializers.CharField(required=False, allow_blank=True, allow_null=True)
+
+
+FINALIZE_SERIALIZERS = {
+    UploadTicket.POST: PostUploadSerializer,
+    UploadTicket.VIDEO: VideoUploadSerializer,
+}
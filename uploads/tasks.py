@@ -0,0 +1,51 @@
+from datetime import timedelta
+
+from celery import shared_task
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.utils import timezone
+
+from uploads import blobs, finalize
+from uploads.models import UploadTicket
+
+
+@shared_task(bind=True, max_retries=3)
+def finalize_upload(self, ticket_pk):
+    ticket = UploadTicket.objects.filter(pk=ticket_pk, status=UploadTicket.PROCESSING).first()
+    if ticket is None:
+        return None
+    try:
+        return finalize.finalize(ticket).status
+    except Exception as exc:
+        # Invalid files fail the ticket inside finalize(); anything else may be transient.
+        if self.request.retries < self.max_retries:
+            raise self.retry(exc=exc)
+        finalize.fail(ticket, 'The upload could not be processed.')
+        raise
+
+
+@shared_task()
+def expire_upload_tickets():
+    """
+    Deletes the tickets that were never finalized, and whatever was uploaded for them. Fails the
+    tickets left processing by a worker that died.
+    """
+    expired = UploadTicket.objects.filter(status=UploadTicket.PENDING, expires_at__lte=timezone.now())
+    count = 0
+    for ticket in expired.iterator():
+        default_storage.delete(ticket.key)
+        ticket.delete()
+        count += 1
+
+    stale = UploadTicket.objects.filter(
+        status=UploadTicket.PROCESSING,
+        updated_at__lte=timezone.now() - timedelta(seconds=settings.UPLOAD_PROCESSING_TIMEOUT),
+    )
+    for ticket in stale.iterator():
+        finalize.fail(ticket, 'Processing the upload timed out.')
+    return count
+
+
+@shared_task()
+def collect_media_blobs():
+    return blobs.collect_garbage()
@@ -0,0 +1,395 @@
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from io import BytesIO, StringIO
+from unittest import mock
+
+import numpy as np
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage, InMemoryStorage, default_storage
+from django.core.management import call_command
+from django.http import FileResponse, Http404
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from moviepy.editor import ImageSequenceClip
+from PIL import Image
+from rest_framework.test import APIClient
+
+from post.models import Post
+from uploads import blobs
+from uploads.media import media_urlpatterns, serve
+from uploads.models import MediaBlob, UploadTicket
+from uploads.tasks import expire_upload_tickets, finalize_upload
+from vlog.models import Video
+
+User = get_user_model()
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def jpeg_bytes():
+    buffer = BytesIO()
+    Image.new('RGB', (64, 48), (30, 120, 200)).save(buffer, 'JPEG')
+    return buffer.getvalue()
+
+
+def photo(seed, size=(400, 300)):
+    rng = np.random.default_rng(seed)
+    return Image.fromarray((rng.random((12, 16, 3)) * 255).astype(np.uint8)).resize(size, Image.BICUBIC)
+
+
+def encode(image, format='JPEG', **options):
+    buffer = BytesIO()
+    image.save(buffer, format, **options)
+    return buffer.getvalue()
+
+
+def mp4_bytes(seconds):
+    path = os.path.join(MEDIA_ROOT, 'clip.mp4')
+    frames = [np.zeros((32, 32, 3), dtype=np.uint8)] * (seconds * 5)
+    ImageSequenceClip(frames, fps=5).write_videofile(path, logger=None)
+    with open(path, 'rb') as clip:
+        return clip.read()
+
+
+@override_settings(
+    REDIS_URL='local://',
+    DEFAULT_FILE_STORAGE='django.core.files.storage.FileSystemStorage',
+    MEDIA_ROOT=MEDIA_ROOT,
+    MEDIA_URL='/media/',
+    UPLOAD_BACKEND='uploads.backends.LocalUploadBackend',
+    MAX_VIDEO_DURATION=3,
+)
+class DirectUploadTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='user', email='user@example.com')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def request_ticket(self, kind, filename, data, content_type):
+        response = self.client.post(reverse('upload-ticket-create'), {
+            'kind': kind, 'filename': filename, 'content_type': content_type, 'size': len(data),
+        }, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        return response.data
+
+    def upload(self, kind, filename, data, content_type, **fields):
+        """
+        Runs the whole flow and returns the ticket once the finalize task has run.
+        """
+        ticket = self.request_ticket(kind, filename, data, content_type)
+        upload = ticket['upload']
+        response = APIClient().generic(upload['method'], upload['url'], data, content_type=upload['headers']['Content-Type'])
+        self.assertEqual(response.status_code, 204)
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = self.client.post(reverse('upload-finalize', args=[ticket['id']]), fields, format='json')
+        self.assertEqual(response.status_code, 202, response.data)
+        self.assertEqual(response.data['status'], UploadTicket.PROCESSING)
+        self.assertEqual(len(callbacks), 1)
+        finalize_upload(ticket['id'])
+        return UploadTicket.objects.get(pk=ticket['id'])
+
+    def test_post_image_upload_creates_post_at_ticket_key(self):
+        ticket = self.upload('post', 'photo.JPG', jpeg_bytes(), 'image/jpeg', content='hello')
+        self.assertEqual(ticket.status, UploadTicket.COMPLETE)
+        self.assertTrue(ticket.key.startswith('images/'))
+        post = Post.objects.get(pk=ticket.post_id)
+        self.assertEqual((post.user, post.content, post.image.name), (self.user, 'hello', ticket.key))
+
+        response = self.client.get(reverse('upload-ticket-detail', args=[ticket.pk]))
+        self.assertEqual(response.data['post'], post.pk)
+
+    def test_video_upload_is_validated_and_created(self):
+        ticket = self.upload('video', 'clip.mp4', mp4_bytes(2), 'video/mp4', title='clip', description='')
+        self.assertEqual(ticket.status, UploadTicket.COMPLETE)
+        video = Video.objects.get(pk=ticket.video_id)
+        self.assertEqual((video.author, video.title, video.video.name), (self.user, 'clip', ticket.key))
+        self.assertAlmostEqual(video.duration.total_seconds(), 2, delta=0.5)
+
+    def test_invalid_media_fails_the_ticket_and_is_deleted(self):
+        ticket = self.upload('post', 'photo.jpg', b'not an image', 'image/jpeg')
+        self.assertEqual((ticket.status, ticket.error), (UploadTicket.FAILED, 'The file is not a valid image.'))
+        self.assertFalse(default_storage.exists(ticket.key))
+
+        ticket = self.upload('video', 'long.mp4', mp4_bytes(5), 'video/mp4', title='long')
+        self.assertEqual(ticket.status, UploadTicket.FAILED)
+        self.assertIn('maximum limit of 3 seconds', ticket.error)
+        self.assertFalse(Video.objects.exists())
+
+    def test_ticket_request_is_validated(self):
+        url = reverse('upload-ticket-create')
+        for body in (
+            {'kind': 'post', 'filename': 'script.exe', 'content_type': 'image/jpeg', 'size': 10},
+            {'kind': 'post', 'filename': 'photo.jpg', 'content_type': 'video/mp4', 'size': 10},
+            {'kind': 'video', 'filename': 'clip.mp4', 'content_type': 'video/mp4', 'size': 300 * 1024 * 1024},
+        ):
+            self.assertEqual(self.client.post(url, body, format='json').status_code, 400)
+
+    def test_finalize_needs_an_upload_and_happens_once(self):
+        ticket = self.request_ticket('post', 'photo.jpg', jpeg_bytes(), 'image/jpeg')
+        finalize_url = reverse('upload-finalize', args=[ticket['id']])
+        self.assertEqual(self.client.post(finalize_url, {}, format='json').status_code, 400)
+
+        default_storage.save(ticket['key'], ContentFile(jpeg_bytes()))
+        self.assertEqual(self.client.post(finalize_url, {}, format='json').status_code, 202)
+        self.assertEqual(self.client.post(finalize_url, {}, format='json').status_code, 409)
+
+        other = User.objects.create_user(username='other', email='other@example.com')
+        self.client.force_authenticate(other)
+        self.assertEqual(self.client.post(finalize_url, {}, format='json').status_code, 404)
+
+    def test_local_upload_requires_a_valid_token(self):
+        ticket = self.request_ticket('post', 'photo.jpg', jpeg_bytes(), 'image/jpeg')
+        url = reverse('upload-data', args=[ticket['id']])
+        response = APIClient().put(f'{url}?token=forged', jpeg_bytes(), content_type='image/jpeg')
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(default_storage.exists(ticket['key']))
+
+    @override_settings(DATA_UPLOAD_MAX_MEMORY_SIZE=1024, FILE_UPLOAD_MAX_MEMORY_SIZE=1024)
+    def test_local_upload_is_streamed_and_limited_to_the_announced_size(self):
+        data = encode(photo(1, size=(800, 600)), quality=95)
+        self.assertGreater(len(data), 4096)
+        ticket = self.upload('post', 'photo.jpg', data, 'image/jpeg')
+        self.assertEqual(ticket.status, UploadTicket.COMPLETE)
+        with default_storage.open(ticket.key, 'rb') as stored:
+            self.assertEqual(stored.read(), data)
+
+        ticket = self.request_ticket('post', 'photo.jpg', data[:-1], 'image/jpeg')
+        upload = ticket['upload']
+        response = APIClient().generic(upload['method'], upload['url'], data, content_type=upload['headers']['Content-Type'])
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(default_storage.exists(ticket['key']))
+
+    def test_unexpected_errors_are_retried_then_fail_the_ticket(self):
+        ticket = self.request_ticket('post', 'photo.jpg', jpeg_bytes(), 'image/jpeg')
+        default_storage.save(ticket['key'], ContentFile(jpeg_bytes()))
+        self.client.post(reverse('upload-finalize', args=[ticket['id']]), {}, format='json')
+        with mock.patch('uploads.finalize.blobs.adopt', side_effect=OSError('storage unavailable')) as adopt:
+            # Run eagerly, the retries run one inside the other.
+            finalize_upload.apply(args=[ticket['id']])
+        self.assertEqual(adopt.call_count, 1 + finalize_upload.max_retries)
+        ticket = UploadTicket.objects.get()
+        self.assertEqual((ticket.status, ticket.error), (UploadTicket.FAILED, 'The upload could not be processed.'))
+        self.assertFalse(default_storage.exists(ticket.key))
+
+    def test_tickets_stuck_processing_are_failed(self):
+        ticket = self.request_ticket('post', 'photo.jpg', jpeg_bytes(), 'image/jpeg')
+        default_storage.save(ticket['key'], ContentFile(jpeg_bytes()))
+        self.assertEqual(self.client.post(reverse('upload-finalize', args=[ticket['id']]), {}, format='json').status_code, 202)
+        expire_upload_tickets()
+        self.assertEqual(UploadTicket.objects.get().status, UploadTicket.PROCESSING)
+
+        # The worker died before finishing.
+        UploadTicket.objects.update(updated_at=timezone.now() - timedelta(hours=1))
+        expire_upload_tickets()
+        ticket = UploadTicket.objects.get()
+        self.assertEqual((ticket.status, ticket.error), (UploadTicket.FAILED, 'Processing the upload timed out.'))
+        self.assertFalse(default_storage.exists(ticket.key))
+
+    def test_expired_tickets_are_removed_with_their_upload(self):
+        ticket = self.request_ticket('post', 'photo.jpg', jpeg_bytes(), 'image/jpeg')
+        default_storage.save(ticket['key'], ContentFile(jpeg_bytes()))
+        UploadTicket.objects.filter(pk=ticket['id']).update(expires_at=timezone.now() - timedelta(seconds=1))
+
+        response = self.client.post(reverse('upload-finalize', args=[ticket['id']]), {}, format='json')
+        self.assertEqual(response.status_code, 410)
+        self.assertEqual(expire_upload_tickets(), 1)
+        self.assertFalse(UploadTicket.objects.exists())
+        self.assertFalse(default_storage.exists(ticket['key']))
+
+
+@override_settings(
+    REDIS_URL='local://',
+    DEFAULT_FILE_STORAGE='django.core.files.storage.FileSystemStorage',
+    MEDIA_ROOT=MEDIA_ROOT,
+    MEDIA_URL='/media/',
+    UPLOAD_BACKEND='uploads.backends.LocalUploadBackend',
+)
+class MediaBlobTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='user', email='user@example.com')
+
+    def create_post(self, data, filename='meme.jpg'):
+        post = Post(user=self.user, content='meme')
+        post.image.save(filename, ContentFile(data), save=False)
+        post.save()
+        return post
+
+    def test_same_content_is_stored_once_and_reference_counted(self):
+        data = encode(photo(1))
+        first = self.create_post(data)
+        second = self.create_post(data, filename='meme_copy.JPG')
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertRegex(first.image.name, r'^images/[0-9a-f]{2}/[0-9a-f]{64}\.jpg$')
+        self.assertEqual(MediaBlob.objects.count(), 1)
+        blob = MediaBlob.objects.get(name=first.image.name)
+        self.assertEqual((blob.refcount, blob.size), (2, len(data)))
+
+        first.delete()
+        second.image.save('other.jpg', ContentFile(encode(photo(2))))
+        blob.refresh_from_db()
+        self.assertEqual(blob.refcount, 0)
+        self.assertEqual(MediaBlob.objects.get(name=second.image.name).refcount, 1)
+
+        self.assertEqual(blobs.collect_garbage(grace=0), 1)
+        self.assertFalse(MediaBlob.objects.filter(pk=blob.pk).exists())
+        self.assertFalse(default_storage.exists(blob.name))
+
+    def test_garbage_collector_recounts_references_first(self):
+        post = self.create_post(encode(photo(3)))
+        # Bulk updates skip the reference counting.
+        MediaBlob.objects.filter(name=post.image.name).update(refcount=0)
+        self.assertEqual(blobs.collect_garbage(grace=0), 0)
+        self.assertEqual(MediaBlob.objects.get(name=post.image.name).refcount, 1)
+
+    def test_near_duplicates_are_found_through_the_banded_index(self):
+        original = self.create_post(encode(photo(4)))
+        unrelated = self.create_post(encode(photo(5)))
+        reposted = encode(photo(4).resize((200, 150)), quality=60)
+
+        exact, matches = blobs.seen_before(BytesIO(reposted))
+        self.assertIsNone(exact)
+        self.assertEqual([blob.name for _, blob in matches], [original.image.name])
+        self.assertLessEqual(matches[0][0], blobs.MAX_DISTANCE)
+
+        exact, _ = blobs.seen_before(BytesIO(encode(photo(5))))
+        self.assertEqual(exact.name, unrelated.image.name)
+
+    def test_direct_upload_of_stored_content_reuses_the_blob(self):
+        data = encode(photo(6))
+        existing = self.create_post(data)
+        client = APIClient()
+        client.force_authenticate(self.user)
+        ticket = client.post(reverse('upload-ticket-create'), {
+            'kind': 'post', 'filename': 'again.jpg', 'content_type': 'image/jpeg', 'size': len(data),
+        }, format='json').data
+        default_storage.save(ticket['key'], ContentFile(data))
+        client.post(reverse('upload-finalize', args=[ticket['id']]), {}, format='json')
+        finalize_upload(ticket['id'])
+
+        post = UploadTicket.objects.get(pk=ticket['id']).post
+        self.assertEqual(post.image.name, existing.image.name)
+        self.assertFalse(default_storage.exists(ticket['key']))
+        self.assertEqual(MediaBlob.objects.get(name=post.image.name).refcount, 2)
+
+    def test_backfill_merges_existing_duplicates(self):
+        data = encode(photo(7))
+        names = [default_storage.save(name, ContentFile(data)) for name in ('images/searchlens.jpg', 'images/searchlens.jpg')]
+        self.assertNotEqual(*names)
+        posts = Post.objects.bulk_create([Post(user=self.user, image=name, content='legacy') for name in names])
+
+        call_command('backfill_media_blobs', stdout=StringIO())
+        self.assertEqual({post.image.name for post in Post.objects.filter(pk__in=[p.pk for p in posts])}, {names[0]})
+        self.assertFalse(default_storage.exists(names[1]))
+        blob = MediaBlob.objects.get(name=names[0])
+        self.assertEqual(blob.refcount, 2)
+        self.assertIsNotNone(blob.phash)
+
+
+class MediaServeTests(TestCase):
+    data = bytes(range(256)) * 40
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.location = tempfile.mkdtemp()
+        # A file system storage, sent with sendfile(), and one read in chunks like a remote storage.
+        cls.storages = [FileSystemStorage(location=cls.location), InMemoryStorage()]
+        for storage in cls.storages:
+            storage.save('vlogs/clip.mp4', ContentFile(cls.data))
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(cls.location, ignore_errors=True)
+
+    def get(self, storage, path='vlogs/clip.mp4', **headers):
+        request = RequestFactory().get(f'/media/{path}', headers=headers)
+        response = serve(request, path, storage=storage)
+        body = b''.join(response.streaming_content) if response.streaming else response.content
+        response.close()
+        return response, body
+
+    def test_whole_file_and_single_ranges(self):
+        for storage in self.storages:
+            response, body = self.get(storage)
+            self.assertEqual((response.status_code, body, response['Accept-Ranges']), (200, self.data, 'bytes'))
+
+            for header, first, last in [('bytes=100-199', 100, 199), ('bytes=-10', 10230, 10239), ('bytes=10200-', 10200, 10239)]:
+                response, body = self.get(storage, Range=header)
+                self.assertEqual(response.status_code, 206)
+                self.assertEqual(response['Content-Range'], f'bytes {first}-{last}/10240')
+                self.assertEqual(response['Content-Length'], str(last - first + 1))
+                self.assertEqual(body, self.data[first:last + 1])
+
+        # Local ranges are handed to the WSGI server as files, positioned at the range.
+        response = serve(RequestFactory().get('/', headers={'Range': 'bytes=100-199'}), 'vlogs/clip.mp4', storage=self.storages[0])
+        self.assertIsInstance(response, FileResponse)
+        self.assertEqual(os.lseek(response.file_to_stream.fileno(), 0, os.SEEK_CUR), 100)
+        response.close()
+
+    def test_multiple_ranges(self):
+        for storage in self.storages:
+            response, body = self.get(storage, Range='bytes=0-9, 20-29, 5-14')
+            self.assertEqual(response.status_code, 206)
+            self.assertEqual(response['Content-Length'], str(len(body)))
+            content_type, boundary = response['Content-Type'].split('; boundary=')
+            self.assertEqual(content_type, 'multipart/byteranges')
+            parts = body.split(f'--{boundary}'.encode())
+            self.assertEqual(parts[-1], b'--\r\n')
+            # Overlapping ranges are merged.
+            self.assertEqual([part.split(b'\r\n\r\n', 1)[1][:-2] for part in parts[1:-1]], [self.data[0:15], self.data[20:30]])
+            self.assertIn(b'Content-Range: bytes 20-29/10240', parts[2])
+
+    def test_unsatisfiable_and_malformed_ranges(self):
+        for storage in self.storages:
+            response, _ = self.get(storage, Range='bytes=20000-')
+            self.assertEqual((response.status_code, response['Content-Range']), (416, 'bytes */10240'))
+            for header in ('bytes=abc', 'bytes=9-1', 'items=0-1', 'bytes=' + ','.join(f'{i * 10}-{i * 10}' for i in range(20))):
+                response, body = self.get(storage, Range=header)
+                self.assertEqual((response.status_code, body), (200, self.data))
+
+    def test_conditional_requests(self):
+        for storage in self.storages:
+            response, _ = self.get(storage)
+            etag, modified = response['ETag'], response['Last-Modified']
+            response, _ = self.get(storage, If_None_Match=etag)
+            self.assertEqual(response.status_code, 304)
+
+            for validator in (etag, modified):
+                response, body = self.get(storage, Range='bytes=0-9', If_Range=validator)
+                self.assertEqual((response.status_code, body), (206, self.data[:10]))
+            # The file changed since the client cached its start: it gets the whole file.
+            for validator in ('"stale"', 'W/' + etag, 'Thu, 01 Jan 2015 00:00:00 GMT'):
+                response, body = self.get(storage, Range='bytes=0-9', If_Range=validator)
+                self.assertEqual((response.status_code, body), (200, self.data))
+
+    def test_only_stored_files_are_served(self):
+        for storage in self.storages:
+            for path in ('vlogs/missing.mp4', '../secret', 'vlogs/../../secret', ''):
+                with self.assertRaises(Http404):
+                    self.get(storage, path)
+        with self.assertRaises(Http404):
+            self.get(self.storages[0], 'vlogs')
+
+    def test_url_patterns(self):
+        with override_settings(DEBUG=True, MEDIA_URL='/media/'):
+            pattern, = media_urlpatterns()
+            self.assertEqual(pattern.resolve('media/vlogs/clip.mp4').kwargs, {'path': 'vlogs/clip.mp4'})
+        with override_settings(DEBUG=True, MEDIA_URL='https://cdn.example.com/media/'):
+            self.assertEqual(media_urlpatterns(), [])
+        with override_settings(DEBUG=False, MEDIA_URL='/media/'):
+            self.assertEqual(media_urlpatterns(), [])
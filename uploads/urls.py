@@ -0,0 +1,15 @@
+from django.urls import path
+from .views import (
+    UploadTicketCreate,
+    UploadTicketDetail,
+    UploadFinalize,
+    LocalUploadData,
+)
+
+urlpatterns = [
+    # direct-to-storage upload endpoints
+    path('uploads/', UploadTicketCreate.as_view(), name='upload-ticket-create'),
+    path('uploads/<uuid:pk>/', UploadTicketDetail.as_view(), name='upload-ticket-detail'),
+    path('uploads/<uuid:pk>/finalize/', UploadFinalize.as_view(), name='upload-finalize'),
+    path('uploads/<uuid:pk>/data/', LocalUploadData.as_view(), name='upload-data'),
+]
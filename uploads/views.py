@@ -0,0 +1,119 @@
+import tempfile
+from io import BytesIO
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.base import File
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.shortcuts import get_object_or_404
+from rest_framework import generics, status
+from rest_framework.exceptions import NotFound, PermissionDenied
+from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from . import finalize
+from .backends import LocalUploadBackend, get_backend
+from .models import UploadTicket
+from .serializers import FINALIZE_SERIALIZERS, UploadTicketRequestSerializer, UploadTicketSerializer
+from .tasks import finalize_upload
+
+CHUNK_SIZE = 64 * 1024
+
+
+class UploadTicketCreate(generics.CreateAPIView):
+    '''
+    Issues an upload ticket: the storage key and the request the client makes to upload the file
+    there directly. The file is then attached with the finalize endpoint.
+    '''
+    serializer_class = UploadTicketRequestSerializer
+    permission_classes = [IsAuthenticated]
+
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ticket = serializer.save()
+        data = UploadTicketSerializer(ticket).data
+        data['upload'] = get_backend().upload_instructions(ticket, request)
+        return Response(data, status=status.HTTP_201_CREATED)
+
+
+class UploadTicketDetail(generics.RetrieveAPIView):
+    '''
+    Status of a ticket; clients poll it after finalizing until it is complete or failed.
+    '''
+    serializer_class = UploadTicketSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        return UploadTicket.objects.filter(user=self.request.user)
+
+
+class UploadFinalize(APIView):
+    '''
+    Takes the post or video fields for an uploaded file and queues its validation. Responds 202;
+    the ticket records the created post or video, or why the file was rejected.
+    '''
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, pk):
+        ticket = get_object_or_404(UploadTicket, pk=pk, user=request.user)
+        if ticket.status != UploadTicket.PENDING:
+            return Response({"detail": "This upload has already been finalized."}, status=status.HTTP_409_CONFLICT)
+        if ticket.is_expired:
+            return Response({"detail": "This upload ticket has expired."}, status=status.HTTP_410_GONE)
+
+        serializer = FINALIZE_SERIALIZERS[ticket.kind](data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            finalize.check_object(ticket)
+        except ValidationError as e:
+            return Response({"detail": ' '.join(e.messages)}, status=status.HTTP_400_BAD_REQUEST)
+
+        with transaction.atomic():
+            # Only one finalize request moves the ticket out of pending.
+            claimed = UploadTicket.objects.filter(pk=ticket.pk, status=UploadTicket.PENDING).update(
+                status=UploadTicket.PROCESSING, metadata=serializer.validated_data,
+            )
+            if not claimed:
+                return Response({"detail": "This upload has already been finalized."}, status=status.HTTP_409_CONFLICT)
+            transaction.on_commit(lambda: finalize_upload.delay(str(ticket.pk)))
+        ticket.refresh_from_db()
+        return Response(UploadTicketSerializer(ticket).data, status=status.HTTP_202_ACCEPTED)
+
+
+class LocalUploadData(APIView):
+    '''
+    Receives the file of a ticket when the local upload backend is in use, standing in for the
+    presigned storage URL. The signed token in the URL authorises the request.
+    '''
+    permission_classes = [AllowAny]
+    authentication_classes = []
+
+    def put(self, request, pk):
+        backend = get_backend()
+        if not isinstance(backend, LocalUploadBackend):
+            raise NotFound()
+        ticket = get_object_or_404(UploadTicket, pk=pk, status=UploadTicket.PENDING)
+        if ticket.is_expired or not backend.check_token(ticket, request.query_params.get('token', '')):
+            raise PermissionDenied("Invalid or expired upload token.")
+        too_large = Response({"detail": "The file is larger than announced."}, status=status.HTTP_400_BAD_REQUEST)
+        if int(request.META.get('CONTENT_LENGTH') or 0) > ticket.size:
+            return too_large
+
+        # The body is streamed to a spooled temporary file: request.body would hold the whole video
+        # in memory, and is refused above DATA_UPLOAD_MAX_MEMORY_SIZE.
+        stream = request.stream or BytesIO()
+        with tempfile.SpooledTemporaryFile(max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE) as upload:
+            received = 0
+            for chunk in iter(lambda: stream.read(CHUNK_SIZE), b''):
+                received += len(chunk)
+                if received > ticket.size:
+                    return too_large
+                upload.write(chunk)
+            upload.seek(0)
+            # A second PUT replaces the object, as it would on S3.
+            default_storage.delete(ticket.key)
+            default_storage.save(ticket.key, File(upload))
+        return Response(status=status.HTTP_204_NO_CONTENT)
@@ -1,7 +1,15 @@
 from django.contrib import admin
-from .models import Video
+from .models import Video, VideoRendition
+
+class VideoRenditionInline(admin.TabularInline):
+    model = VideoRendition
+    fields = ('height', 'width', 'bandwidth', 'status', 'progress', 'error', 'playlist')
+    readonly_fields = fields
+    extra = 0
+    can_delete = False
 
 class VideoAdmin(admin.ModelAdmin):
     list_display = ('author', 'title', 'description', 'video', 'duration', 'created_at', 'updated_at')
+    inlines = [VideoRenditionInline]
 
 admin.site.register(Video, VideoAdmin)
@@ -0,0 +1,160 @@
+"""
+Faststart remux of MP4/MOV files.
+
+Most phones write the movie header (`moov`, the index of every sample) after the media data
+(`mdat`), once recording is done, so a player reading such a file from the start has to download
+all of it before the first frame. remux() moves `moov` in front of the media data without touching
+the samples: the boxes are copied in their new order and the chunk offsets of the sample tables
+(`stco`/`co64`), which point into the file, are shifted by the size of the moved header. This is
+what `ffmpeg -c copy -movflags +faststart` does, without starting ffmpeg and with a single
+sequential copy of the media data.
+"""
+import os
+import struct
+
+from .probe import CHUNK_SIZE, MAX_HEADER_SIZE, MP4_BRANDS
+
+# Boxes on the path from `moov` to the sample tables.
+CONTAINERS = {b'moov', b'trak', b'mdia', b'minf', b'stbl'}
+MAX_STCO_OFFSET = 0xFFFFFFFF
+
+
+class FaststartError(ValueError):
+    """
+    The file cannot be remuxed; it is left as it is.
+    """
+
+
+def _top_level_boxes(file):
+    """
+    Returns (type, offset, size) of the top-level boxes of `file`, a seekable binary file, or None
+    when it is not an MP4/MOV file.
+    """
+    file.seek(0)
+    if file.read(8)[4:8] not in MP4_BRANDS:
+        return None
+    file.seek(0, os.SEEK_END)
+    end = file.tell()
+    boxes, offset = [], 0
+    while offset < end:
+        file.seek(offset)
+        header = file.read(8)
+        if len(header) < 8:
+            raise FaststartError('The file is truncated.')
+        size, box_type = struct.unpack('>I4s', header)
+        if size == 1:
+            size = struct.unpack('>Q', file.read(8))[0]
+        elif size == 0:
+            size = end - offset
+        if size < 8 or offset + size > end:
+            raise FaststartError('Invalid MP4 box size.')
+        boxes.append((box_type, offset, size))
+        offset += size
+    return boxes
+
+
+def _children(data, start, end):
+    """
+    Yields (type, payload start, box end) of the boxes packed in data[start:end].
+    """
+    offset = start
+    while offset + 8 <= end:
+        size, box_type = struct.unpack_from('>I4s', data, offset)
+        header = 8
+        if size == 1:
+            size, header = struct.unpack_from('>Q', data, offset + 8)[0], 16
+        elif size == 0:
+            size = end - offset
+        if size < header or offset + size > end:
+            raise FaststartError('Invalid MP4 box size.')
+        yield box_type, offset + header, offset + size
+        offset += size
+
+
+def _shift_chunk_offsets(moov, start, end, shift, moved_from):
+    """
+    Adds `shift` to the chunk offsets in the sample tables of `moov` that point before
+    `moved_from`, the former position of the header; media data after it does not move.
+    """
+    for box_type, payload, box_end in _children(moov, start, end):
+        if box_type in CONTAINERS:
+            _shift_chunk_offsets(moov, payload, box_end, shift, moved_from)
+            continue
+        if box_type not in (b'stco', b'co64'):
+            continue
+        fmt = '>I' if box_type == b'stco' else '>Q'
+        width = struct.calcsize(fmt)
+        count = struct.unpack_from('>I', moov, payload + 4)[0]
+        if payload + 8 + count * width > box_end:
+            raise FaststartError('Invalid chunk offset table.')
+        for position in range(payload + 8, payload + 8 + count * width, width):
+            offset = struct.unpack_from(fmt, moov, position)[0]
+            if offset < moved_from:
+                offset += shift
+                if box_type == b'stco' and offset > MAX_STCO_OFFSET:
+                    # Would need the table rewritten as co64, which changes the header size.
+                    raise FaststartError('The chunk offsets do not fit in 32 bits.')
+                struct.pack_into(fmt, moov, position, offset)
+
+
+def _copy(source, destination, offset, size):
+    source.seek(offset)
+    while size:
+        data = source.read(min(size, CHUNK_SIZE))
+        if not data:
+            raise FaststartError('The file is truncated.')
+        destination.write(data)
+        size -= len(data)
+
+
+def _late_header(file):
+    """
+    Returns the top-level boxes of `file` when it is an MP4/MOV file whose movie header follows
+    its media data, None otherwise.
+    """
+    boxes = _top_level_boxes(file)
+    if boxes is None:
+        return None
+    types = [box_type for box_type, _, _ in boxes]
+    if b'moov' not in types or b'mdat' not in types or types.index(b'moov') < types.index(b'mdat'):
+        return None
+    return boxes
+
+
+def needs_remux(file):
+    """
+    Whether `file` is an MP4/MOV file whose movie header follows its media data.
+    """
+    return _late_header(file) is not None
+
+
+def remux(source, destination):
+    """
+    Writes `source`, a seekable binary file, to `destination` with its movie header in front of
+    the media data. Returns False, writing nothing, when `source` is not an MP4/MOV file or is
+    already faststart. Raises FaststartError when it cannot be remuxed.
+    """
+    boxes = _late_header(source)
+    if boxes is None:
+        return False
+    if any(box_type == b'moof' for box_type, _, _ in boxes):
+        # Fragment headers locate their samples themselves; those files are streamed as they are.
+        raise FaststartError('Fragmented files are not remuxed.')
+
+    _, moov_offset, moov_size = next(box for box in boxes if box[0] == b'moov')
+    if moov_size > MAX_HEADER_SIZE:
+        raise FaststartError('The movie header is too large.')
+    source.seek(moov_offset)
+    moov = bytearray(source.read(moov_size))
+    header = 16 if struct.unpack_from('>I', moov)[0] == 1 else 8
+    _shift_chunk_offsets(moov, header, len(moov), moov_size, moov_offset)
+
+    first_mdat = next(index for index, box in enumerate(boxes) if box[0] == b'mdat')
+    for index, (box_type, offset, size) in enumerate(boxes):
+        if index == first_mdat:
+            destination.write(moov)
+        if box_type != b'moov':
+            _copy(source, destination, offset, size)
+    destination.flush()
+    return True
+
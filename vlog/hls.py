@@ -0,0 +1,213 @@
+"""
+HLS (HTTP Live Streaming) renditions of vlogs.
+
+Once the ingest chain has marked a video ready, vlog.tasks.transcode_video plans its ladder (the
+rungs of LADDER no taller than the source) and queues one transcode_rendition task per rung. Those
+run on the VIDEO_TRANSCODE_QUEUE queue, meant for CPU workers with a bounded pool, and each encode
+uses VIDEO_TRANSCODE_THREADS threads of the ffmpeg binary bundled with imageio-ffmpeg. Encodes are
+bit-exact, so the same source and settings always produce the same segments.
+
+A rendition is a media playlist and its MPEG-TS segments, stored together under
+vlogs/hls/<video>/<height>p/. The master playlist vlogs/hls/<video>/master.m3u8 lists the ready
+renditions and is rewritten as each one completes, so clients can switch from the original file
+to HLS as soon as the smallest rendition is done. Playlists refer to each other and to segments
+by relative paths, so media URLs must not be signed per file.
+"""
+import os
+import re
+import subprocess
+import tempfile
+import time
+
+import imageio_ffmpeg
+from django.conf import settings
+from django.core.files.base import ContentFile, File
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+
+from .ingest import local_copy, local_path
+from .models import Video, VideoRendition
+from .probe import ProbeError, probe
+
+# (height, video kbit/s, audio kbit/s)
+LADDER = [
+    (240, 400, 64),
+    (480, 1000, 96),
+    (720, 2500, 128),
+]
+SEGMENT_SECONDS = 4
+MASTER_PLAYLIST = 'master.m3u8'
+MEDIA_PLAYLIST = 'index.m3u8'
+# ffmpeg writes the stream info of the variant it encodes here; it becomes a line of the master.
+VARIANT_PLAYLIST = 'variant.m3u8'
+# Seconds between two progress updates of a rendition.
+PROGRESS_INTERVAL = 2
+
+STREAM_INF = re.compile(r'#EXT-X-STREAM-INF:BANDWIDTH=(\d+),RESOLUTION=(\d+)x(\d+)(?:,CODECS="([^"]*)")?')
+
+
+def directory(video_pk):
+    return f'vlogs/hls/{video_pk}/'
+
+
+def plan(video):
+    """
+    Creates the pending renditions of `video` and returns them. Sources smaller than the first
+    rung get a single rendition at their own height.
+    """
+    try:
+        with video.video.open('rb') as file:
+            source_height = probe(file, path=local_path(video.video)).height
+    except ProbeError:
+        source_height = None
+    rungs = [rung for rung in LADDER if source_height is None or rung[0] <= source_height]
+    if not rungs:
+        rungs = [(source_height - source_height % 2, *LADDER[0][1:])]
+
+    VideoRendition.objects.bulk_create([
+        VideoRendition(video=video, height=height, video_bitrate=video_bitrate, audio_bitrate=audio_bitrate)
+        for height, video_bitrate, audio_bitrate in rungs
+    ], ignore_conflicts=True)
+    return list(video.renditions.filter(status=VideoRendition.PENDING).order_by('height'))
+
+
+def command(source, output, rendition):
+    """
+    The ffmpeg command line encoding `source` into the segments and playlists of `rendition` in the
+    `output` directory, reporting its progress on stdout.
+    """
+    return [
+        imageio_ffmpeg.get_ffmpeg_exe(), '-nostdin', '-y', '-loglevel', 'error',
+        '-i', source,
+        '-map', '0:v:0', '-map', '0:a:0?',
+        '-vf', f'scale=-2:{rendition.height}',
+        '-c:v', 'libx264', '-preset', 'veryfast', '-profile:v', 'main', '-pix_fmt', 'yuv420p',
+        '-b:v', f'{rendition.video_bitrate}k',
+        '-maxrate', f'{rendition.video_bitrate * 11 // 10}k',
+        '-bufsize', f'{rendition.video_bitrate * 2}k',
+        # Key frames on segment boundaries, at the same times in every rendition, so players can
+        # switch renditions between segments.
+        '-force_key_frames', f'expr:gte(t,n_forced*{SEGMENT_SECONDS})', '-sc_threshold', '0',
+        '-c:a', 'aac', '-b:a', f'{rendition.audio_bitrate}k', '-ac', '2',
+        '-threads', str(settings.VIDEO_TRANSCODE_THREADS),
+        '-fflags', '+bitexact', '-flags:v', '+bitexact', '-flags:a', '+bitexact', '-map_metadata', '-1',
+        '-f', 'hls', '-hls_time', str(SEGMENT_SECONDS), '-hls_playlist_type', 'vod',
+        '-hls_segment_filename', os.path.join(output, 'segment_%03d.ts'),
+        '-master_pl_name', VARIANT_PLAYLIST,
+        '-progress', 'pipe:1',
+        os.path.join(output, MEDIA_PLAYLIST),
+    ]
+
+
+def encode(source, output, rendition, duration):
+    """
+    Runs ffmpeg, updating the progress of `rendition` as it goes. Raises RuntimeError when ffmpeg
+    fails or runs past VIDEO_TRANSCODE_TIMEOUT.
+    """
+    deadline = time.monotonic() + settings.VIDEO_TRANSCODE_TIMEOUT
+    reported = time.monotonic()
+    with tempfile.TemporaryFile() as errors:
+        process = subprocess.Popen(command(source, output, rendition), stdout=subprocess.PIPE, stderr=errors)
+        try:
+            for line in process.stdout:
+                if time.monotonic() > deadline:
+                    raise RuntimeError('The transcode timed out.')
+                key, _, value = line.decode('ascii', 'replace').strip().partition('=')
+                if key == 'out_time_us' and duration and time.monotonic() - reported >= PROGRESS_INTERVAL:
+                    reported = time.monotonic()
+                    done = int(value) / 1e6 / duration if value.isdigit() else 0
+                    VideoRendition.objects.filter(pk=rendition.pk).update(progress=min(99, int(done * 100)))
+            process.wait(timeout=max(1, deadline - time.monotonic()))
+        finally:
+            if process.poll() is None:
+                process.kill()
+                process.wait()
+        if process.returncode != 0:
+            errors.seek(0)
+            raise RuntimeError(errors.read().decode('utf-8', 'replace').strip() or f'ffmpeg exited with {process.returncode}.')
+
+
+def save(name, content):
+    # Playlists refer to segments by name, so an existing file is replaced rather than renamed.
+    if default_storage.exists(name):
+        default_storage.delete(name)
+    return default_storage.save(name, content)
+
+
+def transcode(rendition_pk):
+    """
+    Encodes a pending rendition, stores it and rewrites the master playlist of its video.
+    """
+    claimed = VideoRendition.objects.filter(pk=rendition_pk, status=VideoRendition.PENDING).update(
+        status=VideoRendition.PROCESSING, progress=0, error='', updated_at=timezone.now(),
+    )
+    if not claimed:
+        return
+    rendition = VideoRendition.objects.select_related('video').get(pk=rendition_pk)
+    video = rendition.video
+    prefix = f'{directory(video.pk)}{rendition.height}p/'
+    duration = video.duration.total_seconds() if video.duration else None
+
+    try:
+        with local_copy(video.video) as source, tempfile.TemporaryDirectory() as output:
+            encode(source, output, rendition, duration)
+            with open(os.path.join(output, VARIANT_PLAYLIST)) as variant:
+                match = STREAM_INF.search(variant.read())
+            if match is None:
+                raise RuntimeError('ffmpeg did not describe the encoded stream.')
+            # Segments first, so the playlist never refers to a missing one.
+            for name in sorted(os.listdir(output)):
+                if name.endswith('.ts'):
+                    with open(os.path.join(output, name), 'rb') as segment:
+                        save(prefix + name, File(segment))
+            with open(os.path.join(output, MEDIA_PLAYLIST), 'rb') as playlist:
+                rendition.playlist = save(prefix + MEDIA_PLAYLIST, File(playlist))
+    except Exception as exc:
+        VideoRendition.objects.filter(pk=rendition_pk).update(
+            status=VideoRendition.FAILED, error=str(exc), updated_at=timezone.now(),
+        )
+        return
+
+    rendition.bandwidth, rendition.width = int(match.group(1)), int(match.group(2))
+    rendition.codecs = match.group(4) or ''
+    rendition.status = VideoRendition.READY
+    rendition.progress = 100
+    rendition.save(update_fields=['bandwidth', 'width', 'codecs', 'playlist', 'status', 'progress', 'updated_at'])
+    write_master(video.pk)
+
+
+def write_master(video_pk):
+    """
+    Writes the master playlist of the ready renditions. The video row is locked meanwhile, so
+    renditions finishing together do not overwrite each other's entries.
+    """
+    with transaction.atomic():
+        video = Video.objects.select_for_update().get(pk=video_pk)
+        renditions = video.renditions.filter(status=VideoRendition.READY).order_by('bandwidth')
+        lines = ['#EXTM3U', '#EXT-X-VERSION:3']
+        for rendition in renditions:
+            codecs = f',CODECS="{rendition.codecs}"' if rendition.codecs else ''
+            lines.append(
+                f'#EXT-X-STREAM-INF:BANDWIDTH={rendition.bandwidth},RESOLUTION={rendition.width}x{rendition.height}{codecs}'
+            )
+            lines.append(f'{rendition.height}p/{MEDIA_PLAYLIST}')
+        if len(lines) == 2:
+            return
+        video.hls_playlist = save(directory(video_pk) + MASTER_PLAYLIST, ContentFile('\n'.join(lines) + '\n'))
+        video.save(update_fields=['hls_playlist', 'updated_at'])
+
+
+def delete_files(video_pk, path=None):
+    """
+    Deletes the playlists and segments of a video.
+    """
+    path = path or directory(video_pk)
+    try:
+        directories, files = default_storage.listdir(path)
+    except FileNotFoundError:
+        return
+    for name in files:
+        default_storage.delete(path + name)
+    for name in directories:
+        delete_files(video_pk, f'{path}{name}/')
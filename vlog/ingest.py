@@ -0,0 +1,114 @@
+"""
+Background ingest of uploaded videos.
+
+Video.save() only stores the row, in the `processing` state, and queues vlog.tasks.ingest_video:
+a Celery chain that probes the file for its duration, moves the movie header of MP4/MOV files to
+the front (see vlog/faststart.py), renders the thumbnail and marks the video ready. A step that
+fails rejects the video with the reason; the following steps skip videos that are no longer
+processing. A rejected video keeps its row, for its author to see why, but releases its file.
+"""
+import logging
+import os
+import tempfile
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.base import File
+from django.db import transaction
+from django.utils import timezone
+
+from uploads import blobs
+
+from .faststart import FaststartError, remux
+from .models import Video
+from .probe import ProbeError, probe as probe_container
+
+logger = logging.getLogger(__name__)
+
+
+@contextmanager
+def local_copy(field_file):
+    """
+    Yields a local path of `field_file`: its own path on a file system storage, otherwise a
+    temporary copy, since ffmpeg needs a file it can seek in.
+    """
+    path = local_path(field_file)
+    if path is not None:
+        yield path
+        return
+    with tempfile.NamedTemporaryFile(suffix=os.path.splitext(field_file.name)[1]) as temp_file:
+        with field_file.storage.open(field_file.name, 'rb') as source:
+            for chunk in source.chunks():
+                temp_file.write(chunk)
+        temp_file.flush()
+        yield temp_file.name
+
+
+def local_path(field_file):
+    try:
+        return field_file.path
+    except NotImplementedError:
+        return None
+
+
+def processing(video_pk):
+    """
+    Returns the video if it is still being ingested, None if it was rejected or deleted meanwhile.
+    """
+    return Video.objects.filter(pk=video_pk, status=Video.PROCESSING).first()
+
+
+def probe(video):
+    """
+    Sets the duration of the video, read from its container headers, rejecting files that cannot be
+    read or are too long.
+    """
+    try:
+        with video.video.open('rb') as file:
+            duration = probe_container(file, path=local_path(video.video)).duration
+    except ProbeError as e:
+        raise ValidationError(f'Unable to process video file: {e}')
+    if duration > settings.MAX_VIDEO_DURATION:
+        raise ValidationError(f'Video duration exceeds the maximum limit of {settings.MAX_VIDEO_DURATION} seconds.')
+    video.duration = timedelta(seconds=duration)
+    video.save(update_fields=['duration', 'updated_at'])
+
+
+def faststart(video):
+    """
+    Replaces the file of the video with a faststart remux when its movie header follows the media
+    data. Returns whether it was replaced; files that cannot be remuxed are kept as they are.
+    """
+    with tempfile.TemporaryFile() as remuxed:
+        try:
+            with video.video.open('rb') as source:
+                if not remux(source, remuxed):
+                    return False
+        except FaststartError as e:
+            logger.warning('Video %s was not remuxed: %s', video.pk, e)
+            return False
+        remuxed.seek(0)
+        # Stored content-addressed like the upload, which is released once no row names it.
+        video.video.save(os.path.basename(video.video.name), File(remuxed), save=False)
+    video.save(update_fields=['video', 'updated_at'])
+    return True
+
+
+def reject(video_pk, exc):
+    reason = ' '.join(exc.messages) if isinstance(exc, ValidationError) else f'Unable to process video file: {exc}'
+    with transaction.atomic():
+        name = Video.objects.select_for_update().filter(pk=video_pk, status=Video.PROCESSING).values_list('video', flat=True).first()
+        if name is None:
+            return
+        Video.objects.filter(pk=video_pk).update(
+            status=Video.REJECTED, rejection_reason=reason, video='', updated_at=timezone.now(),
+        )
+        # The update skips the field's reference counting; the blob collector deletes the file
+        # once no other row names it.
+        blobs.release(name)
+
+
+def mark_ready(video_pk):
+    Video.objects.filter(pk=video_pk, status=Video.PROCESSING).update(status=Video.READY, updated_at=timezone.now())
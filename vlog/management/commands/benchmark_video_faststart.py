@@ -0,0 +1,135 @@
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+
+import imageio_ffmpeg
+import numpy as np
+from django.core.management.base import BaseCommand
+from moviepy.editor import ImageSequenceClip
+
+from vlog.faststart import remux
+
+CHUNK = 16 * 1024
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure the time to first frame of videos streamed at a given bandwidth, before and after '
+        'the faststart remux, and the cost of the remux'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('files', nargs='*', help='MP4/MOV videos to measure; a sample clip is generated when omitted.')
+        parser.add_argument('--seconds', type=int, default=10, help='Length of the generated sample.')
+        parser.add_argument('--bandwidth', type=float, default=8, help='Simulated download speed in Mbit/s.')
+        parser.add_argument('--repeat', type=int, default=3, help='Runs per measurement; the best is reported.')
+
+    def handle(self, *args, **options):
+        directory = tempfile.mkdtemp()
+        try:
+            files = options['files'] or [self.generate(directory, options['seconds'])]
+            self.measure(files, directory, options['bandwidth'] * 1_000_000 / 8, options['repeat'])
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    def generate(self, directory, seconds):
+        # Noise, so the media data has the size of a real recording rather than a few kilobytes.
+        random = np.random.default_rng(0)
+        frames = [random.integers(0, 256, (360, 640, 3), dtype=np.uint8) for _ in range(seconds * 24)]
+        path = os.path.join(directory, 'sample.mp4')
+        # Written the way phones do, with the movie header last.
+        ImageSequenceClip(frames, fps=24).write_videofile(path, codec='libx264', bitrate='2000k', logger=None)
+        return path
+
+    def measure(self, files, directory, bytes_per_second, repeat):
+        self.stdout.write(
+            f"{'file':<24} {'size (MB)':>10} {'remux (ms)':>11} {'ffmpeg copy (ms)':>17} "
+            f"{'first frame before (ms)':>24} {'after (ms)':>11}"
+        )
+        for path in files:
+            remuxed = os.path.join(directory, 'remuxed.mp4')
+            remux_ms = self.best_of(repeat, lambda: self.remux(path, remuxed))
+            if not self.remux(path, remuxed):
+                self.stdout.write(f'{os.path.basename(path):<24} already faststart or not an MP4/MOV file')
+                continue
+            copy_ms = self.best_of(repeat, lambda: self.ffmpeg_copy(path, os.path.join(directory, 'copy.mp4')))
+            before_ms = min(self.time_to_first_frame(path, bytes_per_second) for _ in range(repeat))
+            after_ms = min(self.time_to_first_frame(remuxed, bytes_per_second) for _ in range(repeat))
+            self.stdout.write(
+                f'{os.path.basename(path):<24} {os.path.getsize(path) / 1024 / 1024:>10.2f} {remux_ms:>11.2f} '
+                f'{copy_ms:>17.2f} {before_ms:>24.0f} {after_ms:>11.0f}'
+            )
+
+    def remux(self, source_path, destination_path):
+        with open(source_path, 'rb') as source, open(destination_path, 'wb') as destination:
+            return remux(source, destination)
+
+    def ffmpeg_copy(self, source_path, destination_path):
+        subprocess.run(
+            [imageio_ffmpeg.get_ffmpeg_exe(), '-v', 'error', '-y', '-i', source_path,
+             '-c', 'copy', '-movflags', '+faststart', destination_path],
+            check=True,
+        )
+
+    def time_to_first_frame(self, path, bytes_per_second):
+        """
+        Streams `path` to ffmpeg through a pipe, the way a player reads a progressive download, at
+        `bytes_per_second`, and returns the milliseconds until the first frame is decoded.
+        """
+        started = time.perf_counter()
+        if self.first_frame(['-i', 'pipe:0'], path, bytes_per_second, started):
+            return (time.perf_counter() - started) * 1000
+        # ffmpeg reached the movie header only at the end of the stream, and cannot seek back from
+        # there: the file has to be downloaded completely before playback can start.
+        self.first_frame(['-i', path])
+        return (time.perf_counter() - started) * 1000
+
+    def first_frame(self, input_args, path=None, bytes_per_second=None, started=None):
+        """
+        Runs ffmpeg until it decodes one frame of its input, fed from `path` when it reads a pipe.
+        Returns whether a frame was decoded.
+        """
+        process = subprocess.Popen(
+            [imageio_ffmpeg.get_ffmpeg_exe(), '-v', 'quiet', *input_args, '-frames:v', '1',
+             '-f', 'rawvideo', '-pix_fmt', 'rgb24', 'pipe:1'],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, bufsize=0,
+        )
+        feeder = None
+        if path is not None:
+            feeder = threading.Thread(target=self.feed, args=(path, process.stdin, bytes_per_second, started))
+            feeder.start()
+        else:
+            process.stdin.close()
+        try:
+            return bool(process.stdout.read(1))
+        finally:
+            process.kill()
+            process.wait()
+            if feeder is not None:
+                feeder.join()
+
+    def feed(self, path, pipe, bytes_per_second, started):
+        sent = 0
+        try:
+            with open(path, 'rb') as file:
+                for chunk in iter(lambda: file.read(CHUNK), b''):
+                    delay = started + (sent + len(chunk)) / bytes_per_second - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                    pipe.write(chunk)
+                    sent += len(chunk)
+            pipe.close()
+        except (BrokenPipeError, ValueError, OSError):
+            # ffmpeg decoded its frame and exited.
+            pass
+
+    def best_of(self, repeat, run):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            run()
+            timings.append((time.perf_counter() - started) * 1000)
+        return min(timings)
@@ -0,0 +1,84 @@
+import io
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from moviepy.editor import ImageSequenceClip, VideoFileClip
+
+from vlog.probe import probe
+
+# (file name, moviepy codec, extra ffmpeg parameters) of the generated samples.
+SAMPLES = [
+    ('sample.mp4', 'libx264', []),
+    ('faststart.mp4', 'libx264', ['-movflags', '+faststart']),
+    ('sample.webm', 'libvpx', []),
+    ('sample.mkv', 'libx264', []),
+]
+
+
+class Command(BaseCommand):
+    help = 'Compare reading the duration of videos with moviepy and with the container header probe'
+
+    def add_arguments(self, parser):
+        parser.add_argument('files', nargs='*', help='Videos to measure; sample clips are generated when omitted.')
+        parser.add_argument('--seconds', type=int, default=10, help='Length of the generated samples.')
+        parser.add_argument('--repeat', type=int, default=5, help='Runs per measurement; the best is reported.')
+
+    def handle(self, *args, **options):
+        directory = None
+        files = options['files']
+        if not files:
+            directory = tempfile.mkdtemp()
+            files = self.generate(directory, options['seconds'])
+        try:
+            self.measure(files, options['repeat'])
+        finally:
+            if directory:
+                shutil.rmtree(directory, ignore_errors=True)
+
+    def generate(self, directory, seconds):
+        frames = [np.full((360, 640, 3), i % 256, dtype=np.uint8) for i in range(seconds * 24)]
+        clip = ImageSequenceClip(frames, fps=24)
+        paths = []
+        for name, codec, params in SAMPLES:
+            path = os.path.join(directory, name)
+            clip.write_videofile(path, codec=codec, ffmpeg_params=params, logger=None)
+            paths.append(path)
+        return paths
+
+    def measure(self, files, repeat):
+        self.stdout.write(
+            f"{'file':<24} {'size (MB)':>10} {'moviepy (ms)':>13} {'probe (ms)':>11} {'in-memory (ms)':>15}  probe"
+        )
+        for path in files:
+            with open(path, 'rb') as file:
+                data = file.read()
+            moviepy_ms = self.best_of(repeat, lambda: self.moviepy_duration(path))
+            probe_ms = self.best_of(repeat, lambda: self.probe_file(path))
+            # An upload held in memory, which moviepy could only read from a temporary copy.
+            memory_ms = self.best_of(repeat, lambda: probe(io.BytesIO(data)))
+            result = self.probe_file(path)
+            self.stdout.write(
+                f'{os.path.basename(path):<24} {len(data) / 1024 / 1024:>10.2f} {moviepy_ms:>13.2f} '
+                f'{probe_ms:>11.2f} {memory_ms:>15.2f}  {result.duration:.2f}s {result.width}x{result.height} '
+                f'{result.video_codec} faststart={result.faststart}'
+            )
+
+    def moviepy_duration(self, path):
+        with VideoFileClip(path) as clip:
+            return clip.duration
+
+    def probe_file(self, path):
+        with open(path, 'rb') as file:
+            return probe(file, path=path)
+
+    def best_of(self, repeat, run):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            run()
+            timings.append((time.perf_counter() - started) * 1000)
+        return min(timings)
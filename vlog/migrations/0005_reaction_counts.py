@@ -0,0 +1,47 @@
+# Generated by Django 4.2.16 on 2026-10-18 11:35
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Count
+
+
+def build_reaction_counts(apps, schema_editor):
+    VlogReaction = apps.get_model('vlog', 'VlogReaction')
+    VlogReactionCount = apps.get_model('vlog', 'VlogReactionCount')
+    totals = VlogReaction.objects.values('video_id', 'reaction_type').annotate(total=Count('id')).order_by()
+    VlogReactionCount.objects.bulk_create(
+        [VlogReactionCount(video_id=row['video_id'], reaction_type=row['reaction_type'], count=row['total']) for row in totals],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vlog', '0004_alter_video_video'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VlogReactionCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('reaction_type', models.CharField(max_length=20)),
+                ('count', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='vlogreaction',
+            index=models.Index(fields=['video', '-created_at', '-id'], name='vlogreaction_video_created_idx'),
+        ),
+        migrations.AddField(
+            model_name='vlogreactioncount',
+            name='video',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reaction_counts', to='vlog.video'),
+        ),
+        migrations.AddConstraint(
+            model_name='vlogreactioncount',
+            constraint=models.UniqueConstraint(fields=('video', 'reaction_type'), name='unique_vlog_reaction_count_per_type'),
+        ),
+        migrations.RunPython(build_reaction_counts, migrations.RunPython.noop),
+    ]
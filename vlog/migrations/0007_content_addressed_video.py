@@ -0,0 +1,21 @@
+# Generated by Django 4.2.16 on 2026-10-18 11:48
+
+import django.core.validators
+from django.db import migrations
+import uploads.fields
+import vlog.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vlog', '0006_video_thumbnail_placeholder'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='video',
+            name='video',
+            field=uploads.fields.ContentAddressedFileField(upload_to='vlogs/', validators=[django.core.validators.FileExtensionValidator(allowed_extensions=['mp4', 'mov', 'avi', 'mkv', 'webm', '3gp']), vlog.models.validate_video_size]),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 4.2.16 on 2026-10-18 12:05
+
+from django.db import migrations, models
+
+
+def mark_existing_ready(apps, schema_editor):
+    # Videos saved before the ingest chain were validated on upload.
+    Video = apps.get_model('vlog', 'Video')
+    Video.objects.update(status='ready')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vlog', '0007_content_addressed_video'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='video',
+            name='rejection_reason',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.AddField(
+            model_name='video',
+            name='status',
+            field=models.CharField(choices=[('processing', 'Processing'), ('ready', 'Ready'), ('rejected', 'Rejected')], default='processing', max_length=12),
+        ),
+        migrations.RunPython(mark_existing_ready, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 4.2.16 on 2026-10-18 12:14
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vlog', '0008_video_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='video',
+            name='hls_playlist',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+        migrations.CreateModel(
+            name='VideoRendition',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('height', models.PositiveSmallIntegerField()),
+                ('video_bitrate', models.PositiveIntegerField(help_text='kbit/s')),
+                ('audio_bitrate', models.PositiveIntegerField(help_text='kbit/s')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('processing', 'Processing'), ('ready', 'Ready'), ('failed', 'Failed')], default='pending', max_length=12)),
+                ('progress', models.PositiveSmallIntegerField(default=0)),
+                ('error', models.TextField(blank=True, default='')),
+                ('width', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('bandwidth', models.PositiveIntegerField(blank=True, null=True)),
+                ('codecs', models.CharField(blank=True, default='', max_length=100)),
+                ('playlist', models.CharField(blank=True, default='', max_length=255)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('video', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='renditions', to='vlog.video')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='videorendition',
+            constraint=models.UniqueConstraint(fields=('video', 'height'), name='unique_rendition_height_per_video'),
+        ),
+    ]
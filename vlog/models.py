@@ -1,17 +1,16 @@
-import os
-import tempfile
-
 from django.conf import settings
 from django.db import models, transaction
+from django.db.models import F, Q
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
 from django.core.exceptions import ValidationError
 from django.core.validators import FileExtensionValidator
-from django.core.files.uploadedfile import InMemoryUploadedFile
 
-from moviepy.editor import VideoFileClip
 import logging
-import requests
 
 from authentication.models import CustomUser  # Assuming this is your user model
+from uploads.fields import ContentAddressedFileField
+from vlog.probe import ProbeError, probe
 
 # Constants
 MAX_VIDEO_SIZE = settings.MAX_VIDEO_SIZE
@@ -25,34 +24,47 @@ def validate_video_size(file):
         raise ValidationError(f"Video file size should not exceed {MAX_VIDEO_SIZE / (1024 * 1024)} MB.")
 
 def validate_video_duration(file):
-    if isinstance(file, InMemoryUploadedFile):
-        # Create a temporary file for in-memory uploaded files
-        with tempfile.NamedTemporaryFile(delete=False) as temp_file:
-            for chunk in file.chunks():
-                temp_file.write(chunk)
-            temp_video_path = temp_file.name
-    else:
-        # Use file.path for files stored in file-based backends
-        temp_video_path = file.path
-
-    # Now you can use the temp_video_path with VideoFileClip
+    # The duration is read from the container headers (see vlog/probe.py), so in-memory uploads
+    # are probed where they are instead of being copied to a temporary file for ffmpeg.
+    path = file.temporary_file_path() if hasattr(file, 'temporary_file_path') else None
     try:
-        with VideoFileClip(temp_video_path) as video:
-            duration = video.duration
-            if duration > MAX_VIDEO_DURATION:  # Define your MAX_DURATION
-                raise ValidationError(f"Video duration exceeds the maximum limit of {MAX_VIDEO_DURATION} seconds.")
+        file.seek(0)
+        duration = probe(file, path=path).duration
+    except ProbeError as e:
+        raise ValidationError(f"Unable to process video file: {e}")
     finally:
-        # Clean up the temporary file for in-memory uploads
-        if isinstance(file, InMemoryUploadedFile):
-            os.remove(temp_video_path)
+        file.seek(0)
+    if duration > settings.MAX_VIDEO_DURATION:
+        raise ValidationError(f"Video duration exceeds the maximum limit of {settings.MAX_VIDEO_DURATION} seconds.")
+
+class VideoQuerySet(models.QuerySet):
+    def visible_to(self, user):
+        """
+        Ready videos, plus the user's own still processing or rejected.
+        """
+        if user is not None and user.is_authenticated:
+            return self.filter(Q(status=Video.READY) | Q(author=user))
+        return self.filter(status=Video.READY)
+
 
 class Video(models.Model):
+    # A new video is `processing` until the ingest chain (vlog.ingest) has probed it and rendered
+    # its thumbnail; files that cannot be read or are too long end up `rejected`.
+    PROCESSING = 'processing'
+    READY = 'ready'
+    REJECTED = 'rejected'
+    STATUS_CHOICES = [
+        (PROCESSING, 'Processing'),
+        (READY, 'Ready'),
+        (REJECTED, 'Rejected'),
+    ]
+
     author = models.ForeignKey(CustomUser, on_delete=models.CASCADE)
     title = models.CharField(max_length=200)
     description = models.TextField(blank=True, null=True)
 
     # Configure the video field to store user uploads in a cloud storage service like S3 or Cloudinary for efficient and scalable media management in production environments.
-    video = models.FileField(
+    video = ContentAddressedFileField(
         upload_to='vlogs/',
         validators=[
             FileExtensionValidator(allowed_extensions=['mp4', 'mov', 'avi', 'mkv', 'webm', '3gp']),
@@ -61,38 +73,69 @@ class Video(models.Model):
     )
     duration = models.DurationField(null=True, blank=True)
     thumbnail = models.ImageField(upload_to='video_thumbnails/', blank=True, null=True)
+    # BlurHash of the thumbnail, computed together with it by vlog.tasks.create_video_thumbnail.
+    thumbnail_placeholder = models.CharField(max_length=64, blank=True, default='')
+    status = models.CharField(max_length=12, choices=STATUS_CHOICES, default=PROCESSING)
+    rejection_reason = models.TextField(blank=True, default='')
+    # Storage name of the HLS master playlist, written once a rendition is ready (see vlog/hls.py).
+    hls_playlist = models.CharField(max_length=255, blank=True, default='')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+
+    objects = VideoQuerySet.as_manager()
+
     def save(self, *args, **kwargs):
         created = self.pk is None
-        with transaction.atomic():
-            super().save(*args, **kwargs)
-
-            try:
-                # Download the video temporarily for processing
-                with tempfile.NamedTemporaryFile(delete=True, suffix='.mp4') as temp_file:
-                    response = requests.get(self.video.url, stream=True)
-                    if response.status_code == 200:
-                        for chunk in response.iter_content(chunk_size=8192):
-                            temp_file.write(chunk)
-                        temp_file.flush()
-
-                        # Open and validate the video duration
-                        with VideoFileClip(temp_file.name) as video:
-                            duration = video.duration
-                            if duration > MAX_VIDEO_DURATION:
-                                raise ValidationError(f"Video duration exceeds the maximum limit of {MAX_VIDEO_DURATION} seconds.")
-            except Exception as e:
-                raise ValidationError(f"Unable to process video file: {e}")
-
-            if created:
-                from vlog.tasks import create_video_thumbnail
-                transaction.on_commit(
-                    lambda: create_video_thumbnail.delay(self.pk)
-                )
+        super().save(*args, **kwargs)
+        if created and self.status == self.PROCESSING:
+            # Probing and the thumbnail run in the background once the row is committed.
+            from vlog.tasks import ingest_video
+            transaction.on_commit(lambda: ingest_video(self.pk))
+
     def __str__(self):
         return self.title
 
+
+class VideoRendition(models.Model):
+    """
+    One rung of a video's HLS ladder: a media playlist and its segments at `height`, encoded by
+    vlog.hls.transcode. `progress` is the percentage of the video encoded so far.
+    """
+    PENDING = 'pending'
+    PROCESSING = 'processing'
+    READY = 'ready'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (PROCESSING, 'Processing'),
+        (READY, 'Ready'),
+        (FAILED, 'Failed'),
+    ]
+
+    video = models.ForeignKey(Video, on_delete=models.CASCADE, related_name='renditions')
+    height = models.PositiveSmallIntegerField()
+    video_bitrate = models.PositiveIntegerField(help_text='kbit/s')
+    audio_bitrate = models.PositiveIntegerField(help_text='kbit/s')
+    status = models.CharField(max_length=12, choices=STATUS_CHOICES, default=PENDING)
+    progress = models.PositiveSmallIntegerField(default=0)
+    error = models.TextField(blank=True, default='')
+    # Filled in from the stream info ffmpeg writes for the encoded variant.
+    width = models.PositiveSmallIntegerField(null=True, blank=True)
+    bandwidth = models.PositiveIntegerField(null=True, blank=True)
+    codecs = models.CharField(max_length=100, blank=True, default='')
+    playlist = models.CharField(max_length=255, blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['video', 'height'], name='unique_rendition_height_per_video'),
+        ]
+
+    def __str__(self):
+        return f"{self.height}p of video {self.video_id} ({self.status})"
+
+
 class VlogComment(models.Model):
     video = models.ForeignKey(Video, on_delete=models.CASCADE, related_name='comments')
     user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='vlog_comments')
@@ -132,6 +175,10 @@ class VlogReaction(models.Model):
 
     class Meta:
         unique_together = ('video', 'user', 'reaction_type')
+        indexes = [
+            # Keyset pagination of the reactors of a video.
+            models.Index(fields=['video', '-created_at', '-id'], name='vlogreaction_video_created_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.username} reacted {self.get_reaction_type_display()} to video {self.video.id}"
@@ -144,7 +191,48 @@ class VlogReaction(models.Model):
         try:
             reaction = cls.objects.get(video=video, user=user, reaction_type=reaction_type)
             reaction.delete()
+            VlogReactionCount.adjust(video.pk, reaction_type, -1)
             return False
         except cls.DoesNotExist:
             cls.objects.create(video=video, user=user, reaction_type=reaction_type)
+            VlogReactionCount.adjust(video.pk, reaction_type, 1)
             return True
+
+
+class VlogReactionCount(models.Model):
+    """
+    Number of reactions of one type on a video, moved by VlogReaction.toggle_reaction so the
+    reactions list can show per-type totals without scanning the reaction rows.
+    """
+    video = models.ForeignKey(Video, on_delete=models.CASCADE, related_name='reaction_counts')
+    reaction_type = models.CharField(max_length=20)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['video', 'reaction_type'], name='unique_vlog_reaction_count_per_type'),
+        ]
+
+    def __str__(self):
+        return f"{self.reaction_type} x{self.count} on video {self.video_id}"
+
+    @classmethod
+    def adjust(cls, video_id, reaction_type, delta):
+        updated = cls.objects.filter(video_id=video_id, reaction_type=reaction_type).update(count=F('count') + delta)
+        if updated or delta < 0:
+            return
+        counter, created = cls.objects.get_or_create(
+            video_id=video_id, reaction_type=reaction_type,
+            defaults={'count': VlogReaction.objects.filter(video_id=video_id, reaction_type=reaction_type).count()},
+        )
+        if not created:
+            cls.objects.filter(pk=counter.pk).update(count=F('count') + delta)
+
+
+@receiver(post_delete, sender=Video)
+def delete_video_renditions(sender, instance, **kwargs):
+    if not instance.hls_playlist:
+        return
+    from vlog.tasks import delete_hls_files
+    video_pk = instance.pk
+    transaction.on_commit(lambda: delete_hls_files.delay(video_pk))
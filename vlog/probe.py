@@ -0,0 +1,425 @@
+"""
+Reads the duration, resolution, codecs and layout of a video from its container headers.
+
+MP4/MOV files describe themselves in the `moov` box (the movie header `mvhd` and one `trak` per
+stream) and WebM/Matroska files in the EBML `Info` and `Tracks` elements at the start of the
+Segment. Both are a few kilobytes, so probing reads them and seeks over the media data instead of
+starting an ffmpeg decoder the way moviepy.VideoFileClip does. Other containers, and files whose
+headers do not carry a duration, fall back to ffprobe (or to ffmpeg's own stream summary when
+ffprobe is not installed).
+"""
+import json
+import os
+import shutil
+import struct
+import subprocess
+import tempfile
+from collections import namedtuple
+
+from django.conf import settings
+
+# `faststart` is whether the index needed to start playback precedes the media data: `moov` before
+# `mdat` for MP4, `Cues` before the first `Cluster` for Matroska. None when it is not known.
+Probe = namedtuple('Probe', 'container duration width height video_codec audio_codec faststart')
+
+# Largest header box or element read into memory; media data is never read.
+MAX_HEADER_SIZE = 64 * 1024 * 1024
+CHUNK_SIZE = 64 * 1024
+FFPROBE_TIMEOUT = 30
+
+MP4_BRANDS = {b'ftyp', b'moov', b'mdat', b'free', b'skip', b'wide'}
+MP4_CODECS = {
+    b'avc1': 'h264', b'avc3': 'h264', b'hvc1': 'hevc', b'hev1': 'hevc', b'vp09': 'vp9', b'av01': 'av1',
+    b'mp4v': 'mpeg4', b'mp4a': 'aac', b'Opus': 'opus', b'ac-3': 'ac3', b'ec-3': 'eac3', b'.mp3': 'mp3',
+}
+EBML_CODECS = {
+    'V_VP8': 'vp8', 'V_VP9': 'vp9', 'V_AV1': 'av1', 'V_MPEG4/ISO/AVC': 'h264', 'V_MPEGH/ISO/HEVC': 'hevc',
+    'A_OPUS': 'opus', 'A_VORBIS': 'vorbis', 'A_AAC': 'aac', 'A_MPEG/L3': 'mp3', 'A_AC3': 'ac3', 'A_FLAC': 'flac',
+}
+
+# Matroska element ids, marker bits included.
+EBML_HEADER = 0x1A45DFA3
+EBML_DOC_TYPE = 0x4282
+SEGMENT = 0x18538067
+INFO = 0x1549A966
+TIMECODE_SCALE = 0x2AD7B1
+DURATION = 0x4489
+TRACKS = 0x1654AE6B
+TRACK_ENTRY = 0xAE
+TRACK_TYPE = 0x83
+CODEC_ID = 0x86
+VIDEO = 0xE0
+PIXEL_WIDTH = 0xB0
+PIXEL_HEIGHT = 0xBA
+CUES = 0x1C53BB6B
+CLUSTER = 0x1F43B675
+EBML_VIDEO_TRACK = 1
+EBML_AUDIO_TRACK = 2
+
+
+class ProbeError(ValueError):
+    """
+    The file is not a video that can be read.
+    """
+
+
+class UnsupportedContainer(ProbeError):
+    """
+    The headers are not in a format parsed here; ffprobe may still read the file.
+    """
+
+
+class _Reader:
+    """
+    Forward-only view of a binary file. Skipped bytes are seeked over when the file is seekable
+    and read through otherwise, so chunked streams can be probed too.
+    """
+
+    def __init__(self, file):
+        self.file = file
+        self.seekable = file.seekable() if hasattr(file, 'seekable') else False
+        self.position = 0
+        self.pending = b''
+
+    def peek(self, size):
+        self.pending += self.file.read(size - len(self.pending))
+        return self.pending[:size]
+
+    def read(self, size):
+        data, self.pending = self.pending[:size], self.pending[size:]
+        if len(data) < size:
+            data += self.file.read(size - len(data))
+        self.position += len(data)
+        return data
+
+    def read_exact(self, size):
+        data = self.read(size)
+        if len(data) != size:
+            raise ProbeError('The file is truncated.')
+        return data
+
+    def skip(self, size):
+        buffered = min(size, len(self.pending))
+        self.read(buffered)
+        size -= buffered
+        if self.seekable:
+            self.file.seek(size, os.SEEK_CUR)
+            self.position += size
+            return
+        while size:
+            data = self.read(min(size, CHUNK_SIZE))
+            if not data:
+                break
+            size -= len(data)
+
+
+def _header_payload(reader, size):
+    if size is None or size > MAX_HEADER_SIZE:
+        raise UnsupportedContainer('The container header is too large.')
+    return memoryview(reader.read_exact(size))
+
+
+# MP4 / QuickTime
+
+def _box_header(reader):
+    """
+    Returns (type, payload size) of the next box, the size None when the box runs to the end of
+    the file, or None at the end of the file.
+    """
+    header = reader.read(8)
+    if not header:
+        return None
+    if len(header) < 8:
+        raise ProbeError('The file is truncated.')
+    size, box_type = struct.unpack('>I4s', header)
+    if size == 1:
+        return box_type, struct.unpack('>Q', reader.read_exact(8))[0] - 16
+    if size == 0:
+        return box_type, None
+    if size < 8:
+        raise ProbeError('Invalid MP4 box size.')
+    return box_type, size - 8
+
+
+def _boxes(data):
+    """
+    Yields (type, payload) of the boxes packed in `data`.
+    """
+    offset = 0
+    while offset + 8 <= len(data):
+        size, box_type = struct.unpack_from('>I4s', data, offset)
+        header = 8
+        if size == 1:
+            size, header = struct.unpack_from('>Q', data, offset + 8)[0], 16
+        elif size == 0:
+            size = len(data) - offset
+        if size < header or offset + size > len(data):
+            raise ProbeError('Invalid MP4 box size.')
+        yield box_type, data[offset + header:offset + size]
+        offset += size
+
+
+def _box(data, *path):
+    for box_type in path:
+        data = next((payload for child, payload in _boxes(data) if child == box_type), None)
+        if data is None:
+            return None
+    return data
+
+
+def _mp4_duration(moov):
+    mvhd = _box(moov, b'mvhd')
+    if mvhd is None:
+        raise ProbeError('The movie header (mvhd) is missing.')
+    if mvhd[0] == 1:
+        timescale, duration = struct.unpack_from('>IQ', mvhd, 20)
+        unknown = 0xFFFFFFFFFFFFFFFF
+    else:
+        timescale, duration = struct.unpack_from('>II', mvhd, 12)
+        unknown = 0xFFFFFFFF
+    if not timescale:
+        raise ProbeError('Invalid movie timescale.')
+    if duration in (0, unknown):
+        # Fragmented files announce their length in the movie extends header.
+        mehd = _box(moov, b'mvex', b'mehd')
+        if mehd is None:
+            return None
+        duration = struct.unpack_from('>Q' if mehd[0] == 1 else '>I', mehd, 4)[0]
+    return duration / timescale
+
+
+def _parse_mp4(reader):
+    moov, container, media_seen = None, 'mp4', False
+    while moov is None:
+        header = _box_header(reader)
+        if header is None:
+            break
+        box_type, size = header
+        if box_type == b'moov':
+            moov = _header_payload(reader, size)
+            break
+        if box_type == b'ftyp' and size is not None and size >= 4:
+            if reader.peek(4) == b'qt  ':
+                container = 'mov'
+        media_seen = media_seen or box_type == b'mdat'
+        if size is None:
+            break
+        reader.skip(size)
+    if moov is None:
+        raise ProbeError('The movie header (moov) is missing.')
+
+    duration = _mp4_duration(moov)
+    if duration is None:
+        raise UnsupportedContainer('The movie header has no duration.')
+    width = height = video_codec = audio_codec = None
+    for box_type, trak in _boxes(moov):
+        if box_type != b'trak':
+            continue
+        hdlr = _box(trak, b'mdia', b'hdlr')
+        stsd = _box(trak, b'mdia', b'minf', b'stbl', b'stsd')
+        if hdlr is None or stsd is None or len(stsd) < 16:
+            continue
+        handler = bytes(hdlr[8:12])
+        fourcc = bytes(stsd[12:16])
+        codec = MP4_CODECS.get(fourcc, fourcc.decode('latin-1').strip().lower())
+        if handler == b'vide' and video_codec is None and len(stsd) >= 44:
+            video_codec = codec
+            width, height = struct.unpack_from('>HH', stsd, 40)
+        elif handler == b'soun' and audio_codec is None:
+            audio_codec = codec
+    return Probe(container, duration, width, height, video_codec, audio_codec, not media_seen)
+
+
+# WebM / Matroska
+
+def _vint_length(first):
+    if not first:
+        raise ProbeError('Invalid EBML element.')
+    return 9 - first.bit_length()
+
+
+def _vint(data, offset, keep_marker=False):
+    """
+    Returns (value, next offset) of the variable-size integer at `offset`. The value is None for
+    sizes with every bit set, which Matroska uses for "unknown".
+    """
+    length = _vint_length(data[offset])
+    if offset + length > len(data):
+        raise ProbeError('Invalid EBML element.')
+    value = int.from_bytes(data[offset:offset + length], 'big')
+    if keep_marker:
+        return value, offset + length
+    value &= (1 << (7 * length)) - 1
+    return (None if value == (1 << (7 * length)) - 1 else value), offset + length
+
+
+def _element_header(reader):
+    """
+    Returns (id, payload size) of the next element, or None at the end of the file.
+    """
+    first = reader.read(1)
+    if not first:
+        return None
+    element_id = first + reader.read_exact(_vint_length(first[0]) - 1)
+    first = reader.read_exact(1)
+    size = first + reader.read_exact(_vint_length(first[0]) - 1)
+    return _vint(element_id, 0, keep_marker=True)[0], _vint(size, 0)[0]
+
+
+def _elements(data):
+    """
+    Yields (id, payload) of the elements packed in `data`.
+    """
+    offset = 0
+    while offset < len(data):
+        element_id, offset = _vint(data, offset, keep_marker=True)
+        size, offset = _vint(data, offset)
+        if size is None or offset + size > len(data):
+            raise ProbeError('Invalid EBML element size.')
+        yield element_id, data[offset:offset + size]
+        offset += size
+
+
+def _uint(data):
+    return int.from_bytes(data, 'big')
+
+
+def _float(data):
+    if len(data) == 4:
+        return struct.unpack('>f', data)[0]
+    if len(data) == 8:
+        return struct.unpack('>d', data)[0]
+    raise ProbeError('Invalid EBML float.')
+
+
+def _parse_ebml(reader):
+    element_id, size = _element_header(reader)
+    doc_type = None
+    for child, payload in _elements(_header_payload(reader, size)):
+        if child == EBML_DOC_TYPE:
+            doc_type = bytes(payload).rstrip(b'\0').decode('ascii', 'replace')
+    if doc_type not in ('webm', 'matroska'):
+        raise UnsupportedContainer(f'Unsupported EBML document type {doc_type}.')
+
+    header = _element_header(reader)
+    if header is None or header[0] != SEGMENT:
+        raise ProbeError('The Matroska segment is missing.')
+    segment_end = None if header[1] is None else reader.position + header[1]
+
+    info = tracks = None
+    faststart = False
+    while segment_end is None or reader.position < segment_end:
+        header = _element_header(reader)
+        if header is None:
+            break
+        element_id, size = header
+        if element_id == CLUSTER:
+            break
+        if element_id == INFO:
+            info = _header_payload(reader, size)
+        elif element_id == TRACKS:
+            tracks = _header_payload(reader, size)
+        elif size is None:
+            break
+        else:
+            faststart = faststart or element_id == CUES
+            reader.skip(size)
+        if info is not None and tracks is not None and faststart:
+            break
+    if info is None or tracks is None:
+        raise UnsupportedContainer('The segment info or tracks do not precede the media data.')
+
+    timecode_scale, duration = 1_000_000, None
+    for child, payload in _elements(info):
+        if child == TIMECODE_SCALE:
+            timecode_scale = _uint(payload)
+        elif child == DURATION:
+            duration = _float(payload)
+    if duration is None:
+        raise UnsupportedContainer('The segment info has no duration.')
+
+    width = height = video_codec = audio_codec = None
+    for child, entry in _elements(tracks):
+        if child != TRACK_ENTRY:
+            continue
+        fields = dict(_elements(entry))
+        track_type = _uint(fields.get(TRACK_TYPE, b''))
+        codec_id = bytes(fields.get(CODEC_ID, b'')).rstrip(b'\0').decode('ascii', 'replace')
+        codec = EBML_CODECS.get(codec_id, codec_id.lower() or None)
+        if track_type == EBML_VIDEO_TRACK and video_codec is None:
+            video_codec = codec
+            video = dict(_elements(fields.get(VIDEO, b'')))
+            width = _uint(video[PIXEL_WIDTH]) if PIXEL_WIDTH in video else None
+            height = _uint(video[PIXEL_HEIGHT]) if PIXEL_HEIGHT in video else None
+        elif track_type == EBML_AUDIO_TRACK and audio_codec is None:
+            audio_codec = codec
+    return Probe(doc_type, duration * timecode_scale / 1e9, width, height, video_codec, audio_codec, faststart)
+
+
+# ffprobe fallback
+
+def _ffprobe(path):
+    binary = shutil.which(settings.FFPROBE_BINARY)
+    if binary is None:
+        return _ffmpeg_infos(path)
+    result = subprocess.run(
+        [binary, '-v', 'error', '-show_format', '-show_streams', '-of', 'json', path],
+        capture_output=True, timeout=FFPROBE_TIMEOUT,
+    )
+    if result.returncode != 0:
+        raise ProbeError(result.stderr.decode('utf-8', 'replace').strip() or 'ffprobe could not read the file.')
+    info = json.loads(result.stdout)
+    streams = info.get('streams', [])
+    video = next((stream for stream in streams if stream.get('codec_type') == 'video'), {})
+    audio = next((stream for stream in streams if stream.get('codec_type') == 'audio'), {})
+    try:
+        duration = float(info['format']['duration'])
+    except (KeyError, ValueError):
+        raise ProbeError('The duration of the file is unknown.')
+    return Probe(
+        info['format'].get('format_name', '').split(',')[0] or None, duration,
+        video.get('width'), video.get('height'), video.get('codec_name'), audio.get('codec_name'), None,
+    )
+
+
+def _ffmpeg_infos(path):
+    # Only reads the stream summary ffmpeg prints for its input; no frame is decoded.
+    from moviepy.video.io.ffmpeg_reader import ffmpeg_parse_infos
+    try:
+        infos = ffmpeg_parse_infos(path)
+    except Exception as e:
+        # The message is followed by ffmpeg's whole output.
+        raise ProbeError(str(e).splitlines()[0])
+    width, height = infos.get('video_size') or (None, None)
+    return Probe(None, infos['duration'], width, height, None, None, None)
+
+
+def _probe_with_ffmpeg(file, path):
+    if path is not None:
+        return _ffprobe(path)
+    if not (hasattr(file, 'seekable') and file.seekable()):
+        raise UnsupportedContainer('Only MP4 and Matroska files can be probed from a stream.')
+    file.seek(0)
+    with tempfile.NamedTemporaryFile() as temp_file:
+        shutil.copyfileobj(file, temp_file, CHUNK_SIZE)
+        temp_file.flush()
+        return _ffprobe(temp_file.name)
+
+
+def probe(file, path=None):
+    """
+    Returns the Probe of `file`, a binary file open at its start. `path` is a local path of the
+    same file, used by the ffprobe fallback instead of a temporary copy.
+    """
+    reader = _Reader(file)
+    start = reader.peek(8)
+    try:
+        if start[4:8] in MP4_BRANDS:
+            return _parse_mp4(reader)
+        if len(start) >= 4 and _uint(start[:4]) == EBML_HEADER:
+            return _parse_ebml(reader)
+    except UnsupportedContainer:
+        pass
+    except (struct.error, IndexError):
+        raise ProbeError('The container headers are malformed.')
+    return _probe_with_ffmpeg(file, path)
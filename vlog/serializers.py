@@ -1,3 +1,4 @@
+from django.core.files.storage import default_storage
 from rest_framework import serializers
 
 
@@ -13,7 +14,7 @@ class VideoSerializer(serializers.ModelSerializer):
     like_count = serializers.ReadOnlyField()
     comment_count = serializers.ReadOnlyField()
     author = serializers.CharField(source='author.username', read_only=True)  # Fetch username instead of ID
-
+    playback_url = serializers.SerializerMethodField()
 
     class Meta:
         model = Video
@@ -25,15 +26,30 @@ class VideoSerializer(serializers.ModelSerializer):
             'video',
             'duration',
             'thumbnail',
+            'thumbnail_placeholder',
+            'status',
+            'rejection_reason',
+            'playback_url',
             'created_at',
             'updated_at',
             'like_count',
             'comment_count',
         ]
-        read_only_fields = ['author','duration', 'thumbnail', 'created_at', 'updated_at']
+        read_only_fields = ['author','duration', 'thumbnail', 'thumbnail_placeholder', 'status', 'rejection_reason', 'created_at', 'updated_at']
         extra_kwargs = {
             "author": {"required": False},
         }
+
+    def get_playback_url(self, obj):
+        # The HLS master playlist once a rendition is ready (see vlog/hls.py), the original file until then.
+        if obj.hls_playlist:
+            url = default_storage.url(obj.hls_playlist)
+        elif obj.video:
+            url = obj.video.url
+        else:
+            return None
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
     
 class VlogCommentSerializer(serializers.ModelSerializer):
     user = serializers.ReadOnlyField(source='user.username')
@@ -68,6 +84,16 @@ class VlogLikeSerializer(serializers.ModelSerializer):
     
 
 
+class VlogReactorSerializer(serializers.ModelSerializer):
+    user_id = serializers.ReadOnlyField(source='user.id')
+    username = serializers.CharField(source='user.username', read_only=True)
+    avatar = serializers.ImageField(source='user.avatar', read_only=True)
+
+    class Meta:
+        model = VlogReaction
+        fields = ['user_id', 'username', 'avatar', 'reaction_type', 'created_at']
+
+
 class VlogReactionSerializer(serializers.ModelSerializer):
     class Meta:
         model = VlogReaction
@@ -1,33 +1,110 @@
+import logging
 import os
 
 from django.core.files.base import File
 
-from celery import shared_task
+from celery import chain, shared_task
 from io import BytesIO
 from PIL import Image
 from moviepy.editor import VideoFileClip
 
+from trend import blurhash
+from vlog import hls, ingest
 from vlog.models import Video
 
+logger = logging.getLogger(__name__)
+
+
+def ingest_video(video_pk):
+    """
+    Queues the ingest chain of a new video (see vlog.ingest).
+    """
+    return chain(
+        probe_video.si(video_pk),
+        faststart_video.si(video_pk),
+        create_video_thumbnail.si(video_pk),
+        mark_video_ready.si(video_pk),
+        transcode_video.si(video_pk),
+    ).apply_async()
+
+
+@shared_task()
+def probe_video(video_pk):
+    video_obj = ingest.processing(video_pk)
+    # Direct uploads are probed by uploads.finalize before the video is created.
+    if video_obj is None or video_obj.duration is not None:
+        return
+    try:
+        ingest.probe(video_obj)
+    except Exception as exc:
+        ingest.reject(video_pk, exc)
+
+
+@shared_task()
+def faststart_video(video_pk):
+    video_obj = ingest.processing(video_pk)
+    if video_obj is None:
+        return
+    try:
+        ingest.faststart(video_obj)
+    except Exception:
+        # The remux only speeds up playback: the video keeps the file it was uploaded with, and the
+        # chain goes on to the thumbnail.
+        logger.exception('Video %s was not remuxed', video_pk)
+
+
 @shared_task()
 def create_video_thumbnail(video_pk):
-    video_obj = Video.objects.get(pk=video_pk)
-    video_path = video_obj.video.path
-
-    # Extract a frame from the video (at 1 second, or earlier if the video is shorter)
-    with VideoFileClip(video_path) as video:
-        duration = video.duration
-        thumbnail_time = min(1, duration)  # Take the frame at 1 second or earlier
-        frame = video.get_frame(thumbnail_time)  # Get a frame (numpy array)
-        
-        # Convert the numpy array to an image and save it
-        image = Image.fromarray(frame)
-        new_width, new_height = (160, 160)
-        image.thumbnail((new_width, new_height))
-        
-        img_temp = BytesIO()
-        image.save(img_temp, "PNG")
-
-        # Save the thumbnail as a file in the thumbnail field
-        video_obj.thumbnail = File(img_temp, os.path.basename(video_obj.video.name).split(".")[0] + ".png")
-        video_obj.save()
\ No newline at end of file
+    video_obj = ingest.processing(video_pk)
+    if video_obj is None:
+        return
+
+    try:
+        # Extract a frame from the video (at 1 second, or earlier if the video is shorter)
+        with ingest.local_copy(video_obj.video) as video_path, VideoFileClip(video_path) as video:
+            duration = video.duration
+            thumbnail_time = min(1, duration)  # Take the frame at 1 second or earlier
+            frame = video.get_frame(thumbnail_time)  # Get a frame (numpy array)
+    except Exception as exc:
+        ingest.reject(video_pk, exc)
+        return
+
+    # Convert the numpy array to an image and save it
+    image = Image.fromarray(frame)
+    new_width, new_height = (160, 160)
+    image.thumbnail((new_width, new_height))
+
+    img_temp = BytesIO()
+    image.save(img_temp, "PNG")
+
+    # Save the thumbnail as a file in the thumbnail field
+    video_obj.thumbnail = File(img_temp, os.path.basename(video_obj.video.name).split(".")[0] + ".png")
+    video_obj.thumbnail_placeholder = blurhash.encode_image(image)
+    video_obj.save(update_fields=['thumbnail', 'thumbnail_placeholder', 'updated_at'])
+
+
+@shared_task()
+def mark_video_ready(video_pk):
+    ingest.mark_ready(video_pk)
+
+
+@shared_task()
+def transcode_video(video_pk):
+    """
+    Plans the HLS renditions of a ready video and queues their transcodes (see vlog.hls).
+    """
+    video_obj = Video.objects.filter(pk=video_pk, status=Video.READY).first()
+    if video_obj is None:
+        return
+    for rendition in hls.plan(video_obj):
+        transcode_rendition.delay(rendition.pk)
+
+
+@shared_task()
+def transcode_rendition(rendition_pk):
+    hls.transcode(rendition_pk)
+
+
+@shared_task()
+def delete_hls_files(video_pk):
+    hls.delete_files(video_pk)
@@ -1,3 +1,353 @@
-from django.test import TestCase
+import os
+import shutil
+import tempfile
+from io import BytesIO
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from moviepy.editor import ImageSequenceClip, VideoFileClip
+from rest_framework.test import APIClient
+
+from authentication.blocks import _local
+from trend.redis_store import local_redis
+from uploads.models import MediaBlob
+from vlog import faststart, hls
+from vlog.models import Video, VideoRendition, VlogReaction, VlogReactionCount, validate_video_duration
+from vlog.probe import ProbeError, probe
+from vlog.tasks import create_video_thumbnail, faststart_video, mark_video_ready, probe_video
+
+User = get_user_model()
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def encode_clip(seconds, extension='mp4', size=(32, 24), **options):
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, f'clip.{extension}')
+        width, height = size
+        frames = [np.full((height, width, 3), 200, dtype=np.uint8)] * (seconds * 5)
+        ImageSequenceClip(frames, fps=5).write_videofile(path, logger=None, **options)
+        with open(path, 'rb') as clip:
+            return clip.read()
+
+
+def mp4_file(seconds, name='clip.mp4', **options):
+    return SimpleUploadedFile(name, encode_clip(seconds, **options), content_type='video/mp4')
+
+
+class Stream:
+    """
+    A file that can only be read forwards, like a chunked upload.
+    """
+
+    def __init__(self, data):
+        self.buffer = BytesIO(data)
+
+    def read(self, size=-1):
+        return self.buffer.read(size)
+
+
+def create_video(author, **fields):
+    # Rows are inserted directly, without queueing the ingest chain.
+    return Video.objects.bulk_create([Video(author=author, title='video', video='vlogs/test.mp4', **fields)])[0]
+
+
+@override_settings(REDIS_URL='local://')
+class VlogReactionListTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.viewer = User.objects.create_user(username='viewer', email='viewer@example.com')
+        cls.video = create_video(cls.viewer)
+        cls.reactors = [User.objects.create_user(username=f'reactor{i}', email=f'reactor{i}@example.com') for i in range(12)]
+        for reactor in cls.reactors:
+            VlogReaction.toggle_reaction(cls.video, reactor, 'haha')
+        VlogReaction.toggle_reaction(cls.video, cls.reactors[0], 'love')
+
+    def setUp(self):
+        local_redis.flushall()
+        _local.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.viewer)
+
+    def test_toggle_maintains_counts(self):
+        VlogReaction.toggle_reaction(self.video, self.reactors[1], 'haha')
+        self.assertEqual(
+            dict(VlogReactionCount.objects.filter(video=self.video).values_list('reaction_type', 'count')),
+            {'haha': 11, 'love': 1},
+        )
+
+    def test_counts_header_and_filtered_cursor_pages(self):
+        url = reverse('vlog-reaction-list', args=[self.video.id])
+        response = self.client.get(url)
+        self.assertEqual(response.data['counts'], {'haha': 12, 'love': 1})
+        self.assertEqual(len(response.data['results']), 10)
+        rest = self.client.get(response.data['next'])
+        self.assertEqual(len(rest.data['results']), 3)
+
+        response = self.client.get(url, {'type': 'love'})
+        self.assertEqual([item['user_id'] for item in response.data['results']], [self.reactors[0].id])
+
+    def test_unready_videos_are_only_listed_for_their_author(self):
+        # The video is still processing, so only its author may see who reacted.
+        self.client.force_authenticate(self.reactors[0])
+        response = self.client.get(reverse('vlog-reaction-list', args=[self.video.id]))
+        self.assertEqual(response.status_code, 404)
+
+        Video.objects.filter(pk=self.video.pk).update(status=Video.READY)
+        response = self.client.get(reverse('vlog-reaction-list', args=[self.video.id]))
+        self.assertEqual(response.data['counts'], {'haha': 12, 'love': 1})
+
+
+@override_settings(
+    REDIS_URL='local://',
+    DEFAULT_FILE_STORAGE='django.core.files.storage.FileSystemStorage',
+    MEDIA_ROOT=MEDIA_ROOT,
+    MAX_VIDEO_DURATION=3,
+)
+class VideoIngestTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='user', email='user@example.com')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def ingest(self, video):
+        for task in (probe_video, faststart_video, create_video_thumbnail, mark_video_ready):
+            task(video.pk)
+        video.refresh_from_db()
+        return video
+
+    def test_upload_returns_before_processing(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = self.client.post(reverse('video-list'), {'title': 'clip', 'video': mp4_file(2)}, format='multipart')
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual((response.data['status'], response.data['duration']), (Video.PROCESSING, None))
+        self.assertEqual(len(callbacks), 1)
+
+        video = self.ingest(Video.objects.get(pk=response.data['id']))
+        self.assertEqual(video.status, Video.READY)
+        self.assertAlmostEqual(video.duration.total_seconds(), 2, delta=0.5)
+        self.assertTrue(video.thumbnail.name.endswith('.png'))
+        self.assertNotEqual(video.thumbnail_placeholder, '')
+        # The upload had its movie header last; the stored file has it first.
+        with video.video.open('rb') as file:
+            self.assertTrue(probe(file).faststart)
+
+    def test_unreadable_and_long_videos_are_rejected(self):
+        broken = Video.objects.create(author=self.user, title='broken', video=SimpleUploadedFile('broken.mp4', b'not a video'))
+        broken = self.ingest(broken)
+        self.assertEqual(broken.status, Video.REJECTED)
+        self.assertTrue(broken.rejection_reason.startswith('Unable to process video file'))
+        self.assertFalse(broken.thumbnail)
+
+        long = Video.objects.create(author=self.user, title='long', video=mp4_file(5, 'long.mp4'))
+        name = long.video.name
+        long = self.ingest(long)
+        self.assertEqual(long.status, Video.REJECTED)
+        self.assertIn('maximum limit of 3 seconds', long.rejection_reason)
+        # The file is released for the blob collector.
+        self.assertEqual(long.video.name, '')
+        self.assertEqual(MediaBlob.objects.get(name=name).refcount, 0)
+
+        response = self.client.get(reverse('video-detail', args=[long.pk]))
+        self.assertEqual((response.data['status'], response.data['rejection_reason']), (Video.REJECTED, long.rejection_reason))
+
+    def test_a_failing_remux_keeps_the_uploaded_file(self):
+        video = Video.objects.create(author=self.user, title='clip', video=mp4_file(2))
+        name = video.video.name
+        with mock.patch('vlog.ingest.remux', side_effect=OSError('disk full')), self.assertLogs('vlog.tasks', 'ERROR'):
+            video = self.ingest(video)
+        self.assertEqual((video.status, video.video.name), (Video.READY, name))
+        self.assertTrue(video.thumbnail)
+
+    def test_unready_videos_are_only_shown_to_their_author(self):
+        ready = Video.objects.create(author=self.user, title='ready', video='vlogs/ready.mp4', status=Video.READY)
+        processing = Video.objects.create(author=self.user, title='processing', video='vlogs/processing.mp4')
+        rejected = Video.objects.create(author=self.user, title='rejected', video='', status=Video.REJECTED)
+
+        def listed(client):
+            return {video['id'] for video in client.get(reverse('video-list')).data['results']}
+
+        self.assertEqual(listed(self.client), {ready.pk, processing.pk, rejected.pk})
+        other = APIClient()
+        other.force_authenticate(User.objects.create_user(username='other', email='other@example.com'))
+        self.assertEqual(listed(other), {ready.pk})
+        self.assertEqual(listed(APIClient()), {ready.pk})
+        self.assertEqual(other.get(reverse('video-detail', args=[processing.pk])).status_code, 404)
+
+
+@override_settings(MAX_VIDEO_DURATION=3)
+class VideoProbeTests(TestCase):
+    def test_mp4_and_matroska_headers(self):
+        cases = [
+            (encode_clip(2), ('mp4', 'h264', False)),
+            (encode_clip(2, ffmpeg_params=['-movflags', '+faststart']), ('mp4', 'h264', True)),
+            (encode_clip(2, 'webm', codec='libvpx'), ('webm', 'vp8', False)),
+        ]
+        for data, (container, codec, is_faststart) in cases:
+            result = probe(BytesIO(data))
+            self.assertEqual(
+                (result.container, result.width, result.height, result.video_codec, result.audio_codec, result.faststart),
+                (container, 32, 24, codec, None, is_faststart),
+            )
+            self.assertAlmostEqual(result.duration, 2, delta=0.2)
+            # Forward-only streams read through the media data instead of seeking over it.
+            self.assertEqual(probe(Stream(data)), result)
+
+    def test_other_containers_fall_back_to_ffmpeg(self):
+        result = probe(BytesIO(encode_clip(2, 'avi', codec='mpeg4')))
+        self.assertAlmostEqual(result.duration, 2, delta=0.2)
+        self.assertEqual((result.width, result.height), (32, 24))
+
+        with self.assertRaises(ProbeError):
+            probe(BytesIO(b'not a video' * 10))
+        data = encode_clip(2)
+        with self.assertRaises(ProbeError):
+            probe(BytesIO(data[:-100]))
+
+    def test_duration_validator_reads_uploads_in_place(self):
+        validate_video_duration(mp4_file(2))
+        with self.assertRaisesMessage(ValidationError, 'maximum limit of 3 seconds'):
+            validate_video_duration(mp4_file(5))
+
+
+class FaststartTests(TestCase):
+    def remux(self, data):
+        remuxed = BytesIO()
+        return faststart.remux(BytesIO(data), remuxed), remuxed.getvalue()
+
+    def test_moves_the_movie_header_in_front_of_the_media_data(self):
+        data = encode_clip(2)
+        self.assertTrue(faststart.needs_remux(BytesIO(data)))
+        moved, remuxed = self.remux(data)
+        self.assertTrue(moved)
+        self.assertEqual(len(remuxed), len(data))
+        self.assertFalse(faststart.needs_remux(BytesIO(remuxed)))
+        self.assertEqual(probe(BytesIO(remuxed)), probe(BytesIO(data))._replace(faststart=True))
+
+        # The chunk offsets follow the media data: every frame decodes as before.
+        with tempfile.TemporaryDirectory() as directory:
+            clips = []
+            for name, content in (('original.mp4', data), ('remuxed.mp4', remuxed)):
+                path = os.path.join(directory, name)
+                with open(path, 'wb') as file:
+                    file.write(content)
+                clips.append(VideoFileClip(path))
+            original, moved = clips
+            for t in (0, 0.9, 1.8):
+                self.assertTrue((original.get_frame(t) == moved.get_frame(t)).all())
+            for clip in clips:
+                clip.close()
+
+    def test_other_files_are_left_alone(self):
+        for data in (
+            encode_clip(2, ffmpeg_params=['-movflags', '+faststart']),
+            encode_clip(2, 'webm', codec='libvpx'),
+            b'not a video' * 10,
+        ):
+            self.assertEqual(self.remux(data), (False, b''))
+
+        # The movie header at the end is cut short.
+        with self.assertRaises(faststart.FaststartError):
+            self.remux(encode_clip(2)[:-100])
+
+
+@override_settings(
+    REDIS_URL='local://',
+    DEFAULT_FILE_STORAGE='django.core.files.storage.FileSystemStorage',
+    MEDIA_ROOT=MEDIA_ROOT,
+    MEDIA_URL='/media/',
+    VIDEO_TRANSCODE_THREADS=1,
+)
+class VideoTranscodeTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='user', email='user@example.com')
+
+    def setUp(self):
+        local_redis.flushall()
+        _local.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def create_ready_video(self, **options):
+        with self.captureOnCommitCallbacks():
+            video = Video.objects.create(author=self.user, title='clip', video=mp4_file(2, **options))
+        Video.objects.filter(pk=video.pk).update(status=Video.READY)
+        return video
+
+    def segments(self, rendition):
+        directory = rendition.playlist.rsplit('/', 1)[0] + '/'
+        return {
+            name: default_storage.open(directory + name).read()
+            for name in default_storage.listdir(directory)[1] if name.endswith('.ts')
+        }
+
+    def test_ladder_stops_at_the_source_height(self):
+        video = self.create_ready_video(size=(640, 480))
+        self.assertEqual([rendition.height for rendition in hls.plan(video)], [240, 480])
+        # Planning again does not duplicate renditions.
+        self.assertEqual(hls.plan(video), list(video.renditions.order_by('height')))
+
+        small = self.create_ready_video()
+        self.assertEqual([rendition.height for rendition in hls.plan(small)], [24])
+
+    def test_transcode_writes_renditions_and_master_playlist(self):
+        video = self.create_ready_video()
+        response = self.client.get(reverse('video-detail', args=[video.pk]))
+        self.assertTrue(response.data['playback_url'].endswith(video.video.url))
+
+        rendition, = hls.plan(video)
+        hls.transcode(rendition.pk)
+        rendition.refresh_from_db()
+        self.assertEqual((rendition.status, rendition.progress, rendition.error), (VideoRendition.READY, 100, ''))
+        self.assertEqual((rendition.width, rendition.height), (32, 24))
+        self.assertTrue(rendition.codecs.startswith('avc1.'))
+        self.assertTrue(self.segments(rendition))
+
+        video.refresh_from_db()
+        self.assertEqual(video.hls_playlist, f'vlogs/hls/{video.pk}/master.m3u8')
+        master = default_storage.open(video.hls_playlist).read().decode()
+        self.assertIn(f'RESOLUTION=32x24,CODECS="{rendition.codecs}"\n24p/index.m3u8', master)
+        response = self.client.get(reverse('video-detail', args=[video.pk]))
+        self.assertEqual(response.data['playback_url'], f'http://testserver/media/{video.hls_playlist}')
+
+    def test_transcodes_are_deterministic(self):
+        video = self.create_ready_video()
+        rendition, = hls.plan(video)
+        hls.transcode(rendition.pk)
+        rendition.refresh_from_db()
+        first = self.segments(rendition)
+
+        VideoRendition.objects.filter(pk=rendition.pk).update(status=VideoRendition.PENDING)
+        hls.transcode(rendition.pk)
+        self.assertEqual(self.segments(rendition), first)
+
+    def test_failed_transcodes_are_recorded(self):
+        video = self.create_ready_video()
+        rendition, = hls.plan(video)
+        default_storage.delete(video.video.name)
+        hls.transcode(rendition.pk)
+        rendition.refresh_from_db()
+        self.assertEqual(rendition.status, VideoRendition.FAILED)
+        self.assertNotEqual(rendition.error, '')
+        video.refresh_from_db()
+        self.assertEqual(video.hls_playlist, '')
@@ -6,24 +6,31 @@ from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import IsAuthenticated
 from rest_framework import serializers
 
+from authentication.blocks import get_blocked_user_ids
+from authentication.pagination import CountsCursorPagination
 from .models import (
     Video, 
     VlogComment, 
     VlogLike,
-    VlogReaction
+    VlogReaction,
+    VlogReactionCount,
 )
 from .serializers import (
     VideoSerializer, 
     VlogCommentSerializer,
     VlogLikeSerializer,
-    VlogReactionSerializer
+    VlogReactionSerializer,
+    VlogReactorSerializer,
 )
 
 class VideoList(generics.ListCreateAPIView):
-    queryset = Video.objects.all()
     serializer_class = VideoSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
 
+    def get_queryset(self):
+        # Videos still processing or rejected are only listed to their author.
+        return Video.objects.visible_to(self.request.user)
+
     def perform_create(self, serializer):
         try:
             serializer.save(
@@ -54,10 +61,12 @@ class VideoList(generics.ListCreateAPIView):
         )
 
 class VideoDetail(generics.RetrieveUpdateDestroyAPIView):
-    queryset = Video.objects.all()
     serializer_class = VideoSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
 
+    def get_queryset(self):
+        return Video.objects.visible_to(self.request.user)
+
     def perform_update(self, serializer):
         if self.request.user != serializer.instance.author:
             raise ValidationError("You don't have permission to edit this video.")
@@ -196,9 +205,27 @@ class VlogReactionToggleView(generics.CreateAPIView):
             return Response(e.detail, status=status.HTTP_400_BAD_REQUEST)
 
 class VlogReactionListView(generics.ListAPIView):
-    serializer_class = VlogReactionSerializer
+    """
+    Reaction counts per type, read from VlogReactionCount, followed by a cursor-paginated list of
+    the users who reacted, newest first. `?type=<reaction type>` restricts the list to one type.
+    """
+    serializer_class = VlogReactorSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = CountsCursorPagination
+
+    def get_counts(self):
+        video = get_object_or_404(Video.objects.visible_to(self.request.user), pk=self.kwargs.get('pk'))
+        counts = VlogReactionCount.objects.filter(video=video, count__gt=0).order_by('-count', 'reaction_type')
+        return dict(counts.values_list('reaction_type', 'count'))
 
     def get_queryset(self):
         video_id = self.kwargs.get('pk')
-        return VlogReaction.objects.filter(video_id=video_id)        
\ No newline at end of file
+        queryset = (
+            VlogReaction.objects.filter(video_id=video_id)
+            .exclude(user__in=get_blocked_user_ids(self.request.user))
+            .select_related('user')
+        )
+        reaction_type = self.request.query_params.get('type')
+        if reaction_type:
+            queryset = queryset.filter(reaction_type=reaction_type)
+        return queryset